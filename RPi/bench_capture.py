@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Capture benchmark: legacy (full sensor JPEG + PIL resize) vs fast (ISP 1080p)
+Reports per-frame CPU time, wall time and peak RSS for each capture mode.
+Each mode runs in its own process so peak RSS is not shared between them.
+
+Usage: sudo python3 bench_capture.py [frames] [legacy|fast]
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from iot_app import CameraManager
+
+
+FRAMES = 20
+
+
+class LocalTime:
+    """Stands in for TimeManager, no server needed"""
+
+    def get_synced_time(self):
+        return datetime.now()
+
+
+def run_mode(mode, frames):
+    """Capture and encode frames in one mode and print a result line"""
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "bench"))
+        camera = CameraManager(tmp, LocalTime(), None, capture_mode=mode)
+
+        cpu_times = []
+        wall_times = []
+        sizes = []
+        try:
+            for i in range(frames):
+                cpu_tic = time.process_time()
+                wall_tic = time.perf_counter()
+
+                frame = camera.capture_frame((0, "bench"))
+                item = camera.encode_frame(frame)
+
+                cpu_times.append(time.process_time() - cpu_tic)
+                wall_times.append(time.perf_counter() - wall_tic)
+                sizes.append(os.path.getsize(item['path']))
+                os.remove(item['path'])
+        finally:
+            camera.cleanup()
+
+    # ru_maxrss is in KB on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode:<8} cpu={1000 * sum(cpu_times) / frames:7.1f}ms/frame "
+          f"wall={1000 * sum(wall_times) / frames:7.1f}ms/frame "
+          f"peak_rss={peak_rss:6.1f}MB "
+          f"jpeg={sum(sizes) / frames / 1024:6.1f}KB")
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) >= 2 else FRAMES
+
+    if len(sys.argv) >= 3:
+        run_mode(sys.argv[2], frames)
+    else:
+        print(f"{frames} frames per mode")
+        for mode in ("legacy", "fast"):
+            subprocess.run([sys.executable, __file__, str(frames), mode], check=True)
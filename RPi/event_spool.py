@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Offline-safe sensor event writer
+Events are appended to a local SQLite spool first and replayed to
+PostgreSQL in batches by a background thread, so a database outage never
+loses them and a replay after a crash never duplicates them:
+
+    spool = EventSpool('event_spool.db')
+    writer = EventWriter(pool, spool)
+    writer.put('temperature', (session, datetime.now(), 41.5))
+    writer.flush()
+
+While the database is unreachable the writer backs off and keeps
+everything spooled. An event the database rejects (e.g. a row violating a
+constraint) would block the spool forever, so it is moved to the spool's
+failed table together with the error instead. Any other error, e.g. a
+missing table or privilege, is handled like an outage.
+"""
+
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import psycopg as pg
+
+
+# Database Writer Configuration
+DB_FLUSH_SIZE = 50  # buffered rows that trigger a flush
+DB_FLUSH_INTERVAL = 2  # seconds between flushes
+DB_RETRY_MAX = 60  # longest back-off in seconds while the database is down
+
+# Offline Spool Configuration
+SPOOL_PATH = "event_spool.db"
+SPOOL_MAX_ROWS = 200000  # oldest events are dropped beyond this (~10MB on disk)
+SPOOL_MAX_FAILED = 10000  # oldest parked events are dropped beyond this
+SPOOL_BATCH = 500  # rows replayed per transaction
+
+# Errors caused by the values of an event, writing it again can never work;
+# KeyError and ValueError come from decoding an event of an unknown table or
+# with a broken time. Anything else is retried later, as the batch may
+# succeed once the database or its schema is fixed
+REJECTED_ERRORS = (pg.DataError, pg.IntegrityError, KeyError, ValueError)
+
+
+class EventSpool:
+    """Append-only local SQLite spool holding sensor events until they reach PostgreSQL"""
+
+    def __init__(self, path=SPOOL_PATH, max_rows=SPOOL_MAX_ROWS, max_failed=SPOOL_MAX_FAILED):
+        self.path = path
+        self.max_rows = max_rows
+        self.max_failed = max_failed
+        self.lock = threading.Lock()
+        self.rows_dropped = 0
+
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tbl TEXT NOT NULL,
+                session INTEGER NOT NULL,
+                datetime TEXT NOT NULL,
+                value REAL,
+                enqueued REAL NOT NULL
+            )
+        """)
+        # Events the database rejected, kept with the error for a look by hand
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS failed (
+                id INTEGER PRIMARY KEY,
+                tbl TEXT NOT NULL,
+                session INTEGER NOT NULL,
+                datetime TEXT NOT NULL,
+                value REAL,
+                enqueued REAL NOT NULL,
+                error TEXT NOT NULL,
+                failed REAL NOT NULL
+            )
+        """)
+        self.count = self.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        if self.count:
+            print(f"Spool: {self.count} events waiting from a previous run")
+        self.parked = self.conn.execute("SELECT COUNT(*) FROM failed").fetchone()[0]
+        if self.parked:
+            print(f"Spool: {self.parked} failed events parked in {path}")
+
+    def append(self, table, session, dt, value):
+        """Append one event, dropping the oldest ones when the spool is full"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO events (tbl, session, datetime, value, enqueued) VALUES (?, ?, ?, ?, ?)",
+                (table, session, dt.isoformat(), value, time.time())
+            )
+            self.count += 1
+
+            overflow = self.count - self.max_rows
+            if overflow > 0:
+                self.conn.execute(
+                    "DELETE FROM events WHERE id IN (SELECT id FROM events ORDER BY id LIMIT ?)",
+                    (overflow,)
+                )
+                self.count -= overflow
+                self.rows_dropped += overflow
+
+    def peek(self, limit=SPOOL_BATCH):
+        """Get the oldest events as (id, table, session, datetime, value, enqueued)"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, tbl, session, datetime, value, enqueued FROM events ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+
+    def park(self, event, error):
+        """Move one event the database rejected to the failed table"""
+        with self.lock:
+            # Parked again if the delete is lost, the id keeps it a single row
+            self.conn.execute(
+                "INSERT OR REPLACE INTO failed (id, tbl, session, datetime, value, enqueued, error, failed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (*event, str(error), time.time())
+            )
+            cur = self.conn.execute("DELETE FROM events WHERE id = ?", (event[0],))
+            self.count -= cur.rowcount
+            self.parked += cur.rowcount
+
+            overflow = self.parked - self.max_failed
+            if overflow > 0:
+                self.conn.execute(
+                    "DELETE FROM failed WHERE id IN (SELECT id FROM failed ORDER BY id LIMIT ?)",
+                    (overflow,)
+                )
+                self.parked -= overflow
+                self.rows_dropped += overflow
+
+    def remove(self, last_id):
+        """Forget every event up to and including last_id"""
+        with self.lock:
+            cur = self.conn.execute("DELETE FROM events WHERE id <= ?", (last_id,))
+            self.count -= cur.rowcount
+
+    def close(self):
+        """Close the spool file"""
+        with self.lock:
+            self.conn.close()
+
+
+class EventWriter:
+    """Replays spooled sensor events to PostgreSQL in idempotent batches"""
+
+    # Column layout of every table the writer knows about
+    COLUMNS = {
+        'motion1': ('session', 'datetime', 'value'),
+        'motion2': ('session', 'datetime', 'value'),
+        'switch': ('session', 'datetime', 'status'),
+        'temperature': ('session', 'datetime', 'value'),
+    }
+
+    # Presence intervals are spooled as (session, start, seconds) under these names
+    INTERVALS = {
+        'motion1_interval': 'motion1',
+        'presence_interval': 'presence',
+    }
+    INTERVAL_SQL = """
+        INSERT INTO presence_interval (session, sensor, start_time, end_time)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (session, sensor, start_time) DO NOTHING
+    """
+
+    # Closes a session, spooled like events so it follows them into the database
+    SESSION_END_SQL = "UPDATE sessions SET end_time = %s, status = 'closed' WHERE id = %s"
+
+    # Creates the session rows of a batch that have none, e.g. a session numbered
+    # while the database was unreachable, and keeps the sequence past them
+    SESSION_FILL_SQL = """
+        WITH added AS (
+            INSERT INTO sessions (id, device, start_time)
+            SELECT id, %s, start_time FROM unnest(%s::integer[], %s::timestamp[]) AS s (id, start_time)
+            ON CONFLICT (id) DO NOTHING
+            RETURNING id
+        )
+        SELECT setval('sessions_id_seq', GREATEST(MAX(added.id), (SELECT last_value FROM sessions_id_seq)))
+        FROM added HAVING COUNT(*) > 0
+    """
+
+    def __init__(self, pool, spool, device=None, flush_size=DB_FLUSH_SIZE, flush_interval=DB_FLUSH_INTERVAL):
+        self.pool = pool
+        self.spool = spool
+        self.device = device or socket.gethostname()  # recorded in sessions.device
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.retry_delay = 0
+        self.report_pending = False
+
+        # Set once the sessions table exists (migrations/002)
+        self.sessions = False
+
+        # Ingest statistics
+        self.rows_written = 0
+        self.batches_written = 0
+        self.write_time = 0.0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.started_at = time.time()
+
+        self.thread = threading.Thread(target=self.flush_loop, daemon=True)
+        self.thread.start()
+
+    def put(self, table, row):
+        """Spool one row for the given table, never blocks on the database"""
+        session, dt, value = row
+        self.spool.append(table, session, dt, value)
+
+        if self.spool.count >= self.flush_size:
+            self.wakeup.set()
+
+    def flush_loop(self):
+        """Replay on size or time threshold, backing off while the database is down"""
+        while not self.stop_event.is_set():
+            self.wakeup.wait(self.flush_interval + self.retry_delay)
+            self.wakeup.clear()
+
+            if self.flush():
+                self.retry_delay = 0
+            else:
+                self.retry_delay = min(max(2 * self.retry_delay, 1), DB_RETRY_MAX)
+
+            if self.report_pending:
+                self.report_pending = False
+                self.report()
+
+    def flush_soon(self, report=False):
+        """Wake the flush thread without waiting for it, e.g. from a GPIO callback"""
+        self.report_pending = self.report_pending or report
+        self.wakeup.set()
+
+    def flush(self):
+        """Drain the spool, one transaction per batch"""
+        with self.flush_lock:
+            while True:
+                events = self.spool.peek(SPOOL_BATCH)
+                if not events:
+                    return True
+                if not self.write_batch(events):
+                    return False
+                self.spool.remove(events[-1][0])
+                if len(events) < SPOOL_BATCH:
+                    return True
+
+    def write_batch(self, events):
+        """Write a batch in one transaction, rejected events are parked one by one"""
+        tic = time.time()
+        try:
+            self.insert(events)
+        except REJECTED_ERRORS as e:
+            # Find the events the database refuses, the others are written
+            print(f"Database rejected a batch of {len(events)} events, writing one by one: {e}")
+            written = []
+            for event in events:
+                try:
+                    self.insert([event])
+                    written.append(event)
+                except REJECTED_ERRORS as e:
+                    print(f"Parking {event[1]} event of session {event[2]} at {event[3]}: {e}")
+                    self.spool.park(event, e)
+                except Exception as e:
+                    print(f"Database replay error ({self.spool.count} events spooled): {e}")
+                    return False
+            events = written
+        except Exception as e:
+            print(f"Database replay error ({self.spool.count} events spooled): {e}")
+            return False
+
+        toc = time.time()
+        self.rows_written += len(events)
+        self.batches_written += 1
+        self.write_time += toc - tic
+        for event in events:
+            latency = toc - event[5]
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+        return True
+
+    def insert(self, events):
+        """COPY events into staging tables and insert them, skipping rows already stored"""
+        rows_by_table = {}
+        first_seen = {}  # session: earliest event time in this batch
+        for _, table, session, dt, value, _ in events:
+            if table in ('motion1', 'motion2', 'switch'):
+                value = bool(value)
+            dt = datetime.fromisoformat(dt)
+            rows_by_table.setdefault(table, []).append((session, dt, value))
+            if session is not None and (session not in first_seen or dt < first_seen[session]):
+                first_seen[session] = dt
+
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                # Every table references sessions, so their rows go in first
+                if self.sessions and first_seen:
+                    cur.execute(self.SESSION_FILL_SQL, (self.device, list(first_seen), list(first_seen.values())))
+
+                for table, rows in rows_by_table.items():
+                    if table == 'session_end':
+                        cur.executemany(self.SESSION_END_SQL, [(dt, session) for session, dt, _ in rows])
+                        continue
+                    if table in self.INTERVALS:
+                        sensor = self.INTERVALS[table]
+                        cur.executemany(self.INTERVAL_SQL, [
+                            (session, sensor, dt, dt + timedelta(seconds=seconds))
+                            for session, dt, seconds in rows
+                        ])
+                        continue
+
+                    columns = ', '.join(self.COLUMNS[table])
+                    # Only the written columns: no serial default burning an id per
+                    # staged row, rows skipped by ON CONFLICT included
+                    cur.execute(
+                        f"CREATE TEMP TABLE IF NOT EXISTS {table}_stage ON COMMIT DELETE ROWS "
+                        f"AS SELECT {columns} FROM {table} WITH NO DATA"
+                    )
+                    with cur.copy(f"COPY {table}_stage ({columns}) FROM STDIN") as copy:
+                        for row in rows:
+                            copy.write_row(row)
+
+                    # (session, datetime) identifies an event, so a replay after
+                    # a crash between commit and spool removal is harmless; rows
+                    # already stored are left out first, ON CONFLICT takes an id
+                    # from the sequence before it finds the conflict
+                    cur.execute(
+                        f"INSERT INTO {table} ({columns}) "
+                        f"SELECT {columns} FROM {table}_stage s "
+                        f"WHERE NOT EXISTS (SELECT 1 FROM {table} t "
+                        f"WHERE t.session = s.session AND t.datetime = s.datetime) "
+                        f"ON CONFLICT (session, datetime) DO NOTHING"
+                    )
+            # The pool commits the transaction when the block exits cleanly
+
+    def get_stats(self):
+        """Get ingest throughput and latency statistics"""
+        elapsed = time.time() - self.started_at
+        return {
+            'rows': self.rows_written,
+            'dropped': self.spool.rows_dropped,
+            'parked': self.spool.parked,
+            'batches': self.batches_written,
+            'pending': self.spool.count,
+            'rows_per_sec': self.rows_written / elapsed if elapsed > 0 else 0.0,
+            'rows_per_batch': self.rows_written / self.batches_written if self.batches_written else 0.0,
+            'write_ms_per_batch': 1000 * self.write_time / self.batches_written if self.batches_written else 0.0,
+            'avg_latency_ms': 1000 * self.latency_total / self.rows_written if self.rows_written else 0.0,
+            'max_latency_ms': 1000 * self.latency_max,
+        }
+
+    def report(self):
+        """Print ingest statistics"""
+        stats = self.get_stats()
+        print(f"DB writer: {stats['rows']} rows in {stats['batches']} batches "
+              f"({stats['rows_per_sec']:.2f} rows/s, {stats['rows_per_batch']:.1f} rows/batch, "
+              f"{stats['write_ms_per_batch']:.1f}ms/batch)")
+        print(f"DB writer: latency avg={stats['avg_latency_ms']:.1f}ms "
+              f"max={stats['max_latency_ms']:.1f}ms, "
+              f"pending={stats['pending']}, dropped={stats['dropped']}, parked={stats['parked']}")
+
+    def close(self):
+        """Stop the flush thread and write whatever is left"""
+        self.stop_event.set()
+        self.wakeup.set()
+        self.thread.join(timeout=5)
+        self.flush()
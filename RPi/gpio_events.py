@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Edge-driven GPIO event dispatching
+GPIO edge callbacks only timestamp the transition and queue it; a single
+dispatcher thread then hands each edge to the subscribed handlers. Nothing
+polls, so the dispatcher thread only wakes up when an edge arrives.
+
+SimulatedGPIO implements the parts of the RPi.GPIO API used by the app, so
+the dispatcher can be driven off the Pi:
+
+    gpio = SimulatedGPIO()
+    dispatcher = EdgeDispatcher(gpio)
+    dispatcher.subscribe('pir', print)
+    dispatcher.start()
+    dispatcher.watch_pin(18, 'pir')
+    gpio.set_input(18, gpio.HIGH)
+"""
+
+import threading
+import time
+from collections import namedtuple
+from queue import Queue
+
+
+# One transition of an input; monotonic is for latency, wall for the DB row
+EdgeEvent = namedtuple('EdgeEvent', ['source', 'state', 'monotonic', 'wall'])
+
+
+class SimulatedGPIO:
+    """In-memory stand-in for RPi.GPIO, edges are fired from a worker thread"""
+
+    BCM = 11
+    IN = 1
+    OUT = 0
+    LOW = 0
+    HIGH = 1
+    PUD_UP = 22
+    PUD_DOWN = 21
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self):
+        self.levels = {}
+        self.detectors = {}  # pin -> (edge, callback)
+        self.lock = threading.Lock()
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None):
+        with self.lock:
+            self.levels.setdefault(pin, self.HIGH if pull_up_down == self.PUD_UP else self.LOW)
+
+    def input(self, pin):
+        return self.levels.get(pin, self.LOW)
+
+    def output(self, pin, value):
+        with self.lock:
+            self.levels[pin] = value
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        with self.lock:
+            if pin in self.detectors:
+                raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+            self.detectors[pin] = (edge, callback)
+
+    def remove_event_detect(self, pin):
+        with self.lock:
+            self.detectors.pop(pin, None)
+
+    def cleanup(self):
+        with self.lock:
+            self.levels.clear()
+            self.detectors.clear()
+
+    def set_input(self, pin, value):
+        """Drive an input pin and fire its edge callback like the real library does"""
+        with self.lock:
+            old = self.levels.get(pin, self.LOW)
+            self.levels[pin] = value
+            edge, callback = self.detectors.get(pin, (None, None))
+
+        if callback is None or old == value:
+            return
+
+        rising = value == self.HIGH
+        if edge == self.BOTH or (edge == self.RISING) == rising:
+            # RPi.GPIO runs callbacks on its own thread, not the caller's
+            thread = threading.Thread(target=callback, args=(pin,), daemon=True)
+            thread.start()
+            thread.join()
+
+
+class EdgeDispatcher:
+    """Queues timestamped edges from GPIO callbacks and delivers them on one thread"""
+
+    def __init__(self, gpio):
+        self.gpio = gpio
+        self.handlers = {}
+        self.pins = {}  # pin -> source
+        self.queue = Queue()
+        self.thread = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Clear wakeup and latency statistics"""
+        self.last_state = {}
+        self.edges = 0
+        self.ignored = 0
+        self.wakeups = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.started_at = time.monotonic()
+
+    def subscribe(self, source, handler):
+        """Call handler(event) for every state change of source"""
+        self.handlers.setdefault(source, []).append(handler)
+
+    def watch_pin(self, pin, source, bouncetime=None):
+        """Report both edges of an input pin as source, starting from its current level"""
+        self.pins[pin] = source
+
+        def on_edge(channel):
+            self.post(source, bool(self.gpio.input(channel)))
+
+        if bouncetime:
+            self.gpio.add_event_detect(pin, self.gpio.BOTH, callback=on_edge, bouncetime=bouncetime)
+        else:
+            self.gpio.add_event_detect(pin, self.gpio.BOTH, callback=on_edge)
+
+        # An input already high at start is reported like an edge
+        if self.gpio.input(pin):
+            self.post(source, True)
+
+    def unwatch_pin(self, pin):
+        """Stop edge detection on a pin"""
+        if self.pins.pop(pin, None) is not None:
+            self.gpio.remove_event_detect(pin)
+
+    def post(self, source, state):
+        """Queue a transition, safe to call from interrupt callbacks and other threads"""
+        self.queue.put(EdgeEvent(source, state, time.monotonic(), time.time()))
+
+    def start(self):
+        """Start delivering events"""
+        if self.thread and self.thread.is_alive():
+            return
+        # Edges posted after the last stop belong to no session
+        self.queue = Queue()
+        self.reset_stats()
+        self.thread = threading.Thread(target=self.run, name="edge-dispatcher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Deliver what is queued, then stop"""
+        for pin in list(self.pins):
+            self.unwatch_pin(pin)
+        if self.thread:
+            self.queue.put(None)
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def run(self):
+        """Block until an edge arrives, no periodic wakeups"""
+        while True:
+            event = self.queue.get()
+            self.wakeups += 1
+            if event is None:
+                break
+
+            # Repeated levels are contact bounce or a duplicate report
+            if self.last_state.get(event.source, False) == event.state:
+                self.ignored += 1
+                continue
+            self.last_state[event.source] = event.state
+
+            for handler in self.handlers.get(event.source, []):
+                try:
+                    handler(event)
+                except Exception as e:
+                    print(f"Edge handler error ({event.source}): {e}")
+
+            latency = time.monotonic() - event.monotonic
+            self.edges += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def get_stats(self):
+        """Get wakeups per second and edge-to-handled latency"""
+        elapsed = time.monotonic() - self.started_at
+        return {
+            'edges': self.edges,
+            'ignored': self.ignored,
+            'wakeups_per_sec': self.wakeups / elapsed if elapsed > 0 else 0.0,
+            'avg_latency_ms': 1000 * self.latency_total / self.edges if self.edges else 0.0,
+            'max_latency_ms': 1000 * self.latency_max,
+        }
@@ -18,13 +18,14 @@ import time
 import threading
 import os
 import sys
-import subprocess
 import shlex
-import psycopg as pg
+import socket
+from psycopg_pool import ConnectionPool
 from datetime import datetime, timedelta
-from picamera2 import Picamera2
-from queue import Queue
+from picamera2 import Picamera2, MappedArray
+from queue import Queue, Empty, Full
 import signal
+import heapq
 from dotenv import load_dotenv
 import getpass
 import board
@@ -32,12 +33,19 @@ import busio
 import adafruit_mlx90640
 
 from PIL import Image
+import numpy as np
 import io
 
 # Add DFRobot library path
 sys.path.append("../")
 from DFRobot_C4001 import *
 
+from ssh_transport import SSHTransport, SFTP_CHANNELS
+from gpio_events import EdgeDispatcher
+from thermal_archive import ThermalArchiveWriter, ARCHIVE_FOLDER
+from presence import PresenceFusion, PresenceCoalescer, PRESENCE_HOLD
+from event_spool import EventSpool, EventWriter
+
 # GPIO Pin Configuration
 BUTTON_PIN = 17
 PIR_PIN = 18
@@ -54,6 +62,15 @@ DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
+DEVICE_NAME = os.getenv("DEVICE_NAME") or socket.gethostname()  # recorded in sessions.device
+
+# Database Writer Configuration (flush and spool settings are in event_spool.py)
+DB_POOL_SIZE = 2  # connections kept open to PostgreSQL
+
+# Presence Configuration
+# Sensors written as presence_interval rows instead of one row per edge; motion2
+# stays raw while the dashboard (Motion2 entity) reads the motion2 table directly
+PRESENCE_COALESCE = ('motion1',)
 
 IMDB_HOST = os.getenv("IMDB_HOST")
 IMDB_USER = os.getenv("IMDB_USER")
@@ -63,9 +80,31 @@ IMDB_PASSWORD = os.getenv("IMDB_PASSWORD")
 IMAGE_FOLDER = "motion_images"
 IMDB_FOLDER = "~/iot2025"
 IMAGE_INTERVAL = 30  # 2 minutes in seconds
+IMAGE_WIDTH = 1920
+IMAGE_HEIGHT = 1080
+IMAGE_QUALITY = 95
+CAPTURE_MODE = "fast"  # "fast": ISP scales to 1080p, "legacy": full sensor + PIL resize
+
+# Adaptive Sampling Configuration
+IMAGE_INTERVAL_MIN = 10  # seconds between images while someone is cooking
+IMAGE_INTERVAL_MAX = 120  # seconds between images while the kitchen is idle
+HEATING_RATE = 0.05  # Celsius per second (3 per minute) that counts as activity
+IDLE_AFTER = 300  # seconds without activity before backing off
+
+# Camera Pipeline Configuration
+PIPELINE_QUEUE_SIZE = 2  # frames waiting between two stages
+PIPELINE_POLICY = "drop_oldest"  # "drop_oldest" or "block" when a queue is full
 
 # Thermal Camera Configuration
 THERMAL_INTERVAL = 15  # 30 seconds
+THERMAL_INTERVAL_MIN = 5
+THERMAL_INTERVAL_MAX = 60
+THERMAL_REFRESH_RATE = "4"  # sensor refresh in Hz: "0_5", "1", "2", "4", "8", "16"
+THERMAL_ROWS = 24
+THERMAL_COLS = 32
+THERMAL_HISTORY = 8  # frames in the rate-of-change ring buffer
+HOTSPOT_THRESHOLD = 60.0  # pixels above this (Celsius) count as a hotspot
+THERMAL_ARCHIVE = True  # keep every frame of a session in ARCHIVE_FOLDER
 
 
 class TimeManager:
@@ -76,22 +115,18 @@ class TimeManager:
         self.username = username
         self.password = password or getpass.getpass(f"Password for {username}@{host}: ")
         self.time_delta = timedelta(0)
+
+        # Persistent SSH connection, shared with the image transfer manager
+        self.transport = SSHTransport(host, username, self.password)
         self.sync_time()
 
     def sync_time(self):
         """Synchronize time with Linux server"""
         try:
-            cmd = [
-                'sshpass', '-p', self.password,
-                'ssh', '-o', 'StrictHostKeyChecking=no',
-                f'{self.username}@{self.host}',
-                'date +"%Y-%m-%d %H:%M:%S"'
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+            status, stdout, stderr = self.transport.exec('date +"%Y-%m-%d %H:%M:%S"')
 
-            if result.returncode == 0:
-                server_time_str = result.stdout.strip()
+            if status == 0:
+                server_time_str = stdout.strip()
                 server_time = datetime.strptime(server_time_str, "%Y-%m-%d %H:%M:%S")
                 local_time = datetime.now()
                 self.time_delta = server_time - local_time
@@ -101,13 +136,9 @@ class TimeManager:
                 print(f"Local time: {local_time}")
                 return True
             else:
-                print(f"Time sync failed: {result.stderr}")
+                print(f"Time sync failed: {stderr}")
                 return False
 
-        except FileNotFoundError:
-            print("sshpass not found. Install with: sudo apt install sshpass")
-            print("Using local time instead")
-            return False
         except Exception as e:
             print(f"Time sync error: {e}")
             print("Using local time instead")
@@ -117,55 +148,44 @@ class TimeManager:
         """Get current time adjusted with server delta"""
         return datetime.now() + self.time_delta
 
+    def to_synced_time(self, timestamp):
+        """Convert a local time.time() timestamp to server time"""
+        return datetime.fromtimestamp(timestamp) + self.time_delta
+
 
 class ImageTransferManager:
     """Manages image transfer to Linux server"""
 
-    def __init__(self, host, username, password, remote_base_path):
+    def __init__(self, host, username, password, remote_base_path, transport=None):
         self.host = host
         self.username = username
         self.password = password
         self.remote_base_path = remote_base_path
+        self.transport = transport or SSHTransport(host, username, password)
 
     def create_remote_directory(self, remote_dir):
         """Create directory on remote server"""
         try:
-            cmd = [
-                'sshpass', '-p', self.password,
-                'ssh', '-o', 'StrictHostKeyChecking=no',
-                f'{self.username}@{self.host}',
-                f'mkdir -p {remote_dir}'
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-            return result.returncode == 0
+            return self.transport.mkdir(remote_dir)
 
         except Exception as e:
             print(f"Remote directory creation error: {e}")
             return False
 
-    def transfer_image_scp(self, local_path, remote_path):
-        """Transfer image using sshpass + scp (recommended for Raspberry Pi 3)"""
+    def transfer_image(self, local_path, remote_path):
+        """Transfer image over the persistent SFTP connection"""
         try:
-            cmd = [
-                'sshpass', '-p', self.password,
-                'scp', '-o', 'StrictHostKeyChecking=no',
-                local_path,
-                f'{self.username}@{self.host}:{remote_path}'
-            ]
-
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-
-            if result.returncode == 0:
-                return True
-            else:
-                print(f"SCP transfer failed: {result.stderr}")
-                return False
+            self.transport.put(local_path, remote_path)
+            return True
 
         except Exception as e:
-            print(f"SCP transfer error: {e}")
+            print(f"SFTP transfer error: {e}")
             return False
 
+    def close(self):
+        """Close the SSH connection"""
+        self.transport.close()
+
 
 class DatabaseManager:
     """Manages PostgreSQL database connections and operations"""
@@ -174,12 +194,22 @@ class DatabaseManager:
         self.conn_str = f'postgresql://{user}:{password}@{host}:{port}/{dbname}'
         self.current_session = 0
         self.time_manager = time_manager
+        self.sessions = False  # sessions table available (migrations/002)
+        self.intervals = False  # presence_interval table available (migrations/005)
+
+        # One long-lived pool shared by setup queries and the batch writer
+        self.pool = ConnectionPool(self.conn_str, min_size=1, max_size=DB_POOL_SIZE, open=True)
         self.init_database()
 
+        # Events are spooled locally first so an outage never loses them
+        self.spool = EventSpool()
+        self.writer = EventWriter(self.pool, self.spool, DEVICE_NAME)
+        self.writer.sessions = self.sessions
+
     def init_database(self):
         """Initialize database tables if they don't exist"""
         try:
-            with pg.connect(self.conn_str) as conn:
+            with self.pool.connection() as conn:
                 with conn.cursor() as cur:
                     # Create tables if they don't exist
                     cur.execute("""
@@ -218,66 +248,101 @@ class DatabaseManager:
                         )
                     """)
 
-                    # Get the latest session number
-                    cur.execute("SELECT MAX(session) FROM switch")
+                    # (session, datetime) identifies an event so replays can be idempotent
+                    for table in ('motion1', 'motion2', 'switch', 'temperature'):
+                        cur.execute(
+                            f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_session_datetime_key "
+                            f"ON {table} (session, datetime)"
+                        )
+
+                        # Monthly partitioned (migrations/001): keep this and next month ready
+                        cur.execute(
+                            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+                            (table,)
+                        )
+                        if cur.fetchone():
+                            cur.execute("SELECT create_month_partitions(%s, CURRENT_DATE, 2)", (table,))
+
+                    # Session ids come from the sessions sequence; its last value is
+                    # only the starting point for ids handed out while offline
+                    cur.execute("SELECT to_regclass('sessions') IS NOT NULL")
+                    self.sessions = cur.fetchone()[0]
+                    if self.sessions:
+                        cur.execute("SELECT last_value FROM sessions_id_seq")
+                    else:
+                        print("No sessions table, run migrate.py; numbering sessions from switch")
+                        cur.execute("SELECT MAX(session) FROM switch")
                     result = cur.fetchone()
                     if result[0] is not None:
                         self.current_session = result[0]
 
+                    cur.execute("SELECT to_regclass('presence_interval') IS NOT NULL")
+                    self.intervals = cur.fetchone()[0]
+
                     print("Database initialized successfully")
         except Exception as e:
             print(f"Database initialization error: {e}")
             sys.exit(1)
 
-    def insert_motion(self, table_name, session, value):
-        """Insert motion detection data"""
-        try:
-            with pg.connect(self.conn_str) as conn:
-                with conn.cursor() as cur:
-                    synced_time = self.time_manager.get_synced_time()
-                    cur.execute(
-                        f"INSERT INTO {table_name} (session, datetime, value) VALUES (%s, %s, %s)",
-                        (session, synced_time, value)
-                    )
-                conn.commit()
-            return True
-        except Exception as e:
-            print(f"Database insert error: {e}")
-            return False
+    def start_session(self, start_time):
+        """Allocate the next session id, creating its sessions row in one round trip"""
+        if self.sessions:
+            try:
+                with self.pool.connection(timeout=5) as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            "INSERT INTO sessions (device, start_time) VALUES (%s, %s) RETURNING id",
+                            (DEVICE_NAME, start_time)
+                        )
+                        self.current_session = cur.fetchone()[0]
+                return self.current_session
+            except Exception as e:
+                # The writer creates the row from this session's first events later
+                print(f"Session allocation error, numbering locally: {e}")
+
+        self.current_session += 1
+        return self.current_session
+
+    def end_session(self, session):
+        """Close the session row once its buffered events are written"""
+        if self.sessions:
+            synced_time = self.time_manager.get_synced_time()
+            self.writer.put('session_end', (session, synced_time, None))
+        return True
+
+    def insert_motion(self, table_name, session, value, synced_time=None):
+        """Insert motion detection data, stamped now unless the edge time is given"""
+        synced_time = synced_time or self.time_manager.get_synced_time()
+        self.writer.put(table_name, (session, synced_time, value))
+        return True
+
+    def insert_interval(self, sensor, session, start, end):
+        """Insert a coalesced presence interval of a motion sensor"""
+        self.writer.put(f"{sensor}_interval", (session, start, (end - start).total_seconds()))
+        return True
 
     def insert_switch(self, session, value):
         """Insert switch state data"""
-        # return self.insert_motion('switch', session, value)
-        try:
-            with pg.connect(self.conn_str) as conn:
-                with conn.cursor() as cur:
-                    synced_time = self.time_manager.get_synced_time()
-                    cur.execute(
-                        f"INSERT INTO {'switch'} (session, datetime, status) VALUES (%s, %s, %s)",
-                        (session, synced_time, value)
-                    )
-                conn.commit()
-            return True
-        except Exception as e:
-            print(f"Database insert error: {e}")
-            return False
+        synced_time = self.time_manager.get_synced_time()
+        self.writer.put('switch', (session, synced_time, value))
+        return True
 
     def insert_temperature(self, session, temperature):
         """Insert temperature data"""
-        # return self.insert_motion('temperature', session, value)
-        try:
-            with pg.connect(self.conn_str) as conn:
-                with conn.cursor() as cur:
-                    synced_time = self.time_manager.get_synced_time()
-                    cur.execute(
-                        f"INSERT INTO {'temperature'} (session, datetime, value) VALUES (%s, %s, %s)",
-                        (session, synced_time, temperature)
-                    )
-                conn.commit()
-            return True
-        except Exception as e:
-            print(f"Database insert error: {e}")
-            return False
+        synced_time = self.time_manager.get_synced_time()
+        self.writer.put('temperature', (session, synced_time, temperature))
+        return True
+
+    def flush(self):
+        """Have the writer thread write buffered events now and report ingest statistics after"""
+        self.writer.flush_soon(report=True)
+
+    def close(self):
+        """Flush remaining events and close the connection pool and spool"""
+        self.writer.close()
+        self.writer.report()
+        self.pool.close()
+        self.spool.close()
 
 
 class MLX90640Sensor:
@@ -285,7 +350,27 @@ class MLX90640Sensor:
 
     def __init__(self):
         self.mlx = None
-        self.frame = [0] * 768  # 32x24 = 768 pixels
+
+        # Preallocated buffers, getFrame fills the flat frame in place
+        self.frame = np.zeros(THERMAL_ROWS * THERMAL_COLS, dtype=np.float32)  # 32x24 = 768 pixels
+        self.image = self.frame.reshape(THERMAL_ROWS, THERMAL_COLS)  # view, no copy
+        self.hot_weights = np.zeros_like(self.image)
+        self.rate = np.zeros_like(self.image)  # Celsius per second
+        self.rows, self.cols = np.indices(self.image.shape, dtype=np.float32)
+
+        # Ring buffer of recent frames for the rate-of-change map
+        self.history = np.zeros((THERMAL_HISTORY,) + self.image.shape, dtype=np.float32)
+        self.history_times = np.zeros(THERMAL_HISTORY)
+        self.history_index = 0
+        self.history_count = 0
+
+        # Guards the frame buffers between the archive reader and stats
+        self.frame_lock = threading.Lock()
+
+        # Per-session frame archive, open while a session is running
+        self.archive = None
+        self.archive_lock = threading.Lock()
+
         self.setup()
 
     def setup(self):
@@ -297,11 +382,13 @@ class MLX90640Sensor:
             # Initialize MLX90640
             self.mlx = adafruit_mlx90640.MLX90640(i2c)
 
-            # Set refresh rate (2Hz for balanced performance)
-            self.mlx.refresh_rate = adafruit_mlx90640.RefreshRate.REFRESH_2_HZ
+            # Set refresh rate, vectorized stats keep up with the faster modes
+            self.mlx.refresh_rate = getattr(
+                adafruit_mlx90640.RefreshRate, f"REFRESH_{THERMAL_REFRESH_RATE}_HZ"
+            )
 
             print(f"MLX90640 thermal sensor initialized successfully")
-            print(f"Refresh rate: {self.mlx.refresh_rate}Hz")
+            print(f"Refresh rate: {THERMAL_REFRESH_RATE.replace('_', '.')}Hz")
             return True
 
         except Exception as e:
@@ -309,46 +396,101 @@ class MLX90640Sensor:
             print("Thermal monitoring will be disabled")
             return False
 
-    def get_max_temperature(self):
-        """Get the maximum temperature from the sensor"""
+    def start_archive(self, session, time_offset=0.0):
+        """Archive every frame read from now on under the given session"""
+        self.stop_archive()
+        with self.archive_lock:
+            self.archive = ThermalArchiveWriter(ARCHIVE_FOLDER, session, time_offset)
+
+    def stop_archive(self):
+        """Close the current session archive"""
+        with self.archive_lock:
+            archive, self.archive = self.archive, None
+            if archive:
+                archive.close()
+                print(f"Thermal archive: {archive.count} frames in {archive.frames_path}")
+
+    def read_frame(self):
+        """Read one frame into the preallocated buffer and the ring buffer"""
+        with self.frame_lock:
+            self._read_frame()
+
+    def _read_frame(self):
+        self.mlx.getFrame(self.frame)
+        now = time.time()
+
+        self.history[self.history_index] = self.image
+        self.history_times[self.history_index] = now
+        self.history_index = (self.history_index + 1) % THERMAL_HISTORY
+        self.history_count = min(self.history_count + 1, THERMAL_HISTORY)
+
+        with self.archive_lock:
+            if self.archive:
+                self.archive.append(self.frame, now)
+
+    def update_rate(self):
+        """Rate-of-change map between the oldest and newest buffered frames"""
+        if self.history_count < 2:
+            self.rate.fill(0)
+            return self.rate
+
+        newest = (self.history_index - 1) % THERMAL_HISTORY
+        oldest = (self.history_index - self.history_count) % THERMAL_HISTORY
+        dt = self.history_times[newest] - self.history_times[oldest]
+        if dt <= 0:
+            self.rate.fill(0)
+            return self.rate
+
+        np.subtract(self.history[newest], self.history[oldest], out=self.rate)
+        self.rate /= dt
+        return self.rate
+
+    def get_temperature_stats(self, read=True):
+        """Get temperature statistics (max, min, average, percentiles, hotspots, rate)"""
         if not self.mlx:
             return None
 
         try:
-            # Get temperature data
-            self.mlx.getFrame(self.frame)
-
-            # Find and return maximum temperature
-            max_temp = max(self.frame)
-            return max_temp
+            with self.frame_lock:
+                return self._temperature_stats(read)
 
         except Exception as e:
-            print(f"Error reading thermal data: {e}")
-            return None
-
-    def get_temperature_stats(self):
-        """Get temperature statistics (max, min, average)"""
-        if not self.mlx:
+            print(f"Error calculating thermal stats: {e}")
             return None
 
-        try:
+    def _temperature_stats(self, read):
+        if read or self.history_count == 0:
             # Get temperature data
-            self.mlx.getFrame(self.frame)
+            self._read_frame()
+
+        # Calculate statistics
+        p50, p90, p99 = np.percentile(self.frame, (50, 90, 99))
+
+        # Hotspot pixels, weighted by how far they are above the threshold
+        np.subtract(self.image, HOTSPOT_THRESHOLD, out=self.hot_weights)
+        np.maximum(self.hot_weights, 0, out=self.hot_weights)
+        hotspot_count = int(np.count_nonzero(self.hot_weights))
+        weight = float(self.hot_weights.sum())
+        if weight > 0:
+            centroid = (float((self.hot_weights * self.rows).sum() / weight),
+                        float((self.hot_weights * self.cols).sum() / weight))
+        else:
+            centroid = None
 
-            # Calculate statistics
-            max_temp = max(self.frame)
-            min_temp = min(self.frame)
-            avg_temp = sum(self.frame) / len(self.frame)
+        rate = self.update_rate()
 
-            return {
-                'max': max_temp,
-                'min': min_temp,
-                'avg': avg_temp
-            }
-
-        except Exception as e:
-            print(f"Error calculating thermal stats: {e}")
-            return None
+        return {
+            'max': float(self.frame.max()),
+            'min': float(self.frame.min()),
+            'avg': float(self.frame.mean()),
+            'p50': float(p50),
+            'p90': float(p90),
+            'p99': float(p99),
+            'hotspot_count': hotspot_count,
+            'hotspot_centroid': centroid,  # (row, col) or None
+            'max_rate': float(rate.max()),  # fastest heating pixel, Celsius per second
+            'rate_map': rate  # reused buffer, copy it to keep it
+        }
 
 
 class C4001Sensor:
@@ -384,16 +526,137 @@ class C4001Sensor:
             return False
 
 
+class StageQueue:
+    """Bounded queue between two pipeline stages"""
+
+    def __init__(self, maxsize=PIPELINE_QUEUE_SIZE, policy=PIPELINE_POLICY, on_drop=None):
+        if policy not in ("drop_oldest", "block"):
+            raise ValueError(f"Unknown back-pressure policy: {policy}")
+        self.queue = Queue(maxsize)
+        self.policy = policy
+        self.on_drop = on_drop  # called with every discarded item
+        self.dropped = 0
+        self.max_depth = 0
+
+    def put(self, item):
+        """Add an item, blocking or discarding the oldest one when full"""
+        if self.policy == "block":
+            self.queue.put(item)
+        else:
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    break
+                except Full:
+                    try:
+                        old_item = self.queue.get_nowait()
+                        self.dropped += 1
+                        if self.on_drop:
+                            self.on_drop(old_item)
+                    except Empty:
+                        pass
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def get(self, timeout=None):
+        """Get the next item, or None after the timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+    def depth(self):
+        """Get the number of waiting items"""
+        return self.queue.qsize()
+
+
+class PipelineStage:
+    """Worker thread running one step of the camera pipeline"""
+
+    def __init__(self, name, func, inbox, outbox=None):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop_event = threading.Event()
+
+        # Stage statistics
+        self.processed = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+        self.thread = threading.Thread(target=self.run, name=f"camera-{name}", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        """Process items until stopped"""
+        while not self.stop_event.is_set():
+            item = self.inbox.get(timeout=0.5)
+            if item is None:
+                continue
+
+            tic = time.time()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                print(f"Camera {self.name} error: {e}")
+                self.errors += 1
+                continue
+
+            latency = time.time() - tic
+            self.processed += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+            if self.outbox is not None and result is not None:
+                self.outbox.put(result)
+
+    def get_stats(self):
+        """Get latency and queue depth of this stage"""
+        return {
+            'processed': self.processed,
+            'errors': self.errors,
+            'avg_latency_ms': 1000 * self.latency_total / self.processed if self.processed else 0.0,
+            'max_latency_ms': 1000 * self.latency_max,
+            'queue_depth': self.inbox.depth(),
+            'max_queue_depth': self.inbox.max_depth,
+            'dropped': self.inbox.dropped,
+        }
+
+    def stop(self):
+        """Stop the worker thread"""
+        self.stop_event.set()
+        self.thread.join(timeout=5)
+
+
 class CameraManager:
     """Manages Raspberry Pi Camera operations"""
 
-    def __init__(self, local_base_path, time_manager, transfer_manager):
+    def __init__(self, local_base_path, time_manager, transfer_manager, capture_mode=CAPTURE_MODE):
+        if capture_mode not in ("fast", "legacy"):
+            raise ValueError(f"Unknown capture mode: {capture_mode}")
         self.local_base_path = local_base_path
         self.time_manager = time_manager
         self.transfer_manager = transfer_manager
+        self.capture_mode = capture_mode
         self.camera = None
+        self.frame_size = None
         self.current_session_folder = None
         self.setup_camera()
+        self.setup_canvases()
+        self.setup_pipeline()
+
+    @staticmethod
+    def fit_size(size, target_width=IMAGE_WIDTH, target_height=IMAGE_HEIGHT):
+        """Get the largest size with the aspect ratio of size that fits the target"""
+        aspect_ratio = size[0] / size[1]
+
+        if aspect_ratio > (target_width / target_height):
+            # Image is wider - fit to width
+            return target_width, int(target_width / aspect_ratio)
+        else:
+            # Image is taller - fit to height
+            return int(target_height * aspect_ratio), target_height
 
     def setup_camera(self):
         """Initialize camera"""
@@ -404,10 +667,20 @@ class CameraManager:
             camera_properties = self.camera.camera_properties
             sensor_resolution = camera_properties['PixelArraySize']
 
-            config = self.camera.create_still_configuration(
-                main={"size": sensor_resolution},  # Full HD
-                buffer_count=1  # Memory optimization
-            )
+            if self.capture_mode == "fast":
+                # Let the ISP scale to the final size and hand over raw RGB pixels,
+                # Picamera2's "BGR888" is R, G, B in memory
+                config = self.camera.create_still_configuration(
+                    main={"size": self.fit_size(sensor_resolution), "format": "BGR888"},
+                    buffer_count=2
+                )
+                self.camera.align_configuration(config)
+                self.frame_size = config["main"]["size"]
+            else:
+                config = self.camera.create_still_configuration(
+                    main={"size": sensor_resolution},  # Full HD
+                    buffer_count=1  # Memory optimization
+                )
             self.camera.configure(config)
             self.camera.start()
             time.sleep(2)  # Camera warm-up
@@ -415,6 +688,34 @@ class CameraManager:
         except Exception as e:
             print(f"Camera initialization error: {e}")
 
+    def setup_canvases(self):
+        """Preallocate black 1080p canvases, one per frame that can be in flight"""
+        self.canvases = Queue()
+        if self.capture_mode == "fast":
+            for _ in range(PIPELINE_QUEUE_SIZE + 2):
+                self.canvases.put(np.zeros((IMAGE_HEIGHT, IMAGE_WIDTH, 3), dtype=np.uint8))
+
+    def release_frame(self, frame):
+        """Return the canvas of a finished or dropped frame to the pool"""
+        if 'canvas' in frame:
+            self.canvases.put(frame.pop('canvas'))
+
+    def setup_pipeline(self):
+        """Start capture -> encode -> transfer workers joined by bounded queues"""
+        self.capture_requests = StageQueue()
+        self.captured_frames = StageQueue(on_drop=self.release_frame)
+        self.encoded_files = StageQueue()
+        self.stages = [
+            PipelineStage("capture", self.capture_frame, self.capture_requests, self.captured_frames),
+            PipelineStage("encode", self.encode_frame, self.captured_frames, self.encoded_files),
+        ]
+
+        # One transfer worker per SFTP channel keeps several uploads in flight
+        for i in range(SFTP_CHANNELS):
+            self.stages.append(
+                PipelineStage(f"transfer{i + 1}", self.transfer_frame, self.encoded_files)
+            )
+
     def create_session_folder(self, session_id):
         """Create folder for current session locally and remotely"""
         synced_time = self.time_manager.get_synced_time()
@@ -436,93 +737,140 @@ class CameraManager:
         self.current_session_folder = folder_name
         return folder_name
 
-    def capture_and_transfer_image(self, session_id):
-        """Capture image and transfer to server"""
+    def request_capture(self, session_id):
+        """Queue a capture without waiting for encoding or upload"""
         if not self.current_session_folder:
             self.create_session_folder(session_id)
 
+        self.capture_requests.put((session_id, self.current_session_folder))
+        return True
+
+    def capture_frame(self, request):
+        """Pipeline stage 1: grab a frame from the camera"""
+        session_id, folder = request
+
+        # Generate filename with synced timestamp
+        synced_time = self.time_manager.get_synced_time()
+        timestamp = synced_time.strftime("%Y%m%d_%H%M%S")
+        filename = f"img_{session_id}_{timestamp}.jpg"
+
+        if self.capture_mode == "fast":
+            return {'folder': folder, 'filename': filename, 'canvas': self.capture_canvas()}
+
+        # Capture image
+        image_buffer = io.BytesIO()
+        self.camera.capture_file(image_buffer, format='jpeg')
+        image_buffer.seek(0)
+
+        return {'folder': folder, 'filename': filename, 'buffer': image_buffer}
+
+    def capture_canvas(self):
+        """Copy the next camera frame straight into the centre of a free canvas"""
+        # Waiting here is the back-pressure when every canvas is still in flight
+        canvas = self.canvases.get(timeout=10)
+
         try:
-            # Generate filename with synced timestamp
-            synced_time = self.time_manager.get_synced_time()
-            timestamp = synced_time.strftime("%Y%m%d_%H%M%S")
-            filename = f"img_{session_id}_{timestamp}.jpg"
-
-            # Local path
-            local_filepath = os.path.join(
-                self.local_base_path,
-                self.current_session_folder,
-                filename
-            )
+            width = min(self.frame_size[0], IMAGE_WIDTH)
+            height = min(self.frame_size[1], IMAGE_HEIGHT)
+            x_offset = (IMAGE_WIDTH - width) // 2
+            y_offset = (IMAGE_HEIGHT - height) // 2
+
+            # MappedArray is a view of the camera buffer, so this is the only copy
+            with self.camera.captured_request() as request:
+                with MappedArray(request, "main") as mapped:
+                    canvas[y_offset:y_offset + height, x_offset:x_offset + width] = \
+                        mapped.array[:height, :width, :3]
+        except Exception:
+            self.canvases.put(canvas)
+            raise
+
+        return canvas
+
+    def encode_frame(self, frame):
+        """Pipeline stage 2: resize to 1080p and save the JPEG locally"""
+        # Local path
+        local_filepath = os.path.join(
+            self.local_base_path,
+            frame['folder'],
+            frame['filename']
+        )
 
-            # Capture image
-            image_buffer = io.BytesIO()
-            self.camera.capture_file(image_buffer, format='jpeg')
-            image_buffer.seek(0)
+        if 'canvas' in frame:
+            # Fast path: already letterboxed at 1080p, encode exactly once
+            try:
+                Image.fromarray(frame['canvas'], 'RGB').save(
+                    local_filepath, 'JPEG', quality=IMAGE_QUALITY
+                )
+            finally:
+                self.release_frame(frame)
+        else:
+            self.resize_and_save(frame['buffer'], local_filepath)
 
-            # Open image with PIL and resize to 1080p
-            img = Image.open(image_buffer)
-            original_size = img.size
+        file_size = os.path.getsize(local_filepath) / 1024  # KB
+        print(f"Image captured: {frame['filename']} ({file_size:.1f}KB)")
 
-            # Calculate new size maintaining aspect ratio
-            target_width = 1920
-            target_height = 1080
+        return {'folder': frame['folder'], 'filename': frame['filename'], 'path': local_filepath}
 
-            # Get original aspect ratio
-            aspect_ratio = original_size[0] / original_size[1]
+    def resize_and_save(self, image_buffer, local_filepath):
+        """Legacy path: decode the full-size JPEG, resize, letterbox and re-encode"""
+        # Open image with PIL and resize to 1080p
+        img = Image.open(image_buffer)
 
-            # Calculate dimensions to maintain aspect ratio
-            if aspect_ratio > (target_width / target_height):
-                # Image is wider - fit to width
-                new_width = target_width
-                new_height = int(target_width / aspect_ratio)
-            else:
-                # Image is taller - fit to height
-                new_height = target_height
-                new_width = int(target_height * aspect_ratio)
-
-            # Resize image using high-quality Lanczos resampling
-            img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-            # If the resized image doesn't match 1920x1080 exactly,
-            # create a new image with black borders (letterboxing/pillarboxing)
-            if new_width != target_width or new_height != target_height:
-                # Create new 1920x1080 image with black background
-                final_img = Image.new('RGB', (target_width, target_height), (0, 0, 0))
-
-                # Calculate position to center the resized image
-                x_offset = (target_width - new_width) // 2
-                y_offset = (target_height - new_height) // 2
-
-                # Paste resized image onto black background
-                final_img.paste(img_resized, (x_offset, y_offset))
-                img_resized = final_img
-
-            # Save resized image locally with adjustable quality
-            img_resized.save(local_filepath, 'JPEG', quality=95, optimize=True)
-
-            file_size = os.path.getsize(local_filepath) / 1024  # KB
-            print(f"Image captured: {filename} ({file_size:.1f}KB)")
-
-            # Transfer to server
-            remote_filepath = os.path.join(
-                self.transfer_manager.remote_base_path,
-                self.current_session_folder,
-                filename
-            )
+        # Calculate new size maintaining aspect ratio
+        target_width = IMAGE_WIDTH
+        target_height = IMAGE_HEIGHT
+        new_width, new_height = self.fit_size(img.size)
 
-            if self.transfer_manager.transfer_image_scp(local_filepath, remote_filepath):
-                print(f"Image transferred to server: {filename}")
-            else:
-                print(f"Failed to transfer image: {filename}")
+        # Resize image using high-quality Lanczos resampling
+        img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
 
-            return True
+        # If the resized image doesn't match 1920x1080 exactly,
+        # create a new image with black borders (letterboxing/pillarboxing)
+        if new_width != target_width or new_height != target_height:
+            # Create new 1920x1080 image with black background
+            final_img = Image.new('RGB', (target_width, target_height), (0, 0, 0))
 
-        except Exception as e:
-            print(f"Image capture/transfer error: {e}")
-            return False
+            # Calculate position to center the resized image
+            x_offset = (target_width - new_width) // 2
+            y_offset = (target_height - new_height) // 2
+
+            # Paste resized image onto black background
+            final_img.paste(img_resized, (x_offset, y_offset))
+            img_resized = final_img
+
+        # Save resized image locally with adjustable quality
+        img_resized.save(local_filepath, 'JPEG', quality=IMAGE_QUALITY, optimize=True)
+
+    def transfer_frame(self, item):
+        """Pipeline stage 3: upload the saved JPEG to the server"""
+        remote_filepath = os.path.join(
+            self.transfer_manager.remote_base_path,
+            item['folder'],
+            item['filename']
+        )
+
+        if self.transfer_manager.transfer_image(item['path'], remote_filepath):
+            print(f"Image transferred to server: {item['filename']}")
+        else:
+            print(f"Failed to transfer image: {item['filename']}")
+
+    def get_pipeline_stats(self):
+        """Get per-stage latency and queue depth"""
+        return {stage.name: stage.get_stats() for stage in self.stages}
+
+    def report(self):
+        """Print pipeline statistics"""
+        for name, stats in self.get_pipeline_stats().items():
+            print(f"Camera {name}: {stats['processed']} done, {stats['errors']} errors, "
+                  f"latency avg={stats['avg_latency_ms']:.0f}ms max={stats['max_latency_ms']:.0f}ms, "
+                  f"queue={stats['queue_depth']} (max {stats['max_queue_depth']}), "
+                  f"dropped={stats['dropped']}")
 
     def cleanup(self):
         """Clean up camera resources"""
+        for stage in self.stages:
+            stage.stop()
+
         if self.camera:
             try:
                 self.camera.stop()
@@ -531,12 +879,171 @@ class CameraManager:
                 pass
 
 
+class SamplingJob:
+    """A periodic job of the sampling scheduler"""
+
+    def __init__(self, name, func, interval, min_interval, max_interval):
+        self.name = name
+        self.func = func
+        self.interval = interval  # used while recently active
+        self.min_interval = min_interval  # used while active
+        self.max_interval = max_interval  # used while idle
+        self.deadline = None
+        self.runs = 0
+        self.last_interval = interval
+
+
+class SamplingScheduler:
+    """Runs sampling jobs from one timer heap, faster while the kitchen is busy"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.heap = []  # (deadline, sequence, name), stale entries are skipped
+        self.sequence = 0
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopped = True
+
+        # Activity signals
+        self.presence = False
+        self.heating = False
+        self.last_activity = time.time()
+
+    def add_job(self, name, func, interval, min_interval, max_interval):
+        """Register a job, it first runs one interval after start"""
+        with self.condition:
+            self.jobs[name] = SamplingJob(name, func, interval, min_interval, max_interval)
+
+    def _schedule(self, job, deadline):
+        job.deadline = deadline
+        self.sequence += 1
+        heapq.heappush(self.heap, (deadline, self.sequence, job.name))
+        self.condition.notify()
+
+    def activity(self):
+        """Get 'active', 'recent' or 'idle'"""
+        if self.presence or self.heating:
+            return 'active'
+        if time.time() - self.last_activity < IDLE_AFTER:
+            return 'recent'
+        return 'idle'
+
+    def interval_for(self, job):
+        """Get the interval of a job for the current activity"""
+        activity = self.activity()
+        if activity == 'active':
+            return job.min_interval
+        if activity == 'recent':
+            return job.interval
+        return job.max_interval
+
+    def _signal(self, presence=None, heating=None):
+        with self.condition:
+            was_active = self.presence or self.heating
+            if presence is not None:
+                self.presence = presence
+            if heating is not None:
+                self.heating = heating
+
+            active = self.presence or self.heating
+            if active or was_active:
+                self.last_activity = time.time()
+
+            # Pull in deadlines that were set for a slower rate
+            if active and not was_active:
+                now = time.time()
+                for job in self.jobs.values():
+                    if job.deadline is not None and job.deadline > now + job.min_interval:
+                        self._schedule(job, now + job.min_interval)
+
+    def set_presence(self, presence):
+        """Report whether someone is at the stove"""
+        self._signal(presence=presence)
+
+    def set_heating_rate(self, rate):
+        """Report how fast the hottest point is rising, Celsius per second"""
+        self._signal(heating=rate >= HEATING_RATE)
+
+    def trigger(self, name):
+        """Run a job as soon as possible"""
+        with self.condition:
+            self._schedule(self.jobs[name], time.time())
+
+    def start(self):
+        """Start the timer thread, every job runs one interval from now"""
+        with self.condition:
+            self.stopped = False
+            self.heap = []
+            # Signals of the last session are stale, fusion resets without publishing
+            self.presence = False
+            self.heating = False
+            self.last_activity = time.time()
+            now = time.time()
+            for job in self.jobs.values():
+                job.runs = 0
+                self._schedule(job, now + job.interval)
+
+        self.thread = threading.Thread(target=self.run, name="sampling-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the timer thread"""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread:
+            self.thread.join(timeout=10)
+            self.thread = None
+
+    def run(self):
+        """Sleep until the earliest deadline, run that job and schedule it again"""
+        while True:
+            with self.condition:
+                if self.stopped:
+                    return
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+
+                deadline, _, name = self.heap[0]
+                job = self.jobs[name]
+                if deadline != job.deadline:
+                    # Superseded by a trigger or a pulled-in deadline
+                    heapq.heappop(self.heap)
+                    continue
+
+                delay = deadline - time.time()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+
+                heapq.heappop(self.heap)
+                job.deadline = None
+
+            try:
+                job.func()
+            except Exception as e:
+                print(f"Scheduled {job.name} error: {e}")
+            job.runs += 1
+
+            with self.condition:
+                # A trigger while running already set the next deadline
+                if job.deadline is None:
+                    job.last_interval = self.interval_for(job)
+                    self._schedule(job, time.time() + job.last_interval)
+
+    def report(self):
+        """Print runs and current interval per job"""
+        for job in self.jobs.values():
+            print(f"Scheduler {job.name}: {job.runs} runs, interval {job.last_interval}s "
+                  f"({self.activity()})")
+
+
 class CookingMonitorSystem:
     """Main IoT application controller"""
 
     def __init__(self):
         self.running = False
-        self.motion_detected = False
         self.system_active = False
         self.current_session = 0
 
@@ -554,29 +1061,49 @@ class CookingMonitorSystem:
         self.transfer_manager = ImageTransferManager(
             IMDB_HOST, IMDB_USER,
             self.time_manager.password,  # Reuse the password
-            IMDB_FOLDER
+            IMDB_FOLDER,
+            self.time_manager.transport  # and the SSH connection
         )
 
         # Initialize camera with transfer capability
         self.camera = CameraManager(IMAGE_FOLDER, self.time_manager, self.transfer_manager)
 
-        # Threading events and queues
+        # Threading events
         self.stop_event = threading.Event()
-        self.motion_queue = Queue()
 
-        # Immediate capture flags
-        self.immediate_image_flag = False
-        self.immediate_thermal_flag = False
-
-        # Motion states for sensors
-        self.pir_motion = False
-        self.c4001_motion = False
-        self.last_pir_state = False
+        # Last polled C4001 state
         self.last_c4001_state = False
 
+        # PIR, C4001 and thermal hotspots fused into one presence state
+        self.fusion = PresenceFusion()
+        self.fusion.subscribe(self.update_led)
+        self.fusion.subscribe(self.on_presence)
+
+        # Sensor edges are delivered by one dispatcher thread instead of polling
+        self.dispatcher = EdgeDispatcher(GPIO)
+        self.dispatcher.subscribe('pir', self.on_pir_edge)
+        self.dispatcher.subscribe('c4001', self.on_c4001_edge)
+
+        # Flapping edges and the fused state are merged into intervals before they are written
+        self.coalescer = None
+        if self.db.intervals:
+            self.coalescer = PresenceCoalescer(self.on_presence_interval, PRESENCE_HOLD,
+                                               self.time_manager.get_synced_time)
+        else:
+            print("No presence_interval table, run migrate.py; writing every motion edge")
+
         # Thermal monitoring
         self.thermal_enabled = self.mlx90640.mlx is not None
         self.last_temperature = None
+        self.last_temperature_time = None
+
+        # One timer heap drives image and temperature sampling
+        self.scheduler = SamplingScheduler()
+        self.scheduler.add_job('camera', self.capture_job,
+                               IMAGE_INTERVAL, IMAGE_INTERVAL_MIN, IMAGE_INTERVAL_MAX)
+        if self.thermal_enabled:
+            self.scheduler.add_job('thermal', self.thermal_job,
+                                   THERMAL_INTERVAL, THERMAL_INTERVAL_MIN, THERMAL_INTERVAL_MAX)
 
         print("\nSystem initialized. Press the button to start/stop monitoring.")
 
@@ -626,9 +1153,8 @@ class CookingMonitorSystem:
         GPIO.output(LED_RED_PIN, GPIO.LOW)
         GPIO.output(LED_GREEN_PIN, GPIO.HIGH)
 
-        # Increment session
-        self.db.current_session += 1
-        self.current_session = self.db.current_session
+        # Allocate session
+        self.current_session = self.db.start_session(self.time_manager.get_synced_time())
 
         # Create session folder for images
         self.camera.create_session_folder(self.current_session)
@@ -639,29 +1165,34 @@ class CookingMonitorSystem:
         synced_time = self.time_manager.get_synced_time()
         print(f"Session {self.current_session} started at {synced_time.strftime('%Y-%m-%d %H:%M:%S')}")
 
-        # Set flags for immediate capture (will be handled by threads)
-        self.immediate_image_flag = True
-        self.immediate_thermal_flag = self.thermal_enabled
-
         print("Queuing immediate captures...")
         print("Monitoring active. Press button to stop.")
         print("=" * 50 + "\n")
 
+        if self.coalescer:
+            self.coalescer.reset_stats()
+
+        # PIR edges arrive by interrupt, the C4001 is read over UART so it is still polled
+        self.dispatcher.start()
+        self.dispatcher.watch_pin(PIR_PIN, 'pir')
+
         # Start monitoring threads
-        self.pir_thread = threading.Thread(target=self.monitor_pir)
         self.c4001_thread = threading.Thread(target=self.monitor_c4001)
-        self.camera_thread = threading.Thread(target=self.camera_loop)
-        self.led_thread = threading.Thread(target=self.update_led)
+        self.c4001_thread.start()
 
-        # Start thermal monitoring if sensor is available
-        if self.thermal_enabled:
-            self.thermal_thread = threading.Thread(target=self.monitor_thermal)
+        # Archive every thermal frame if sensor is available
+        self.last_temperature = self.last_temperature_time = None
+        if self.thermal_enabled and THERMAL_ARCHIVE:
+            self.mlx90640.start_archive(self.current_session,
+                                        self.time_manager.time_delta.total_seconds())
+            self.thermal_thread = threading.Thread(target=self.thermal_archive_loop)
             self.thermal_thread.start()
 
-        self.pir_thread.start()
-        self.c4001_thread.start()
-        self.camera_thread.start()
-        self.led_thread.start()
+        # Start sampling, with one immediate image and temperature reading
+        self.scheduler.start()
+        self.scheduler.trigger('camera')
+        if self.thermal_enabled:
+            self.scheduler.trigger('thermal')
 
     def stop_system(self):
         """Stop the monitoring system"""
@@ -675,80 +1206,102 @@ class CookingMonitorSystem:
         self.running = False
         self.stop_event.set()
 
-        # Record switch OFF
+        # Deliver pending edges and stop sampling before the session is closed
+        self.dispatcher.stop()
+        self.scheduler.stop()
+        self.scheduler.report()
+
+        # Presence ends with the session
+        stats = self.fusion.get_stats()
+        print(f"Presence: {stats['updates']} sensor updates -> {stats['changes']} state changes")
+        self.fusion.reset()
+
+        # Write the intervals still open, they end with the session
+        if self.coalescer:
+            self.coalescer.close(self.time_manager.get_synced_time())
+            self.coalescer.report()
+
+        # Close the thermal frame archive of this session
+        self.mlx90640.stop_archive()
+
+        # Record switch OFF and push everything buffered for this session; the
+        # writer thread does it, a slow database never stalls the button callback
         self.db.insert_switch(self.current_session, False)
+        self.db.end_session(self.current_session)
+        self.db.flush()
 
         # Reset switch states
-        self.pir_motion = False
-        self.c4001_motion = False
-        self.motion_detected = False
-        self.last_pir_state = False
         self.last_c4001_state = False
 
         # Reset LED to green
         GPIO.output(LED_RED_PIN, GPIO.LOW)
         GPIO.output(LED_GREEN_PIN, GPIO.HIGH)
 
+        stats = self.dispatcher.get_stats()
+        print(f"Edges: {stats['edges']} handled, {stats['ignored']} ignored, "
+              f"{stats['wakeups_per_sec']:.2f} wakeups/s, edge-to-DB "
+              f"avg={stats['avg_latency_ms']:.1f}ms max={stats['max_latency_ms']:.1f}ms")
+
         # Clear session folder reference
         self.camera.current_session_folder = None
+        self.camera.report()
 
         print(f"Session {self.current_session} ended")
         print("System stopped. Press button to start.")
         print("=" * 50 + "\n")
 
-    def monitor_pir(self):
-        """Monitor PIR sensor in a thread"""
-        while self.running:
-            try:
-                current_state = GPIO.input(PIR_PIN)
+    def on_pir_edge(self, event):
+        """Handle a PIR transition, timestamped when the interrupt fired"""
+        synced_time = self.time_manager.to_synced_time(event.wall)
 
-                if self.last_pir_state is False and current_state == GPIO.LOW:
-                    self.last_pir_state = GPIO.LOW
+        # Record to database
+        self.record_motion('motion1', event.state, synced_time)
 
-                if current_state != self.last_pir_state:
-                    self.last_pir_state = current_state
-                    motion = bool(current_state)
+        # Update presence
+        self.fusion.update('pir', event.state)
 
-                    # Record to database
-                    self.db.insert_motion('motion1', self.current_session, motion)
+        timestamp = synced_time.strftime('%H:%M:%S')
+        if event.state:
+            print(f"[{timestamp}] PIR: Motion detected")
+        else:
+            print(f"[{timestamp}] PIR: Motion ended")
 
-                    # Update motion state
-                    self.pir_motion = motion
+    def on_c4001_edge(self, event):
+        """Handle a C4001 transition"""
+        synced_time = self.time_manager.to_synced_time(event.wall)
 
-                    synced_time = self.time_manager.get_synced_time()
-                    timestamp = synced_time.strftime('%H:%M:%S')
-                    if motion:
-                        print(f"[{timestamp}] PIR: Motion detected")
-                    else:
-                        print(f"[{timestamp}] PIR: Motion ended")
+        # Record to database
+        self.record_motion('motion2', event.state, synced_time)
 
-                time.sleep(0.1)
+        # Update presence
+        self.fusion.update('c4001', event.state)
 
-            except Exception as e:
-                print(f"PIR monitoring error: {e}")
-                time.sleep(1)
+        timestamp = synced_time.strftime('%H:%M:%S')
+        if event.state:
+            print(f"[{timestamp}] C4001: Motion detected")
+        else:
+            print(f"[{timestamp}] C4001: Motion ended")
+
+    def record_motion(self, table, state, synced_time):
+        """Write a motion edge, or hand it to the coalescer which writes intervals"""
+        if self.coalescer and table in PRESENCE_COALESCE:
+            self.coalescer.edge(table, state, synced_time)
+        else:
+            self.db.insert_motion(table, self.current_session, state, synced_time)
+
+    def on_presence_interval(self, sensor, start, end):
+        """Write an interval closed by the coalescer"""
+        self.db.insert_interval(sensor, self.current_session, start, end)
 
     def monitor_c4001(self):
-        """Monitor C4001 mmWave sensor in a thread"""
+        """Poll C4001 mmWave sensor over UART and post its transitions"""
         while self.running:
             try:
                 current_state = self.c4001.detect_motion()
 
                 if current_state != self.last_c4001_state:
                     self.last_c4001_state = current_state
-
-                    # Record to database
-                    self.db.insert_motion('motion2', self.current_session, current_state)
-
-                    # Update motion state
-                    self.c4001_motion = current_state
-
-                    synced_time = self.time_manager.get_synced_time()
-                    timestamp = synced_time.strftime('%H:%M:%S')
-                    if current_state:
-                        print(f"[{timestamp}] C4001: Motion detected")
-                    else:
-                        print(f"[{timestamp}] C4001: Motion ended")
+                    self.dispatcher.post('c4001', current_state)
 
                 time.sleep(0.1)
 
@@ -756,149 +1309,82 @@ class CookingMonitorSystem:
                 print(f"C4001 monitoring error: {e}")
                 time.sleep(1)
 
-    def monitor_thermal(self):
-        """Monitor thermal camera in a thread"""
-        # Wait a moment for system to initialize
-        time.sleep(0.5)
-
-        next_reading = time.time() + THERMAL_INTERVAL
-
-        while self.running:
-            try:
-                # Check for immediate thermal capture flag
-                if self.immediate_thermal_flag:
-
-                    print(f"\n[Thermal] Processing immediate temperature reading...")
+    def thermal_job(self):
+        """Scheduled temperature reading"""
+        # The archive thread is already reading every frame, reuse the latest one
+        temp_stats = self.mlx90640.get_temperature_stats(read=not self.mlx90640.archive)
 
-                    # Get temperature statistics
-                    temp_stats = self.mlx90640.get_temperature_stats()
+        if temp_stats:
+            max_temp = temp_stats['max']
+            avg_temp = temp_stats['avg']
 
-                    if temp_stats:
-                        max_temp = temp_stats['max']
-                        avg_temp = temp_stats['avg']
+            # Store maximum temperature in database
+            self.db.insert_temperature(self.current_session, max_temp)
 
-                        # Store in database
-                        self.db.insert_temperature(self.current_session, max_temp)
+            # A hot pan backs up the motion sensors while someone cooks
+            self.fusion.update('hotspot', temp_stats['hotspot_count'] > 0)
 
-                        # Update last temperature
-                        self.last_temperature = max_temp
+            # Rising temperature makes the scheduler sample faster
+            now = time.time()
+            if self.last_temperature is not None and now > self.last_temperature_time:
+                rate = (max_temp - self.last_temperature) / (now - self.last_temperature_time)
+                self.scheduler.set_heating_rate(rate)
 
-                        # Log to console
-                        synced_time = self.time_manager.get_synced_time()
-                        timestamp = synced_time.strftime('%H:%M:%S')
-                        print(f"[{timestamp}] Thermal: Max={max_temp:.1f}°C, Avg={avg_temp:.1f}°C")
+            # Update last temperature
+            self.last_temperature = max_temp
+            self.last_temperature_time = now
 
-                    # Clear the flag
-                    self.immediate_thermal_flag = False
-
-                    # Reset next scheduled reading to maintain intervals
-                    next_reading = time.time() + THERMAL_INTERVAL
-
-                current_time = time.time()
-
-                if current_time >= next_reading:
-                    # Get temperature statistics
-                    temp_stats = self.mlx90640.get_temperature_stats()
-
-                    if temp_stats:
-                        max_temp = temp_stats['max']
-                        avg_temp = temp_stats['avg']
-
-                        # Store maximum temperature in database
-                        self.db.insert_temperature(self.current_session, max_temp)
-
-                        # Update last temperature
-                        self.last_temperature = max_temp
-
-                        # Log to console
-                        synced_time = self.time_manager.get_synced_time()
-                        timestamp = synced_time.strftime('%H:%M:%S')
-                        print(f"[{timestamp}] Thermal: Max={max_temp:.1f}°C, Avg={avg_temp:.1f}°C")
-
-                    next_reading = current_time + THERMAL_INTERVAL
-
-                time.sleep(1)
-
-            except Exception as e:
-                print(f"Thermal monitoring error: {e}")
-                time.sleep(5)
+            # Log to console
+            synced_time = self.time_manager.get_synced_time()
+            timestamp = synced_time.strftime('%H:%M:%S')
+            print(f"[{timestamp}] Thermal: Max={max_temp:.1f}°C, Avg={avg_temp:.1f}°C, "
+                  f"Hotspots={temp_stats['hotspot_count']}, Rate={temp_stats['max_rate']:+.2f}°C/s")
 
-    def update_led(self):
-        """Update LED based on motion detection"""
+    def thermal_archive_loop(self):
+        """Read frames at the sensor rate so every frame is archived"""
         while self.running:
             try:
-                # Motion detected if either sensor detects motion
-                motion = self.pir_motion or self.c4001_motion
-
-                if motion:
-                    # Red LED for motion
-                    GPIO.output(LED_RED_PIN, GPIO.HIGH)
-                    GPIO.output(LED_GREEN_PIN, GPIO.LOW)
-
-                    if not self.motion_detected:
-                        self.motion_detected = True
-                else:
-                    # Green LED for no motion
-                    GPIO.output(LED_RED_PIN, GPIO.LOW)
-                    GPIO.output(LED_GREEN_PIN, GPIO.HIGH)
-
-                    if self.motion_detected:
-                        self.motion_detected = False
-
-                time.sleep(0.05)
+                # getFrame itself waits for the next frame
+                self.mlx90640.read_frame()
 
             except Exception as e:
-                print(f"LED update error: {e}")
-                time.sleep(1)
-
-    def camera_loop(self):
-        """Capture and transfer images periodically"""
-        # Wait a moment for system to initialize
-        time.sleep(0.5)
-
-        next_capture = time.time() + IMAGE_INTERVAL
-
-        while self.running:
-            try:
-                # Check for immediate capture flag (high priority)
-                if self.immediate_image_flag:
-                    print(f"\n[Camera] Processing immediate capture request...")
-
-                    # Perform the capture
-                    success = self.camera.capture_and_transfer_image(self.current_session)
-
-                    if success:
-                        print(f"[Camera] ✓ Immediate capture completed")
-                    else:
-                        print(f"[Camera] ✗ Immediate capture failed")
-                    # Perform the capture
-                    # self.camera.capture_and_transfer_image(self.current_session)
-
-                    # Clear the flag
-                    self.immediate_image_flag = False
+                print(f"Thermal monitoring error: {e}")
+                time.sleep(5)
 
-                    # Reset next scheduled capture to maintain intervals
-                    next_capture = time.time() + IMAGE_INTERVAL
+    def on_presence(self, present, confidence):
+        """Follow the fused presence state: sampling rate, stored intervals, captures"""
+        self.scheduler.set_presence(present)
 
-                    # Display next scheduled capture time
-                    # next_synced_time = self.time_manager.get_synced_time() + timedelta(seconds=IMAGE_INTERVAL)
-                    # print(f"[Camera] Next scheduled capture at {next_synced_time.strftime('%H:%M:%S')}\n")
+        synced_time = self.time_manager.get_synced_time()
+        if self.coalescer:
+            self.coalescer.edge('presence', present, synced_time)
 
-                current_time = time.time()
+        # Someone just arrived, take a picture now instead of at the next deadline
+        if present and self.system_active:
+            self.scheduler.trigger('camera')
 
-                if current_time >= next_capture:
-                    self.camera.capture_and_transfer_image(self.current_session)
-                    next_capture = current_time + IMAGE_INTERVAL
+        timestamp = synced_time.strftime('%H:%M:%S')
+        print(f"[{timestamp}] Presence: {'yes' if present else 'no'} ({confidence:.2f})")
 
-                    # Display next capture time
-                    # next_synced_time = self.time_manager.get_synced_time() + timedelta(seconds=IMAGE_INTERVAL)
-                    # print(f"[Camera] Next capture at {next_synced_time.strftime('%H:%M:%S')}\n")
+    def update_led(self, present, confidence):
+        """Update LED when the fused presence state changes"""
+        try:
+            if present:
+                # Red LED for motion
+                GPIO.output(LED_RED_PIN, GPIO.HIGH)
+                GPIO.output(LED_GREEN_PIN, GPIO.LOW)
+            else:
+                # Green LED for no motion
+                GPIO.output(LED_RED_PIN, GPIO.LOW)
+                GPIO.output(LED_GREEN_PIN, GPIO.HIGH)
 
-                time.sleep(1)
+        except Exception as e:
+            print(f"LED update error: {e}")
 
-            except Exception as e:
-                print(f"Camera loop error: {e}")
-                time.sleep(1)
+    def capture_job(self):
+        """Scheduled image capture, encoding and upload happen on pipeline workers"""
+        if not self.camera.request_capture(self.current_session):
+            print(f"[Camera] ✗ Capture request failed")
 
     def cleanup(self):
         """Clean up all resources"""
@@ -918,6 +1404,12 @@ class CookingMonitorSystem:
         # Clean up camera
         self.camera.cleanup()
 
+        # Flush pending events and close database connections
+        self.db.close()
+
+        # Close the SSH connection to the image server
+        self.transfer_manager.close()
+
         print("Cleanup complete. Goodbye!")
 
     def run(self):
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+On-device presence: sensor fusion and coalescing of edges into intervals
+PresenceFusion combines the PIR, the C4001 and optional thermal hotspot
+evidence into one debounced presence state with a confidence. Consumers
+subscribe to its changes instead of reading the raw sensor flags:
+
+    fusion = PresenceFusion()
+    fusion.subscribe(lambda present, confidence: print(present, confidence))
+    fusion.update('pir', True)      # prints True 0.6
+    fusion.update('pir', False)     # stays present while the evidence fades
+
+The PIR toggles every second or two while someone is at the stove, which is
+a row and a database round trip per edge. PresenceCoalescer keeps one open
+interval per sensor and only closes it once the sensor has stayed off for
+the hold time, so a burst of flaps becomes one (start, end) row:
+
+    coalescer = PresenceCoalescer(print, hold=10)
+    coalescer.edge('motion1', True, t0)
+    coalescer.edge('motion1', False, t0 + 1s)
+    coalescer.edge('motion1', True, t0 + 2s)    # within hold, same interval
+    coalescer.close(t1)                         # prints motion1 t0 t1
+
+Intervals still open when the device dies are lost; everything closed is
+spooled like any other event. Run this file directly to replay
+db_snapshot/motion*.csv and compare row counts for several hold times.
+"""
+
+import csv
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+PRESENCE_HOLD = 10.0  # seconds off before an interval is closed; 36x fewer rows on the snapshot, 5s only 10x
+SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "db_snapshot")
+# source: (weight, seconds for its evidence to fade to 1/e once it is off)
+FUSION_SOURCES = {
+    'pir': (0.6, 5.0),  # flaps every second or two while someone moves
+    'c4001': (0.8, 2.0),  # mmWave sees people standing still, trusted most
+    'hotspot': (0.3, 30.0),  # a hot pan, below FUSION_EXIT so never enough on its own
+}
+FUSION_ENTER = 0.5  # confidence that turns presence on
+FUSION_EXIT = 0.35  # confidence below which it turns off again
+FUSION_CHECK = 1.0  # seconds between checks while the evidence fades
+FUSION_FADED = 0.01  # evidence of an off source below this no longer changes anything
+
+EDGE_ROW_BYTES = 48  # approximate heap bytes of a motion row, header included
+INTERVAL_ROW_BYTES = 64  # same for a presence_interval row
+
+
+class PresenceFusion:
+    """Fuses presence evidence of several sensors into one debounced state with a confidence"""
+
+    def __init__(self, sources=FUSION_SOURCES, enter=FUSION_ENTER, leave=FUSION_EXIT,
+                 clock=time.monotonic):
+        self.sources = sources
+        self.enter = enter
+        self.leave = leave
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.timer = None
+        self.reset()
+
+    def reset(self):
+        """Forget all evidence without publishing, e.g. at the end of a session"""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.on = dict.fromkeys(self.sources, False)
+            self.off_at = dict.fromkeys(self.sources)  # when each source last went off
+            self.present = False
+            self.updates = 0
+            self.changes = 0
+
+    def subscribe(self, handler):
+        """Call handler(present, confidence) on every change of the presence state"""
+        self.subscribers.append(handler)
+
+    def update(self, source, state):
+        """Report the state of one source, constant time for a fixed set of sources"""
+        now = self.clock()
+        with self.lock:
+            if state != self.on[source]:
+                self.on[source] = state
+                self.off_at[source] = None if state else now
+            self.updates += 1
+            change = self.evaluate(now)
+        self.publish(change)
+
+    def confidence(self):
+        """Get the current confidence that someone is present, 0 to 1"""
+        with self.lock:
+            return self._confidence(self.clock())
+
+    def _confidence(self, now):
+        # Noisy-OR: the chance that every source with evidence is wrong
+        miss = 1.0
+        for source, (weight, fade) in self.sources.items():
+            if self.on[source]:
+                evidence = 1.0
+            elif self.off_at[source] is not None:
+                evidence = math.exp(-max(now - self.off_at[source], 0) / fade)
+            else:
+                continue
+            miss *= 1 - weight * evidence
+        return 1 - miss
+
+    def evaluate(self, now):
+        """Apply the hysteresis, returns (present, confidence) on a change, called with the lock held"""
+        confidence = self._confidence(now)
+        change = None
+        if not self.present and confidence >= self.enter:
+            self.present = True
+            change = (True, confidence)
+        elif self.present and confidence < self.leave:
+            self.present = False
+            change = (False, confidence)
+        if change:
+            self.changes += 1
+
+        # Presence only ends by evidence fading, which no update reports: check
+        # again while any source fades, even if others (a hot pan) are still on
+        if self.present and self.fading(now) and self.timer is None:
+            self.timer = threading.Timer(FUSION_CHECK, self.on_timer)
+            self.timer.daemon = True
+            self.timer.start()
+        return change
+
+    def fading(self, now):
+        """Whether the evidence of any source that went off still counts, called with the lock held"""
+        for source, (_, fade) in self.sources.items():
+            off_at = self.off_at[source]
+            if off_at is not None and math.exp(-(now - off_at) / fade) >= FUSION_FADED:
+                return True
+        return False
+
+    def on_timer(self):
+        """Check the fading evidence again"""
+        with self.lock:
+            self.timer = None
+            change = self.evaluate(self.clock())
+        self.publish(change)
+
+    def publish(self, change):
+        """Hand a state change to the subscribers, outside the lock"""
+        if change is None:
+            return
+        for handler in self.subscribers:
+            try:
+                handler(*change)
+            except Exception as e:
+                print(f"Presence subscriber error: {e}")
+
+    def get_stats(self):
+        """Get updates received and state changes published"""
+        return {
+            'updates': self.updates,
+            'changes': self.changes,
+            'present': self.present,
+        }
+
+
+class PresenceCoalescer:
+    """Merges on/off edges of each sensor into intervals, gaps shorter than hold are bridged"""
+
+    def __init__(self, on_interval, hold=PRESENCE_HOLD, clock=datetime.now):
+        self.on_interval = on_interval  # called with (sensor, start, end)
+        self.hold = hold
+        self.clock = clock  # current time on the same clock as the edges, None closes only on edges
+        self.lock = threading.Lock()
+        self.runs = {}  # sensor -> [start, off time or None while on]
+        self.timer = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Clear edge and interval counts"""
+        self.edges = 0
+        self.intervals = 0
+
+    def edge(self, sensor, state, dt):
+        """Feed one transition of sensor at dt"""
+        closed = []
+        with self.lock:
+            self.edges += 1
+            run = self.runs.get(sensor)
+            if state:
+                if run is not None and run[1] is not None \
+                        and (dt - run[1]).total_seconds() >= self.hold:
+                    # Off long enough: the previous interval is over
+                    closed.append((sensor, run))
+                    run = None
+                if run is None:
+                    self.runs[sensor] = [dt, None]
+                else:
+                    run[1] = None
+            elif run is not None and run[1] is None:
+                run[1] = dt
+                self.schedule(self.hold)
+        self.emit(closed)
+
+    def expire(self, now):
+        """Close intervals off for at least hold, returns seconds until the next one is due"""
+        closed = []
+        due = None
+        with self.lock:
+            for sensor, run in list(self.runs.items()):
+                if run[1] is None:
+                    continue
+                left = self.hold - (now - run[1]).total_seconds()
+                if left <= 0:
+                    closed.append((sensor, run))
+                    del self.runs[sensor]
+                else:
+                    due = left if due is None else min(due, left)
+        self.emit(closed)
+        return due
+
+    def close(self, end):
+        """Close every interval, ones still on end at end"""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            closed = [(sensor, [run[0], run[1] or end]) for sensor, run in self.runs.items()]
+            self.runs.clear()
+        self.emit(closed)
+
+    def schedule(self, delay):
+        """Arm the expiry timer unless one is pending, called with the lock held"""
+        if self.timer is None and self.clock is not None:
+            self.timer = threading.Timer(delay, self.on_timer)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def on_timer(self):
+        """Close expired intervals and wait for the next one, no periodic wakeups"""
+        with self.lock:
+            self.timer = None
+        due = self.expire(self.clock())
+        if due is not None:
+            with self.lock:
+                self.schedule(due)
+
+    def emit(self, closed):
+        """Hand closed intervals to the callback, outside the lock"""
+        for sensor, (start, end) in closed:
+            self.intervals += 1
+            try:
+                self.on_interval(sensor, start, end)
+            except Exception as e:
+                print(f"Presence interval error ({sensor}): {e}")
+
+    def get_stats(self):
+        """Get edges seen and intervals written"""
+        return {
+            'edges': self.edges,
+            'intervals': self.intervals,
+            'open': len(self.runs),
+            'reduction': self.edges / self.intervals if self.intervals else 0.0,
+        }
+
+    def report(self):
+        """Print edge and interval counts"""
+        stats = self.get_stats()
+        print(f"Presence: {stats['edges']} edges -> {stats['intervals']} intervals "
+              f"({stats['reduction']:.1f}x fewer rows, hold={self.hold:g}s)")
+
+
+def read_snapshot(folder=SNAPSHOT):
+    """Get {(session, sensor): [(datetime, state)]} and {session: switch OFF time}"""
+    edges = {}
+    for sensor in ('motion1', 'motion2'):
+        with open(os.path.join(folder, f"{sensor}.csv")) as f:
+            for row in csv.DictReader(f):
+                edges.setdefault((int(row['session']), sensor), []).append(
+                    (datetime.fromisoformat(row['datetime']), row['value'] == 't'))
+
+    ends = {}
+    with open(os.path.join(folder, "switch.csv")) as f:
+        for row in csv.DictReader(f):
+            if row['status'] == 'f':
+                ends[int(row['session'])] = datetime.fromisoformat(row['datetime'])
+    return edges, ends
+
+
+def replay(edges, ends, hold):
+    """Coalesce snapshot edges, returns (edge rows, interval rows)"""
+    rows = 0
+    intervals = []
+    for (session, sensor), events in sorted(edges.items()):
+        coalescer = PresenceCoalescer(lambda *interval: intervals.append(interval), hold, clock=None)
+        events.sort()
+        for dt, state in events:
+            coalescer.edge(sensor, state, dt)
+        coalescer.close(ends.get(session, events[-1][0]))
+        rows += len(events)
+    return rows, len(intervals)
+
+
+if __name__ == "__main__":
+    edges, ends = read_snapshot(sys.argv[1] if len(sys.argv) >= 2 else SNAPSHOT)
+    print(f"{'hold':>6} {'edges':>6} {'intervals':>9} {'rows':>6} {'bytes':>6}")
+    for hold in (0, 2, 5, 10, 30):
+        rows, intervals = replay(edges, ends, hold)
+        mark = "*" if hold == PRESENCE_HOLD else " "
+        print(f"{hold:5g}s {rows:6} {intervals:9} {rows / intervals:5.1f}x "
+              f"{rows * EDGE_ROW_BYTES / (intervals * INTERVAL_ROW_BYTES):5.1f}x{mark}")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Persistent SSH/SFTP transport for the Linux image server
+One authenticated SSH connection is kept open and reused for remote
+commands, mkdir, stat and uploads. SFTP channels are pooled on top of that
+connection so several uploads can be in flight at once, and a dropped
+connection is re-established on the next call.
+
+Only paramiko is needed, so this module can be used off the Pi, e.g.
+against a local sshd or an in-process paramiko test server:
+
+    transport = SSHTransport('127.0.0.1', 'user', 'passwd', port=2222)
+    transport.mkdir('iot2025/1')
+    transport.put('img.jpg', 'iot2025/1/img.jpg')
+"""
+
+import posixpath
+import socket
+import stat
+import threading
+from queue import Queue, Empty
+
+import paramiko
+
+
+SSH_PORT = 22
+SSH_TIMEOUT = 10  # seconds for connect and remote commands
+SSH_KEEPALIVE = 30  # seconds between keepalive packets
+SFTP_CHANNELS = 2  # SFTP channels multiplexed over the connection
+
+# Errors after which the connection is rebuilt and the call retried once;
+# other OSErrors (permission denied, no such file) only if the connection died
+RECONNECT_ERRORS = (paramiko.SSHException, EOFError, ConnectionError, socket.timeout,
+                    paramiko.ssh_exception.NoValidConnectionsError)
+
+
+class SSHTransport:
+    """Keeps one SSH connection open and multiplexes SFTP channels over it"""
+
+    def __init__(self, host, username, password, port=SSH_PORT,
+                 channels=SFTP_CHANNELS, timeout=SSH_TIMEOUT):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.channels = channels
+        self.timeout = timeout
+
+        self.client = None
+        self.sftp_pool = Queue()
+        self.lock = threading.Lock()
+        self.generation = 0  # bumped on every reconnect
+
+        # Transport statistics
+        self.connects = 0
+        self.uploads = 0
+        self.bytes_sent = 0
+
+    def connect(self, stale_generation=None):
+        """Open the SSH connection, replacing any previous one
+
+        When stale_generation is given and another thread has already
+        reconnected since then, the newer connection is kept.
+        """
+        with self.lock:
+            if (stale_generation is not None and stale_generation != self.generation
+                    and self.is_connected()):
+                return
+            self._close_client()
+
+            client = paramiko.SSHClient()
+            # Same trust model as the previous 'StrictHostKeyChecking=no'
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            client.connect(self.host, port=self.port,
+                           username=self.username, password=self.password,
+                           timeout=self.timeout, banner_timeout=self.timeout,
+                           auth_timeout=self.timeout,
+                           allow_agent=False, look_for_keys=False)
+            client.get_transport().set_keepalive(SSH_KEEPALIVE)
+
+            self.client = client
+            self.generation += 1
+            self.connects += 1
+
+    def is_connected(self):
+        """Check whether the SSH connection is still alive"""
+        transport = self.client.get_transport() if self.client else None
+        return transport is not None and transport.is_active()
+
+    def _close_client(self):
+        while True:
+            try:
+                _, sftp = self.sftp_pool.get_nowait()
+                sftp.close()
+            except Empty:
+                break
+            except Exception:
+                pass
+
+        if self.client:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+            self.client = None
+
+    def _call(self, func):
+        """Run func on a live connection, reconnecting and retrying once on failure"""
+        for attempt in range(2):
+            generation = self.generation
+            try:
+                if not self.is_connected():
+                    self.connect(generation)
+                return func()
+            except Exception as e:
+                if attempt == 1 or not self.reconnectable(e):
+                    raise
+                self.connect(generation)
+
+    def reconnectable(self, error):
+        """Check whether an error means the connection has to be rebuilt"""
+        if isinstance(error, RECONNECT_ERRORS):
+            return True
+        return isinstance(error, OSError) and not self.is_connected()
+
+    def _sftp_call(self, func):
+        """Run func(sftp) on a pooled SFTP channel"""
+        def run():
+            try:
+                generation, sftp = self.sftp_pool.get_nowait()
+            except Empty:
+                generation, sftp = self.generation, self.client.open_sftp()
+
+            try:
+                result = func(sftp)
+            except Exception:
+                sftp.close()
+                raise
+
+            # Channels opened before a reconnect are dropped
+            if generation == self.generation:
+                self.sftp_pool.put((generation, sftp))
+            else:
+                sftp.close()
+            return result
+
+        return self._call(run)
+
+    @staticmethod
+    def remote_path(path):
+        """SFTP has no shell, so '~/x' becomes 'x' relative to the home directory"""
+        if path == '~':
+            return '.'
+        if path.startswith('~/'):
+            return path[2:]
+        return path
+
+    def exec(self, command):
+        """Run a remote command and get (exit status, stdout, stderr)"""
+        def run():
+            _, stdout, stderr = self.client.exec_command(command, timeout=self.timeout)
+            status = stdout.channel.recv_exit_status()
+            return status, stdout.read().decode(), stderr.read().decode()
+
+        return self._call(run)
+
+    def stat(self, path):
+        """Get remote file attributes, or None if the path doesn't exist"""
+        def run(sftp):
+            try:
+                return sftp.stat(self.remote_path(path))
+            except FileNotFoundError:
+                return None
+
+        return self._sftp_call(run)
+
+    def mkdir(self, path):
+        """Create a remote directory and its parents, like 'mkdir -p'"""
+        def run(sftp):
+            current = ''
+            for part in self.remote_path(path).split('/'):
+                current = posixpath.join(current, part) if current else (part or '/')
+                if not part or current in ('/', '.'):
+                    continue
+                try:
+                    attrs = sftp.stat(current)
+                except FileNotFoundError:
+                    sftp.mkdir(current)
+                    continue
+                if not stat.S_ISDIR(attrs.st_mode):
+                    return False
+            return True
+
+        return self._sftp_call(run)
+
+    def put(self, local_path, remote_path):
+        """Upload one file, writes within the file are pipelined by paramiko"""
+        def run(sftp):
+            attrs = sftp.put(local_path, self.remote_path(remote_path), confirm=True)
+            self.uploads += 1
+            self.bytes_sent += attrs.st_size
+            return attrs
+
+        return self._sftp_call(run)
+
+    def close(self):
+        """Close the SFTP channels and the connection"""
+        with self.lock:
+            self._close_client()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+EventSpool and EventWriter against a recording stand-in for the pool
+The fake connection keeps the statements of a transaction and only
+publishes them on commit, so tests see what reached the database and in
+which order, and can fail a transaction like PostgreSQL would.
+
+Usage: python3 -m pytest -q test_event_spool.py
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import psycopg as pg
+import pytest
+
+from event_spool import EventSpool, EventWriter
+
+
+T0 = datetime(2025, 9, 20, 18, 30, 0)
+
+
+class FakeCopy:
+    """Collects the rows of a COPY"""
+
+    def __init__(self):
+        self.rows = []
+
+    def write_row(self, row):
+        self.rows.append(row)
+
+
+class FakeCursor:
+    """Records statements, raises the error the pool was told to raise for them"""
+
+    def __init__(self, pool, statements):
+        self.pool = pool
+        self.statements = statements
+
+    def run(self, sql, params):
+        self.statements.append((' '.join(sql.split()), params))
+        error = self.pool.fail(sql, params)
+        if error is not None:
+            raise error
+
+    def execute(self, sql, params=None):
+        self.run(sql, params)
+
+    def executemany(self, sql, params_seq):
+        for params in params_seq:
+            self.run(sql, params)
+
+    @contextmanager
+    def copy(self, sql):
+        copy = FakeCopy()
+        yield copy
+        self.run(sql, copy.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    """One transaction of the fake pool"""
+
+    def __init__(self, pool, statements):
+        self.pool = pool
+        self.statements = statements
+
+    def cursor(self):
+        return FakeCursor(self.pool, self.statements)
+
+
+class FakePool:
+    """Pool whose connections commit their statements to self.committed"""
+
+    def __init__(self):
+        self.committed = []
+        self.fail = lambda sql, params: None
+
+    @contextmanager
+    def connection(self):
+        # An exception leaving the block rolls the transaction back
+        statements = []
+        yield FakeConnection(self, statements)
+        self.committed.extend(statements)
+
+    def sql(self, prefix):
+        """Committed statements starting with prefix"""
+        return [params for sql, params in self.committed if sql.startswith(prefix)]
+
+
+@pytest.fixture
+def spool(tmp_path):
+    spool = EventSpool(str(tmp_path / "spool.db"))
+    yield spool
+    spool.close()
+
+
+@pytest.fixture
+def pool():
+    return FakePool()
+
+
+@pytest.fixture
+def writer(pool, spool):
+    writer = EventWriter(pool, spool, "test-pi", flush_interval=3600)
+    writer.sessions = True
+    yield writer
+    writer.stop_event.set()
+    writer.wakeup.set()
+    writer.thread.join(timeout=5)
+
+
+def test_presence_interval_is_written(pool, spool, writer):
+    writer.put('presence_interval', (7, T0, 12.5))
+    writer.put('motion1_interval', (7, T0 + timedelta(seconds=3), 4.0))
+
+    assert writer.flush()
+    assert pool.sql("INSERT INTO presence_interval") == [
+        (7, 'presence', T0, T0 + timedelta(seconds=12.5)),
+        (7, 'motion1', T0 + timedelta(seconds=3), T0 + timedelta(seconds=7)),
+    ]
+    assert spool.count == 0
+    assert writer.get_stats()['rows'] == 2
+
+
+def test_sessions_are_filled_before_any_insert(pool, writer):
+    writer.put('presence_interval', (8, T0 + timedelta(seconds=5), 10.0))
+    writer.put('temperature', (8, T0, 45.0))
+
+    assert writer.flush()
+    assert pool.committed[0][0].startswith("WITH added AS ( INSERT INTO sessions")
+    assert pool.committed[0][1] == ("test-pi", [8], [T0])
+
+
+def test_rejected_event_is_parked(pool, spool, writer):
+    def fail(sql, params):
+        if "presence_interval" in sql and params[0] == 666:
+            return pg.errors.ForeignKeyViolation("session 666 is not in sessions")
+    pool.fail = fail
+
+    writer.put('temperature', (9, T0, 45.0))
+    writer.put('presence_interval', (666, T0, 10.0))
+    writer.put('temperature', (9, T0 + timedelta(seconds=15), 46.0))
+
+    assert writer.flush()
+    assert spool.count == 0
+    assert spool.parked == 1
+    assert [row for rows in pool.sql("COPY temperature_stage") for row in rows] == [
+        (9, T0, 45.0), (9, T0 + timedelta(seconds=15), 46.0)]
+    assert not pool.sql("INSERT INTO presence_interval")
+
+    failed = spool.conn.execute("SELECT tbl, session, error FROM failed").fetchall()
+    assert failed == [('presence_interval', 666, "session 666 is not in sessions")]
+
+    # Later events are not held up by the parked one
+    writer.put('temperature', (9, T0 + timedelta(seconds=30), 47.0))
+    assert writer.flush()
+    assert spool.count == 0
+    assert writer.get_stats()['parked'] == 1
+
+
+def test_outage_keeps_events_spooled(pool, spool, writer):
+    pool.fail = lambda sql, params: pg.OperationalError("connection refused")
+
+    writer.put('presence_interval', (10, T0, 10.0))
+    writer.put('temperature', (10, T0, 45.0))
+
+    assert not writer.flush()
+    assert spool.count == 2
+    assert spool.parked == 0
+    assert pool.committed == []
+
+    pool.fail = lambda sql, params: None
+    assert writer.flush()
+    assert spool.count == 0
+    assert len(pool.sql("INSERT INTO presence_interval")) == 1
+
+
+def test_schema_error_keeps_events_spooled(pool, spool, writer):
+    # A missing table or privilege is fixed on the server, nothing is parked
+    pool.fail = lambda sql, params: pg.errors.UndefinedTable('relation "presence_interval" does not exist')
+
+    writer.put('presence_interval', (11, T0, 10.0))
+    writer.put('temperature', (11, T0, 45.0))
+
+    assert not writer.flush()
+    assert spool.count == 2
+    assert spool.parked == 0
+
+
+def test_failed_table_is_capped(pool, tmp_path):
+    spool = EventSpool(str(tmp_path / "capped.db"), max_failed=3)
+    writer = EventWriter(pool, spool, "test-pi", flush_interval=3600)
+    pool.fail = lambda sql, params: pg.errors.CheckViolation("value out of range")
+
+    for i in range(5):
+        writer.put('temperature', (12, T0 + timedelta(seconds=i), 999.0))
+    assert writer.flush()
+
+    failed = spool.conn.execute("SELECT datetime FROM failed ORDER BY id").fetchall()
+    assert failed == [((T0 + timedelta(seconds=i)).isoformat(),) for i in (2, 3, 4)]
+    assert spool.parked == 3
+    assert spool.rows_dropped == 2
+
+    writer.stop_event.set()
+    writer.wakeup.set()
+    writer.thread.join(timeout=5)
+    spool.close()
+
+
+def test_flush_soon_reports_after_the_flush(pool, spool, writer, capsys):
+    writer.put('temperature', (13, T0, 45.0))
+    writer.flush_soon(report=True)
+
+    writer.thread.join(timeout=0.5)  # the flush thread keeps running, just wait a little
+    assert spool.count == 0
+    assert not writer.report_pending
+    assert "pending=0" in capsys.readouterr().out
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+EdgeDispatcher driven by SimulatedGPIO
+Edges are fired from the simulated library's callback thread and handled
+on the dispatcher thread; stop() delivers what is queued, so tests check
+the handlers after stopping instead of sleeping.
+
+Usage: python3 -m pytest -q test_gpio_events.py
+"""
+
+import time
+
+import pytest
+
+from gpio_events import EdgeDispatcher, SimulatedGPIO
+
+
+PIR_PIN = 18
+BUTTON_PIN = 17
+
+
+@pytest.fixture
+def gpio():
+    gpio = SimulatedGPIO()
+    gpio.setmode(gpio.BCM)
+    gpio.setup(PIR_PIN, gpio.IN, pull_up_down=gpio.PUD_DOWN)
+    return gpio
+
+
+@pytest.fixture
+def dispatcher(gpio):
+    dispatcher = EdgeDispatcher(gpio)
+    dispatcher.events = []
+    dispatcher.subscribe('pir', dispatcher.events.append)
+    yield dispatcher
+    dispatcher.stop()
+
+
+def states(events):
+    return [(event.source, event.state) for event in events]
+
+
+def test_edges_are_delivered_in_order(gpio, dispatcher):
+    dispatcher.start()
+    dispatcher.watch_pin(PIR_PIN, 'pir')
+    before = time.time()
+    for level in (gpio.HIGH, gpio.LOW, gpio.HIGH):
+        gpio.set_input(PIR_PIN, level)
+    dispatcher.stop()
+
+    assert states(dispatcher.events) == [('pir', True), ('pir', False), ('pir', True)]
+    assert all(event.wall >= before for event in dispatcher.events)
+    times = [event.monotonic for event in dispatcher.events]
+    assert times == sorted(times)
+
+
+def test_pin_high_at_start_is_reported(gpio, dispatcher):
+    gpio.set_input(PIR_PIN, gpio.HIGH)
+    dispatcher.start()
+    dispatcher.watch_pin(PIR_PIN, 'pir')
+    dispatcher.stop()
+
+    assert states(dispatcher.events) == [('pir', True)]
+
+
+def test_duplicate_levels_are_ignored(gpio, dispatcher):
+    dispatcher.start()
+    dispatcher.watch_pin(PIR_PIN, 'pir')
+    gpio.set_input(PIR_PIN, gpio.HIGH)
+    gpio.set_input(PIR_PIN, gpio.HIGH)  # no edge, the library fires nothing
+    dispatcher.post('pir', True)  # a bounce read back at the same level
+    dispatcher.post('pir', False)
+    dispatcher.post('pir', False)
+    dispatcher.stop()
+
+    assert states(dispatcher.events) == [('pir', True), ('pir', False)]
+    assert dispatcher.get_stats()['ignored'] == 2
+
+
+def test_stop_and_restart(gpio, dispatcher):
+    dispatcher.start()
+    dispatcher.watch_pin(PIR_PIN, 'pir')
+    gpio.set_input(PIR_PIN, gpio.HIGH)
+    dispatcher.stop()
+
+    # Stopped: the pin is released and nothing is delivered
+    assert gpio.detectors == {}
+    gpio.set_input(PIR_PIN, gpio.LOW)
+    dispatcher.post('pir', True)  # posted between sessions, dropped at start
+
+    dispatcher.start()
+    assert dispatcher.get_stats()['edges'] == 0
+    dispatcher.watch_pin(PIR_PIN, 'pir')  # no conflicting detection left behind
+    gpio.set_input(PIR_PIN, gpio.HIGH)
+    dispatcher.stop()
+
+    assert states(dispatcher.events) == [('pir', True), ('pir', True)]
+    assert dispatcher.get_stats()['edges'] == 1
+
+
+def test_stats_and_failing_handler(gpio, dispatcher):
+    def broken(event):
+        raise ValueError("handler bug")
+    dispatcher.subscribe('button', broken)
+    button = []
+    dispatcher.subscribe('button', button.append)
+
+    dispatcher.start()
+    dispatcher.watch_pin(PIR_PIN, 'pir')
+    gpio.setup(BUTTON_PIN, gpio.IN, pull_up_down=gpio.PUD_UP)
+    dispatcher.watch_pin(BUTTON_PIN, 'button')  # pulled up, reported at once
+    gpio.set_input(BUTTON_PIN, gpio.LOW)
+    gpio.set_input(PIR_PIN, gpio.HIGH)
+    dispatcher.post('pir', True)
+    dispatcher.stop()
+
+    # A failing handler does not keep the others or later edges from running
+    assert states(button) == [('button', True), ('button', False)]
+    assert states(dispatcher.events) == [('pir', True)]
+
+    stats = dispatcher.get_stats()
+    assert stats['edges'] == 3
+    assert stats['ignored'] == 1
+    assert dispatcher.wakeups == 5  # four events and the stop marker
+    assert stats['wakeups_per_sec'] > 0
+    assert 0 <= stats['avg_latency_ms'] <= stats['max_latency_ms']
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+PresenceFusion and PresenceCoalescer on a fake clock
+Fusion timers are cancelled and fired by hand, so fading evidence is
+checked at exact fake times instead of after real seconds.
+
+Usage: python3 -m pytest -q test_presence.py
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from presence import PresenceFusion, PresenceCoalescer
+
+
+T0 = datetime(2025, 9, 20, 18, 30, 0)
+
+
+class FakeClock:
+    """Monotonic seconds that only move when a test says so"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def fusion(clock):
+    fusion = PresenceFusion(clock=clock)
+    fusion.changes_seen = []
+    fusion.subscribe(lambda present, confidence: fusion.changes_seen.append(present))
+    yield fusion
+    fusion.reset()
+
+
+def tick(fusion, clock, seconds=1.0):
+    """Advance the clock and fire the pending fusion timer"""
+    assert fusion.timer is not None
+    fusion.timer.cancel()
+    clock.now += seconds
+    fusion.on_timer()
+
+
+def test_hotspot_alone_is_not_presence(fusion, clock):
+    fusion.update('hotspot', True)
+    clock.now += 60
+    fusion.update('hotspot', True)
+
+    assert not fusion.present
+    assert fusion.changes_seen == []
+    assert fusion.timer is None
+
+
+def test_presence_ends_while_hotspot_stays_on(fusion, clock):
+    fusion.update('hotspot', True)
+    fusion.update('pir', True)
+    assert fusion.changes_seen == [True]
+
+    # The pan stays hot, only the fading PIR evidence can end presence
+    clock.now += 2
+    fusion.update('pir', False)
+    assert fusion.timer is not None
+
+    seconds = 0
+    while fusion.present and seconds < 60:
+        tick(fusion, clock)
+        seconds += 1
+    assert fusion.changes_seen == [True, False]
+    assert 5 <= seconds <= 15
+    assert fusion.timer is None
+
+
+def test_presence_ends_when_everything_faded(fusion, clock):
+    fusion.update('c4001', True)
+    fusion.update('c4001', False)
+
+    seconds = 0
+    while fusion.present and seconds < 60:
+        tick(fusion, clock)
+        seconds += 1
+    assert fusion.changes_seen == [True, False]
+    assert fusion.timer is None
+
+
+def test_coalescer_bridges_short_gaps():
+    intervals = []
+    coalescer = PresenceCoalescer(lambda *interval: intervals.append(interval), hold=10, clock=None)
+    s = lambda seconds: T0 + timedelta(seconds=seconds)
+
+    for seconds, state in ((0, True), (1, False), (3, True), (4, False), (30, True), (31, False)):
+        coalescer.edge('presence', state, s(seconds))
+    coalescer.close(s(60))
+
+    assert intervals == [('presence', s(0), s(4)), ('presence', s(30), s(31))]
+    assert coalescer.get_stats()['edges'] == 6
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+SSHTransport against an in-process paramiko server
+The server serves SFTP from a temporary folder and echoes exec commands, so
+uploads, reconnects and error handling run without a real sshd.
+
+Usage: python3 -m pytest -q test_ssh_transport.py
+"""
+
+import os
+import socket
+import threading
+import time
+
+import paramiko
+import pytest
+
+from ssh_transport import SSHTransport
+
+
+USER = "iot"
+PASSWORD = "secret"
+LOCKED = "locked"  # paths below this folder are refused with permission denied
+
+
+class LocalSFTP(paramiko.SFTPServerInterface):
+    """Serves a local folder, the root is set by the test server"""
+
+    root = None
+
+    def local(self, path):
+        path = self.canonicalize(path).lstrip("/")
+        return os.path.join(self.root, path)
+
+    def canonicalize(self, path):
+        return "/" + os.path.normpath(path).lstrip("/.")
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(self.local(path)))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def mkdir(self, path, attr):
+        if self.canonicalize(path).startswith("/" + LOCKED):
+            return paramiko.SFTP_PERMISSION_DENIED
+        try:
+            os.mkdir(self.local(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def open(self, path, flags, attr):
+        if self.canonicalize(path).startswith("/" + LOCKED):
+            return paramiko.SFTP_PERMISSION_DENIED
+        try:
+            fd = os.open(self.local(path), flags | getattr(os, "O_BINARY", 0), 0o644)
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+        handle = paramiko.SFTPHandle(flags)
+        handle.filename = self.local(path)
+        if flags & (os.O_WRONLY | os.O_RDWR):
+            handle.writefile = os.fdopen(fd, "wb")
+        else:
+            handle.readfile = os.fdopen(fd, "rb")
+        return handle
+
+
+class FakeServer(paramiko.ServerInterface):
+    """Password login, SFTP subsystem and an exec that echoes the command"""
+
+    def check_auth_password(self, username, password):
+        if (username, password) == (USER, PASSWORD):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        # EOF instead of close: a close could overtake the reply to this request
+        def reply():
+            channel.sendall(command)
+            channel.send_exit_status(0)
+            channel.shutdown_write()
+
+        threading.Thread(target=reply, daemon=True).start()
+        return True
+
+
+class SSHServer:
+    """Accepts connections on a free local port until stopped"""
+
+    host_key = paramiko.RSAKey.generate(1024)
+
+    def __init__(self, root):
+        LocalSFTP.root = root
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(8)
+        self.port = self.sock.getsockname()[1]
+        self.transports = []
+        self.thread = threading.Thread(target=self.accept_loop, daemon=True)
+        self.thread.start()
+
+    def accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(conn)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler("sftp", paramiko.SFTPServer, LocalSFTP)
+            transport.start_server(server=FakeServer())
+            self.transports.append(transport)
+
+    def drop_connections(self):
+        """Close every connection from the server side, like a server restart"""
+        for transport in self.transports:
+            transport.close()
+
+    def close(self):
+        self.drop_connections()
+        self.sock.close()
+
+
+@pytest.fixture
+def server(tmp_path):
+    root = tmp_path / "server"
+    root.mkdir()
+    server = SSHServer(str(root))
+    server.root = root
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def transport(server):
+    transport = SSHTransport("127.0.0.1", USER, PASSWORD, port=server.port)
+    yield transport
+    transport.close()
+
+
+def test_mkdir_put_stat(server, transport, tmp_path):
+    local = tmp_path / "img.jpg"
+    local.write_bytes(b"\xff\xd8" + b"x" * 100000)
+
+    assert transport.mkdir("~/iot2025/1")
+    attrs = transport.put(str(local), "~/iot2025/1/img.jpg")
+
+    assert attrs.st_size == local.stat().st_size
+    assert (server.root / "iot2025" / "1" / "img.jpg").read_bytes() == local.read_bytes()
+    assert transport.stat("iot2025/1/img.jpg").st_size == attrs.st_size
+    assert transport.stat("iot2025/1/missing.jpg") is None
+    assert transport.uploads == 1
+    assert transport.connects == 1
+
+
+def test_exec(transport):
+    status, stdout, _ = transport.exec("date")
+    assert (status, stdout) == (0, "date")
+
+
+def test_reconnect_after_drop(server, transport, tmp_path):
+    local = tmp_path / "img.jpg"
+    local.write_bytes(b"frame")
+    assert transport.mkdir("iot2025")
+
+    server.drop_connections()
+    deadline = time.time() + 5
+    while transport.is_connected() and time.time() < deadline:
+        time.sleep(0.05)
+
+    transport.put(str(local), "iot2025/img.jpg")
+    assert transport.connects == 2
+    assert (server.root / "iot2025" / "img.jpg").read_bytes() == b"frame"
+
+
+def test_permission_denied_does_not_reconnect(transport, tmp_path):
+    local = tmp_path / "img.jpg"
+    local.write_bytes(b"frame")
+
+    with pytest.raises(PermissionError):
+        transport.put(str(local), f"{LOCKED}/img.jpg")
+    with pytest.raises(PermissionError):
+        transport.mkdir(f"{LOCKED}/1")
+
+    assert transport.connects == 1
+    assert transport.is_connected()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Compact per-session archive of MLX90640 thermal frames
+Every 32x24 frame is quantized to int16 hundredths of a degree (1.5KB per
+frame) and appended to a memory-mapped file, with a parallel float64
+timestamp index. Offline tools open the files read-only and slice any time
+window without copying:
+
+    archive = ThermalArchive('thermal_archive', 12)
+    times, frames = archive.window(t0, t1)  # views into the mapped files
+    celsius = archive.to_celsius(frames)     # converts only what is needed
+
+Files per session:
+    <session>.frames  int16 [n, 24, 32], value / 100 = Celsius
+    <session>.index   float64 [n], epoch seconds (server time), ascending
+
+Run this file directly to measure space per hour and random-access reads.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+ARCHIVE_FOLDER = "thermal_archive"
+FRAME_SHAPE = (24, 32)
+SCALE = 100  # stored value = round(Celsius * SCALE), int16 covers -327..327 Celsius
+GROW_FRAMES = 1024  # files grow by this many frames at a time
+
+
+def session_paths(folder, session):
+    """Get the frame and index file paths of a session"""
+    base = os.path.join(folder, str(session))
+    return base + ".frames", base + ".index"
+
+
+class ThermalArchiveWriter:
+    """Appends frames of one session to memory-mapped files"""
+
+    def __init__(self, folder, session, time_offset=0.0):
+        os.makedirs(folder, exist_ok=True)
+        self.frames_path, self.index_path = session_paths(folder, session)
+        self.time_offset = time_offset  # seconds added to time.time() for server time
+        self.frames = None
+        self.index = None
+        self.capacity = 0
+
+        # Resume after a restart: unused slots have a zero timestamp
+        self.count = 0
+        if os.path.exists(self.index_path):
+            self.remap(os.path.getsize(self.index_path) // 8)
+            self.count = int(np.count_nonzero(self.index))
+
+    def remap(self, capacity):
+        """Resize both files to capacity frames and map them again"""
+        self.flush()
+        self.frames = self.index = None
+
+        for path, itemsize in ((self.frames_path, 2 * FRAME_SHAPE[0] * FRAME_SHAPE[1]),
+                               (self.index_path, 8)):
+            with open(path, "ab") as f:
+                f.truncate(capacity * itemsize)
+
+        self.capacity = capacity
+        if capacity:
+            self.frames = np.memmap(self.frames_path, dtype=np.int16, mode="r+",
+                                    shape=(capacity,) + FRAME_SHAPE)
+            self.index = np.memmap(self.index_path, dtype=np.float64, mode="r+",
+                                   shape=(capacity,))
+
+    def append(self, frame, timestamp=None):
+        """Quantize and store one frame (any shape with 768 Celsius values)"""
+        if self.count == self.capacity:
+            self.remap(self.capacity + GROW_FRAMES)
+
+        scaled = np.multiply(np.reshape(frame, FRAME_SHAPE), SCALE, dtype=np.float32)
+        np.rint(scaled, out=self.frames[self.count], casting="unsafe")
+        self.index[self.count] = (timestamp or time.time()) + self.time_offset
+        self.count += 1
+
+    def flush(self):
+        """Write mapped pages to disk"""
+        if self.frames is not None:
+            self.frames.flush()
+            self.index.flush()
+
+    def close(self):
+        """Trim the unused tail and close the files"""
+        self.remap(self.count)
+        self.frames = self.index = None
+
+
+class ThermalArchive:
+    """Read-only, zero-copy access to the frames of one session"""
+
+    def __init__(self, folder, session):
+        self.frames_path, self.index_path = session_paths(folder, session)
+
+        # Empty files can't be mapped
+        if os.path.getsize(self.index_path) == 0:
+            self.count = 0
+            self.index = np.zeros(0, dtype=np.float64)
+            self.frames = np.zeros((0,) + FRAME_SHAPE, dtype=np.int16)
+            return
+
+        index = np.memmap(self.index_path, dtype=np.float64, mode="r")
+
+        # Ignore preallocated slots of a session that is still being written
+        self.count = int(np.count_nonzero(index))
+        self.index = index[:self.count]
+        self.frames = np.memmap(self.frames_path, dtype=np.int16, mode="r",
+                                shape=(len(index),) + FRAME_SHAPE)[:self.count]
+
+    def __len__(self):
+        return self.count
+
+    def window(self, start, end):
+        """Get (timestamps, frames) with start <= timestamp < end, both views"""
+        lo, hi = np.searchsorted(self.index, (start, end))
+        return self.index[lo:hi], self.frames[lo:hi]
+
+    def nearest(self, timestamp):
+        """Get the frame closest in time as (timestamp, frame)"""
+        i = int(np.searchsorted(self.index, timestamp))
+        if i == self.count or (i > 0 and timestamp - self.index[i - 1] < self.index[i] - timestamp):
+            i -= 1
+        return self.index[i], self.frames[i]
+
+    @staticmethod
+    def to_celsius(frames):
+        """Convert stored frames to float32 Celsius"""
+        return np.asarray(frames, dtype=np.float32) / SCALE
+
+
+def measure(refresh_rate=4, hours=1, reads=1000, window_seconds=60):
+    """Write a synthetic session and time random window reads"""
+    rng = np.random.default_rng(0)
+    n = int(refresh_rate * 3600 * hours)
+    base = rng.normal(25, 2, FRAME_SHAPE).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as folder:
+        writer = ThermalArchiveWriter(folder, 1)
+        start = time.time()
+        tic = time.perf_counter()
+        for i in range(n):
+            writer.append(base + (i % 600) / 10, start + i / refresh_rate)
+        writer.close()
+        write_time = time.perf_counter() - tic
+
+        size = sum(os.path.getsize(p) for p in session_paths(folder, 1))
+        archive = ThermalArchive(folder, 1)
+
+        tic = time.perf_counter()
+        frames_read = 0
+        for t in rng.uniform(start, start + n / refresh_rate - window_seconds, reads):
+            _, frames = archive.window(t, t + window_seconds)
+            frames_read += len(archive.to_celsius(frames))
+        read_time = time.perf_counter() - tic
+
+    print(f"{n} frames at {refresh_rate}Hz over {hours}h")
+    print(f"Space: {size / hours / 2**20:.1f}MB per hour ({size / n:.0f} bytes/frame)")
+    print(f"Write: {1e6 * write_time / n:.1f}us per frame")
+    print(f"Read: {1000 * read_time / reads:.2f}ms per {window_seconds}s window, "
+          f"{frames_read / read_time:.0f} frames/s")
+
+
+if __name__ == "__main__":
+    measure(float(sys.argv[1]) if len(sys.argv) >= 2 else 4)
@@ -0,0 +1,134 @@
+import sys
+import csv
+import time
+import random
+import statistics
+from datetime import datetime, timedelta
+from pathlib import Path
+import psycopg as pg
+
+
+HOST = sys.argv[1].strip()
+PORT = '5432'
+DBNAME = 'iotdb'
+OWNER = 'iotproj'
+PASSWD = sys.argv[2].strip()
+conn_owner = {'dbname': DBNAME,
+              'host': HOST,
+              'port': PORT,
+              'user': OWNER,
+              'password': PASSWD}
+conn_str = f'postgresql://{OWNER}:{PASSWD}@{HOST}:{PORT}/{DBNAME}'
+
+
+# Dashboard style queries on plain heap tables (init_iotdb.sql) vs the
+# migrated ones (migrations/), with db_snapshot copied SCALE times, each
+# copy shifted by the snapshot's time span and session range.
+# Usage: python bench_iotdb.py <ip> <passwd> [scale]
+# Works in the schemas bench_heap and bench_part, dropped at the end.
+ROOT = Path(__file__).parent
+SNAPSHOT = ROOT / 'db_snapshot'
+SCALE = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+REPEAT = 20
+
+TABLES = {
+    'switch': 'status',
+    'temperature': 'value',
+    'motion1': 'value',
+    'motion2': 'value',
+}
+
+QUERIES = {
+    'session temperature':
+        'SELECT datetime, value FROM temperature WHERE session = %(sid)s ORDER BY datetime',
+    'session motion':
+        'SELECT count(*) FILTER (WHERE value) FROM motion1 WHERE session = %(sid)s',
+    'day of motion':
+        'SELECT count(*) FROM motion1'
+        ' WHERE datetime >= %(day)s AND datetime < %(day)s + interval \'1 day\'',
+    'week of temperature':
+        'SELECT date_trunc(\'hour\', datetime), max(value) FROM temperature'
+        ' WHERE datetime >= %(day)s AND datetime < %(day)s + interval \'7 days\' GROUP BY 1',
+    'session switch':
+        'SELECT datetime, status FROM switch WHERE session = %(sid)s ORDER BY datetime',
+}
+
+
+def read_snapshot():
+    data = {}
+    for table, column in TABLES.items():
+        with open(SNAPSHOT / f'{table}.csv') as f:
+            data[table] = [(int(r['session']), datetime.fromisoformat(r['datetime']),
+                            r[column]) for r in csv.DictReader(f)]
+    times = [dt for rows in data.values() for _, dt, _ in rows]
+    sessions = [sid for rows in data.values() for sid, _, _ in rows]
+    span = max(times) - min(times) + timedelta(days=1)
+    return data, min(times), span, max(sessions)
+
+
+def load(cur, data, span, max_sid):
+    for table, column in TABLES.items():
+        with cur.copy(f'COPY {table} (session, datetime, {column}) FROM STDIN') as copy:
+            for k in range(SCALE):
+                for sid, dt, value in data[table]:
+                    copy.write_row((sid + k*max_sid, dt + k*span, value))
+        cur.execute(f'ANALYZE {table}')
+
+
+def bench(cur, params):
+    result = {}
+    for name, sql in QUERIES.items():
+        times = []
+        for p in params:
+            tic = time.perf_counter()
+            cur.execute(sql, p)
+            cur.fetchall()
+            times.append(1000*(time.perf_counter()-tic))
+        result[name] = statistics.median(times)
+    return result
+
+
+if __name__ == "__main__":
+    data, start, span, max_sid = read_snapshot()
+    end = start + SCALE*span
+    print(f'scale {SCALE}: {sum(len(r) for r in data.values())*SCALE} rows, '
+          f'{start:%Y-%m-%d} to {end:%Y-%m-%d}')
+
+    random.seed(0)
+    params = [{'sid': random.randint(1, max_sid*SCALE),
+               'day': start + timedelta(days=random.randint(0, (end-start).days-7))}
+              for _ in range(REPEAT)]
+
+    results = {}
+    with pg.connect(conn_str, autocommit=True) as conn:
+        with conn.cursor() as cur:
+            for schema in ('bench_heap', 'bench_part'):
+                cur.execute(f'DROP SCHEMA IF EXISTS {schema} CASCADE')
+                cur.execute(f'CREATE SCHEMA {schema}')
+                cur.execute(f'SET search_path TO {schema}')
+                cur.execute((ROOT / 'init_iotdb.sql').read_text())
+                if schema == 'bench_part':
+                    for sql in sorted((ROOT / 'migrations').glob('*.sql')):
+                        cur.execute(sql.read_text())
+                    months = (end.year-start.year)*12 + end.month-start.month + 1
+                    for table in TABLES:
+                        cur.execute('SELECT create_month_partitions(%s, %s, %s)',
+                                    (table, start.date(), months))
+                    # sensor rows reference sessions (migrations/002)
+                    cur.execute('INSERT INTO sessions (id, device, start_time, status)'
+                                ' SELECT g, \'bench\', %s, \'closed\''
+                                ' FROM generate_series(1, %s) g',
+                                (start, max_sid*SCALE))
+                tic = time.time()
+                load(cur, data, span, max_sid)
+                print(f'{schema}: loaded in {time.time()-tic:.1f}s')
+                results[schema] = bench(cur, params)
+            cur.execute('SET search_path TO public')
+            for schema in results:
+                cur.execute(f'DROP SCHEMA {schema} CASCADE')
+
+    print('='*60)
+    print(f'{"median ms":24} {"heap":>10} {"partitioned":>12} {"speedup":>8}')
+    for name in QUERIES:
+        heap, part = results['bench_heap'][name], results['bench_part'][name]
+        print(f'{name:24} {heap:10.2f} {part:12.2f} {heap/part:7.1f}x')
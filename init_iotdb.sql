@@ -24,7 +24,7 @@ CREATE TABLE IF NOT EXISTS Temperature (
 );
 
 -- Create Motion1 table
-CREATE TABLE IF NOT EXISTSMotion1 (
+CREATE TABLE IF NOT EXISTS Motion1 (
     id SERIAL PRIMARY KEY,
     session INTEGER NOT NULL,
     datetime TIMESTAMP NOT NULL,
@@ -58,4 +58,3 @@ CREATE TABLE IF NOT EXISTS Image2 (
     style VARCHAR(32),
     description VARCHAR(4096)
 );
-
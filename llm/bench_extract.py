@@ -0,0 +1,93 @@
+import csv
+import time
+from pathlib import Path
+from langchain_ollama import ChatOllama
+import llm_io2
+from llm_io2 import *
+
+
+# Single structured call vs chained prompts on the image2.csv sessions.
+# Same arguments as llm_io2.py, e.g.
+#     python bench_extract.py <llm ip> <db ip> <db passwd>
+SNAPSHOT = Path('../db_snapshot/image2.csv')
+
+
+def parse_array(text):
+    # postgres array text, e.g. {egg,meat,bread}
+    text = (text or '').strip('{}')
+    return {i.strip('" ').lower() for i in text.split(',') if i.strip('" ')}
+
+
+def agreement(result, ref):
+    ing = {i.lower() for i in (result.get('ingredient') or [])}
+    union = ing | ref['ingredient']
+    return {
+        'cooking': result['cooking'] is True,
+        'ingredient': len(ing & ref['ingredient'])/len(union) if union else 1.0,
+        'style': (result.get('style') or '').lower() == ref['style'],
+    }
+
+
+def timed(func, *args):
+    before = dict(usage)
+    tic = time.time()
+    try:
+        result = func(*args)
+    except Exception as e:
+        print('error:', e)
+        result = None
+    return (result, time.time()-tic,
+            usage['input']-before['input'], usage['output']-before['output'])
+
+
+if __name__ == "__main__":
+    # measure the model, not the cache, and full answers for token counts
+    llm_io2.cache = None
+    llm_io2.STREAM = False
+
+    llm = ChatOllama(model=MODEL, base_url=LLM_HOST, temperature=0.1)
+    llm_json = ChatOllama(model=MODEL, base_url=LLM_HOST, temperature=0.1,
+                          format=EXTRACT_SCHEMA)
+
+    with open(SNAPSHOT) as f:
+        refs = {}
+        for row in csv.DictReader(f):
+            refs[int(row['session'])] = {
+                'ingredient': parse_array(row['ingredient']),
+                'style': (row['style'] or '').lower()}
+
+    stats = {'chained': [], 'single': []}
+    agree = []
+    fallbacks = 0
+    for sid, ref in sorted(refs.items()):
+        folder = IMG_PATH / str(sid)
+        fn = sorted(folder.rglob('*')) if folder.is_dir() else []
+        if not fn:
+            continue
+
+        fn_b64 = Payload(fn[-10:], llm_io2.PAYLOAD_SIZE)
+
+        print('* session', sid)
+        stats['chained'].append(timed(extract_chained, llm, fn_b64))
+        single = timed(extract_single, llm_json, fn_b64)
+        stats['single'].append(single)
+        if single[0] is None:
+            fallbacks += 1
+        else:
+            agree.append(agreement(single[0], ref))
+
+    print('='*40)
+    print('sessions:', len(stats['single']))
+    for mode, rows in stats.items():
+        if rows:
+            n = len(rows)
+            print(f'{mode:8} wall {sum(r[1] for r in rows)/n:6.1f}s/session, '
+                  f'tokens in {sum(r[2] for r in rows)/n:7.0f} '
+                  f'out {sum(r[3] for r in rows)/n:5.0f} per session')
+    print('single call failed validation:', fallbacks)
+    if agree:
+        n = len(agree)
+        print(f'agreement with image2.csv: '
+              f'cooking {sum(a["cooking"] for a in agree)/n:.0%}, '
+              f'ingredient jaccard {sum(a["ingredient"] for a in agree)/n:.2f}, '
+              f'style {sum(a["style"] for a in agree)/n:.0%}')
@@ -0,0 +1,102 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+CACHE_PATH = 'llm_cache.db'
+CACHE_MAX_BYTES = 256 * 2**20   # lru eviction above this
+
+
+def sha256(data):
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+class LLMCache:
+    """Persistent cache of llm answers keyed by (images, prompt, model, temperature)."""
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                raw TEXT NOT NULL,
+                parsed TEXT,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )''')
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    @staticmethod
+    def key(images, prompt, model, temperature):
+        # images: encoded image strings or bytes, order matters for a series
+        h = hashlib.sha256()
+        for img in images:
+            h.update(sha256(img).encode())
+        h.update(sha256(prompt).encode())
+        h.update(f'{model}|{temperature}'.encode())
+        return h.hexdigest()
+
+    def get(self, key):
+        """(raw, parsed) or None"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT raw, parsed FROM cache WHERE key=?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute(
+                'UPDATE cache SET accessed=? WHERE key=?', (time.time(), key))
+            self.conn.commit()
+            self.hits += 1
+        raw, parsed = row
+        return raw, json.loads(parsed) if parsed is not None else None
+
+    def put(self, key, raw, parsed=None):
+        parsed = json.dumps(parsed) if parsed is not None else None
+        size = len(raw) + len(parsed or '')
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO cache (key,raw,parsed,size,accessed)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (key, raw, parsed, size, time.time()))
+            self.evict()
+            self.conn.commit()
+
+    def evict(self):
+        # drop least recently used entries until under max_bytes
+        total = self.conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.conn.execute(
+            'SELECT key, size FROM cache ORDER BY accessed').fetchall()
+        drop = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            drop.append((key,))
+            total -= size
+        self.conn.executemany('DELETE FROM cache WHERE key=?', drop)
+        self.evicted += len(drop)
+
+    def summary(self):
+        n = self.hits + self.misses
+        rate = self.hits/n if n else 0.0
+        print(f'cache: {self.hits} hits, {self.misses} misses, '
+              f'hit rate {rate:.0%}, {self.evicted} evicted')
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
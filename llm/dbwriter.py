@@ -0,0 +1,128 @@
+import threading
+import time
+from psycopg_pool import ConnectionPool
+
+
+FLUSH_SIZE = 20         # rows queued before an early flush
+FLUSH_INTERVAL = 10     # seconds between flushes
+RETRY_MAX = 60          # seconds, max backoff while the DB is down
+
+COLUMNS = {
+    'image': ('session', 'datetime', 'ingredient', 'style'),
+    'image2': ('session', 'datetime', 'ingredient', 'style', 'description'),
+}
+
+# unique keys from migrations/006: a frame, and one summary per session
+KEYS = {
+    'image': ('session', 'datetime'),
+    'image2': ('session',),
+}
+
+
+class ResultWriter:
+    """Queue interpreter results and upsert them in batches over one pooled connection.
+
+    Rows still queued when the process is killed are lost, close() writes the rest.
+    """
+
+    def __init__(self, conn_str,
+                 flush_size=FLUSH_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        self.pool = ConnectionPool(conn_str, min_size=1, max_size=1)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.rows = []  # (table, row)
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.retry_delay = 0
+        # stats
+        self.written = 0
+        self.batches = 0
+        self.write_time = 0.0
+        self.xact = set()  # tables with the commit order column of migrations/007
+
+        self.check_tables()
+        self.thread = threading.Thread(target=self.flush_loop, daemon=True)
+        self.thread.start()
+
+    def check_tables(self):
+        # the upserts need the unique keys, a missing one fails every flush
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                for table, key in KEYS.items():
+                    cur.execute('SELECT to_regclass(%s) IS NOT NULL',
+                                (f'{table}_{"_".join(key)}_key',))
+                    if not cur.fetchone()[0]:
+                        print(f'{table}: no unique key on {", ".join(key)}, run migrate.py')
+                cur.execute('SELECT table_name FROM information_schema.columns'
+                            ' WHERE column_name = \'xact\' AND table_name = ANY(%s)',
+                            (list(COLUMNS),))
+                self.xact = {table for table, in cur.fetchall()}
+
+    def put(self, table, row):
+        with self.lock:
+            self.rows.append((table, row))
+            if len(self.rows) >= self.flush_size:
+                self.wakeup.set()
+
+    def flush_loop(self):
+        while not self.stop_event.is_set():
+            self.wakeup.wait(self.flush_interval + self.retry_delay)
+            self.wakeup.clear()
+            if self.flush():
+                self.retry_delay = 0
+            else:
+                self.retry_delay = min(max(2*self.retry_delay, 1), RETRY_MAX)
+
+    def flush(self):
+        with self.flush_lock:
+            with self.lock:
+                rows, self.rows = self.rows, []
+            if not rows:
+                return True
+
+            by_table = {}
+            for table, row in rows:
+                by_table.setdefault(table, []).append(row)
+
+            tic = time.time()
+            try:
+                with self.pool.connection() as conn:
+                    with conn.cursor() as cur:
+                        for table, batch in by_table.items():
+                            columns, key = COLUMNS[table], KEYS[table]
+                            update = ', '.join(f'{c} = EXCLUDED.{c}'
+                                               for c in columns if c not in key)
+                            if table in self.xact:
+                                # an update is new to readers of the commit order
+                                # watermark (session_summary.py) like an insert
+                                update += ', xact = pg_current_xact_id()::text::bigint'
+                            cur.executemany(
+                                f'INSERT INTO {table} ({", ".join(columns)})'
+                                f' VALUES ({", ".join(["%s"]*len(columns))})'
+                                f' ON CONFLICT ({", ".join(key)}) DO UPDATE SET {update}',
+                                batch)
+            except Exception as e:
+                print(f'db write error ({len(rows)} rows kept): {str(e)}')
+                with self.lock:
+                    self.rows = rows + self.rows
+                return False
+
+            self.write_time += time.time() - tic
+            self.written += len(rows)
+            self.batches += 1
+            return True
+
+    def summary(self):
+        print(f'db: {self.written} rows in {self.batches} batches, '
+              f'{1000*self.write_time/max(self.batches, 1):.1f}ms/batch, '
+              f'{len(self.rows)} not written')
+
+    def close(self):
+        self.stop_event.set()
+        self.wakeup.set()
+        self.thread.join(timeout=5)
+        self.flush()
+        self.pool.close()
@@ -0,0 +1,170 @@
+import os
+import sys
+import socket
+import threading
+from contextlib import contextmanager
+import psycopg as pg
+
+
+# Work queue in the llm_jobs table (migrations/009). Several interpreter
+# workers, on one or more machines, claim jobs with FOR UPDATE SKIP LOCKED,
+# so no job is processed twice. A job whose worker crashed is claimed
+# again when its lease expires, up to MAX_ATTEMPTS claims; leases of jobs in hand are renewed by
+# heartbeat() so a slow batch is not taken over while it still runs.
+# Usage: python jobs.py <db ip> <db passwd>    backlog and worker stats
+LEASE = 1800        # seconds a claimed job belongs to its worker
+MAX_ATTEMPTS = 3    # claims per job before it is marked failed
+HEARTBEAT = LEASE // 3  # seconds between lease renewals of the jobs in hand
+
+
+def worker_id():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def enqueue(conn, kind, paths, status='pending'):
+    """add jobs, already known (kind, path) are ignored; returns number added"""
+    with conn.cursor() as cur:
+        cur.executemany(
+            'INSERT INTO llm_jobs (kind, path, status, finished)'
+            ' VALUES (%s, %s, %s, CASE WHEN %s = \'done\' THEN now() END)'
+            ' ON CONFLICT (kind, path) DO NOTHING',
+            [(kind, p, status, status) for p in paths])
+        n = cur.rowcount
+    conn.commit()
+    return n
+
+
+def claim(conn, kind, worker, n=1, lease=LEASE, max_attempts=MAX_ATTEMPTS):
+    """lease up to n pending or expired jobs, returns [(id, path)]"""
+    with conn.cursor() as cur:
+        # a job that kept crashing or hanging its workers is not retried forever
+        cur.execute(
+            'UPDATE llm_jobs SET status = \'failed\', finished = now(), leased_until = NULL,'
+            ' error = coalesce(error, \'lease expired\')'
+            ' WHERE kind = %s AND status = \'leased\' AND leased_until < now()'
+            ' AND attempts >= %s',
+            (kind, max_attempts))
+        if cur.rowcount:
+            print(f'{cur.rowcount} {kind} jobs failed, lease expired {max_attempts} times')
+        cur.execute(
+            'UPDATE llm_jobs SET status = \'leased\', worker = %s,'
+            ' attempts = attempts + 1,'
+            ' leased_until = now() + make_interval(secs => %s)'
+            ' WHERE id IN ('
+            '  SELECT id FROM llm_jobs WHERE kind = %s'
+            '  AND (status = \'pending\''
+            '       OR (status = \'leased\' AND leased_until < now()'
+            '           AND attempts < %s))'
+            '  ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED)'
+            ' RETURNING id, path',
+            (worker, lease, kind, max_attempts, n))
+        jobs = sorted(cur.fetchall())
+    conn.commit()
+    return jobs
+
+
+def renew(conn, job_id, worker, lease=LEASE):
+    """extend a lease, False if the job was taken over by another worker"""
+    with conn.cursor() as cur:
+        cur.execute(
+            'UPDATE llm_jobs SET leased_until = now() + make_interval(secs => %s)'
+            ' WHERE id = %s AND worker = %s AND status = \'leased\'',
+            (lease, job_id, worker))
+        ok = cur.rowcount == 1
+    conn.commit()
+    return ok
+
+
+@contextmanager
+def heartbeat(conn_str, worker, job_ids, interval=HEARTBEAT):
+    """renew the leases of job_ids every interval seconds while the block runs"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                # own connection, the caller's one is busy in its thread
+                with pg.connect(conn_str) as conn:
+                    for job_id in job_ids:
+                        if not renew(conn, job_id, worker):
+                            print(f'job {job_id}: lease lost while running')
+            except Exception as e:
+                print(f'lease renewal error: {str(e)}')
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def done(conn, job_id, worker):
+    with conn.cursor() as cur:
+        cur.execute(
+            'UPDATE llm_jobs SET status = \'done\', finished = now(),'
+            ' leased_until = NULL, error = NULL'
+            ' WHERE id = %s AND worker = %s AND status = \'leased\'',
+            (job_id, worker))
+        ok = cur.rowcount == 1
+    conn.commit()
+    if not ok:
+        print(f'job {job_id}: lease lost before done')
+    return ok
+
+
+def fail(conn, job_id, worker, error=None, max_attempts=MAX_ATTEMPTS):
+    # back to pending for another worker, failed after max_attempts claims
+    with conn.cursor() as cur:
+        cur.execute(
+            'UPDATE llm_jobs SET leased_until = NULL, error = %s,'
+            ' status = CASE WHEN attempts >= %s THEN \'failed\' ELSE \'pending\' END,'
+            ' finished = CASE WHEN attempts >= %s THEN now() END'
+            ' WHERE id = %s AND worker = %s AND status = \'leased\'',
+            (str(error)[:1024] if error else None,
+             max_attempts, max_attempts, job_id, worker))
+    conn.commit()
+
+
+def stats(conn, window=3600):
+    """backlog per kind, and per worker throughput over the last window seconds"""
+    with conn.cursor() as cur:
+        cur.execute(
+            'SELECT kind,'
+            ' count(*) FILTER (WHERE status = \'pending\'),'
+            ' count(*) FILTER (WHERE status = \'leased\' AND leased_until >= now()),'
+            ' count(*) FILTER (WHERE status = \'leased\' AND leased_until < now()),'
+            ' count(*) FILTER (WHERE status = \'done\'),'
+            ' count(*) FILTER (WHERE status = \'failed\')'
+            ' FROM llm_jobs GROUP BY kind ORDER BY kind')
+        kinds = cur.fetchall()
+        cur.execute(
+            'SELECT worker, kind, count(*), max(finished)'
+            ' FROM llm_jobs WHERE status = \'done\''
+            ' AND finished > now() - make_interval(secs => %s)'
+            ' GROUP BY worker, kind ORDER BY worker, kind',
+            (window,))
+        workers = cur.fetchall()
+    conn.commit()
+    return kinds, workers
+
+
+def report(conn, window=3600):
+    kinds, workers = stats(conn, window)
+    print('='*40)
+    print(f'{"kind":8} {"backlog":>8} {"in flight":>9} {"expired":>8} '
+          f'{"done":>8} {"failed":>7}')
+    for kind, pending, leased, expired, ok, failed in kinds:
+        print(f'{kind:8} {pending:8} {leased:9} {expired:8} {ok:8} {failed:7}')
+    print(f'workers, last {window//60} min:')
+    for worker, kind, n, last in workers:
+        print(f'  {worker} {kind}: {n} done, {n/window*3600:.1f}/h, last {last}')
+
+
+if __name__ == "__main__":
+    HOST = sys.argv[1].strip()
+    PASSWD = sys.argv[2].strip()
+    conn_str = f'postgresql://iotproj:{PASSWD}@{HOST}:5432/iotdb'
+    with pg.connect(conn_str) as conn:
+        report(conn)
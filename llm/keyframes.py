@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+from PIL import Image
+
+
+K = 10              # max frames per session sent to the llm
+HASH_SIZE = 8       # dhash of 8x8 -> 64 bits
+HIST_BINS = 16      # gray level histogram
+HINT_WINDOW = 30    # seconds, frames this close to a sensor hint get the bonus
+HINT_BONUS = 0.5    # score multiplier bonus for hinted frames
+TIME_WEIGHT = 0.5   # weight of the time gap, spreads frames over the session
+TEMP_JUMP = 1.0     # degrees between two samples counted as a spike
+
+
+def frame_time(path):
+    # <prefix>_<sid>_<YYYYmmdd>_<HHMMSS>.jpg, same as get_sid_datetime
+    name = path.name.rsplit('.', 1)[0]
+    return datetime.strptime(' '.join(name.split('_')[2:]), '%Y%m%d %H%M%S')
+
+
+def signature(path):
+    """(dhash, normalized gray histogram) of a frame"""
+    with Image.open(path) as img:
+        img.draft('L', (64, 64))  # jpeg decodes at 1/8 scale
+        img = img.convert('L')
+        small = img.resize((HASH_SIZE+1, HASH_SIZE), Image.Resampling.BILINEAR)
+        hist = img.histogram()
+    px = list(small.getdata())
+    h = 0
+    for y in range(HASH_SIZE):
+        row = px[y*(HASH_SIZE+1):(y+1)*(HASH_SIZE+1)]
+        for x in range(HASH_SIZE):
+            h = h << 1 | (row[x] < row[x+1])
+    step = 256 // HIST_BINS
+    bins = [sum(hist[i:i+step]) for i in range(0, 256, step)]
+    total = sum(bins) or 1
+    return h, [b/total for b in bins]
+
+
+def distance(a, b):
+    # 0 for the same frame, up to 2 for totally different ones
+    ham = bin(a[0] ^ b[0]).count('1') / HASH_SIZE**2
+    hist = sum(abs(x-y) for x, y in zip(a[1], b[1])) / 2
+    return ham + hist
+
+
+def hints(conn, sid):
+    """datetimes of motion rising edges and temperature spikes of a session"""
+    times = []
+    with conn.cursor() as cur:
+        for sensor in ('motion1', 'motion2'):
+            cur.execute('SELECT datetime, value FROM motion_edge'
+                        ' WHERE sensor = %s AND session = %s ORDER BY datetime',
+                        (sensor, sid))
+            last = False
+            for dt, value in cur.fetchall():
+                if value and not last:
+                    times.append(dt)
+                last = value
+        cur.execute('SELECT datetime, value FROM temperature'
+                    ' WHERE session = %s ORDER BY datetime', (sid,))
+        last = None
+        for dt, value in cur.fetchall():
+            if last is not None and abs(float(value)-last) >= TEMP_JUMP:
+                times.append(dt)
+            last = float(value)
+    return sorted(times)
+
+
+def select(fn, k=K, hint_times=()):
+    """pick up to k frames of a session, as different from each other as possible
+
+    Farthest point selection seeded with the first and last frame. Each round
+    takes the frame farthest from everything selected, by image distance plus
+    time gap, with a bonus near sensor hints. Returned in time order.
+    """
+    fn = sorted(fn)
+    if len(fn) <= k:
+        return fn
+
+    sigs, times = [], []
+    for f in fn:
+        try:
+            sigs.append(signature(f))
+        except Exception as e:
+            print(f'{f.name}, signature error: {str(e)}')
+            sigs.append(None)
+        times.append(frame_time(f))
+    span = (times[-1]-times[0]).total_seconds() or 1
+    window = timedelta(seconds=HINT_WINDOW)
+    hint_times = sorted(hint_times)
+    bonus = [1 + HINT_BONUS*any(abs(t-h) <= window for h in hint_times)
+             for t in times]
+
+    def dist(i, j):
+        if sigs[i] is None or sigs[j] is None:
+            return 0.0
+        gap = abs((times[i]-times[j]).total_seconds()) / span
+        return distance(sigs[i], sigs[j]) + TIME_WEIGHT*gap
+
+    chosen = [0, len(fn)-1]
+    # distance of every frame to its nearest chosen frame, updated per pick
+    near = [min(dist(i, 0), dist(i, len(fn)-1)) for i in range(len(fn))]
+    while len(chosen) < k:
+        best = max((i for i in range(len(fn)) if i not in chosen and sigs[i]),
+                   key=lambda i: near[i]*bonus[i], default=None)
+        if best is None or near[best] == 0:
+            break
+        chosen.append(best)
+        near = [min(near[i], dist(i, best)) for i in range(len(fn))]
+
+    return [fn[i] for i in sorted(chosen)]
@@ -1,13 +1,21 @@
 import sys
-import base64
-import json
+import asyncio
 import time
 from datetime import datetime
 from pathlib import Path
 from langchain_ollama import ChatOllama
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, AIMessage
 import psycopg as pg
 from prompts import *
+from runner import LLMRunner, percentile
+from cache import LLMCache
+from payload import Payload, NATIVE_SIZE
+import payload
+import jobs
+import parse
+from parse import parse_answer, ParseError
+from dbwriter import ResultWriter
+import prefilter
 
 
 HOST = sys.argv[2].strip()
@@ -25,33 +33,68 @@ conn_str = f'postgresql://{OWNER}:{PASSWD}@{HOST}:{PORT}/{DBNAME}'
 
 IMG_PATH = Path('images')
 MODEL = 'gemma3:27b'
+TEMPERATURE = 0.1
 LLM_HOST = f'http://{sys.argv[1].strip()}:11444'
+CONCURRENCY = 4
+PAYLOAD_SIZE = NATIVE_SIZE  # 0 sends the full size jpeg
+DB_FLUSH_INTERVAL = 10  # seconds between batched result writes
+USE_JOBS = False    # claim images from the llm_jobs table instead of fskip.txt
+STREAM = True       # stream answers, stop generating once they are decided
+PREFILTER = True    # skip cold/dark frames before any llm call, see prefilter.py
 
 
-j2d = lambda x: json.loads(x.split('```')[1][4:])
+# results are queued here and upserted in batches, see main
+writer = None
 
+# prefilter.SessionSensors by session id, read once per session
+sensors = {}
+prefilter_stats = prefilter.Stats()
+
+# answers keyed by (image, prompt, model, temperature)
+cache = LLMCache()
+
+# seconds from start of an image until cooking or not is known
+decisions = []
+
+
+async def interpret_img(runner, img, sys_prompt):
+    # returns the parsed json answer, from cache if nothing changed
+    if cache is not None:
+        key = cache.key(img.images, sys_prompt.content, MODEL, TEMPERATURE)
+        hit = cache.get(key)
+        resp = parse.cached(hit[1], sys_prompt) if hit is not None else None
+        if resp is not None:
+            return resp
 
-def interpret_img(llm, img_b64, sys_prompt):
     msg = [
         sys_prompt,
-        HumanMessage(
-            content=[
-                {
-                    'type': 'text',
-                    'text': 'This is the image.'
-                },
-                {
-                    'type': 'image_url',  # For base64, use 'image_url' with a data URL
-                    'image_url': {
-                        'url': f'data:image/jpeg;base64,{img_b64}'
-                    },
-                },
-            ]
-        )
+        HumanMessage(content=img.content('This is the image.'))
     ]
 
-    response = llm.invoke(msg)
-    return response.content
+    for attempt in range(parse.REASK+1):
+        if STREAM:
+            text, resp = await runner.stream(msg, lambda t: parse.decide(t, sys_prompt))
+            response = AIMessage(content=text)
+            if resp is not None:
+                parse.count(parse.prompt_name(sys_prompt), 'answers')
+                break
+        else:
+            response = await runner.invoke(msg)
+        try:
+            resp = parse_answer(response.content, sys_prompt)
+            break
+        except ParseError as e:
+            if attempt == parse.REASK:
+                raise
+            # ask this prompt again, not the whole chain
+            print(f'parse error: {str(e)}, re-ask')
+            parse.count(parse.prompt_name(sys_prompt), 'reasks')
+            msg = msg[:2] + [AIMessage(content=response.content),
+                             HumanMessage(content=parse.REASK_MSG)]
+
+    if cache is not None:
+        cache.put(key, response.content, resp)
+    return resp
 
 
 def get_sid_datetime(name: str) -> tuple[int, datetime]:
@@ -60,77 +103,143 @@ def get_sid_datetime(name: str) -> tuple[int, datetime]:
     return sid, dt
 
 
-def interpret_process(llm, img):    
+def prefilter_frame(img):
+    # (pass, reason) of the local gate, frames pass if the DB is not reachable
+    sid, dt = get_sid_datetime(img.name[:-4])
+    try:
+        if sid not in sensors:
+            with writer.pool.connection() as conn:
+                sensors[sid] = prefilter.SessionSensors.from_db(conn, sid)
+        ok, reason = prefilter.gate(sensors[sid], dt, img)
+    except Exception as e:
+        print(f'{img.name}, prefilter error: {str(e)}')
+        return True, 'error'
+    prefilter_stats.add(ok, reason)
+    return ok, reason
+
+
+def write_db(sid, dt, ingredient, style):
+    writer.put('image', (sid, dt, ingredient, style))
+
+
+async def interpret_process(runner, img):
     try:
         tic = time.time()
-        # base64
-        with open(img,"rb") as f:
-            img_b64 = base64.b64encode(f.read()).decode('utf-8')
+        # step 0: cold stove or dark frame, not worth an llm call
+        if PREFILTER:
+            ok, reason = await asyncio.to_thread(prefilter_frame, img)
+            if not ok:
+                print(img.name, 'prefilter:', reason)
+                with open('fskip.txt', 'a+') as f:
+                    f.write(img.name+'\n')
+                return True
+
+        # downscale and base64 once, shared by all 3 prompts
+        img_b64 = await asyncio.to_thread(Payload, [img], PAYLOAD_SIZE)
         
         # step 1: if cooking
-        resp = interpret_img(llm, img_b64, PROMPT_01)
-        resp = j2d(resp)
-        print('step 1:', resp)
+        resp = await interpret_img(runner, img_b64, PROMPT_01)
+        decisions.append(time.time()-tic)
+        print(img.name, 'step 1:', resp)
         
         # step 2 & 3: ingredient & style
         if resp['cooking']:
             sid, dt = get_sid_datetime(img.name[:-4])
-            resp = interpret_img(llm, img_b64, PROMPT_02)
-            resp = j2d(resp)
-            print('step 2:', resp)
+            resp = await interpret_img(runner, img_b64, PROMPT_02)
+            print(img.name, 'step 2:', resp)
             if len(resp['ingredient']) != 0:
                 ingredient = ' '.join(resp['ingredient'])
-                resp = interpret_img(llm, img_b64, PROMPT_03)
-                resp = j2d(resp)
-                print('step 3:', resp)
+                resp = await interpret_img(runner, img_b64, PROMPT_03)
+                print(img.name, 'step 3:', resp)
                 style = resp['style']
             else:
                 ingredient = None
                 style = None
             
-            # write DB
-            with pg.connect(conn_str) as conn:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        f'INSERT INTO image (session,datetime,ingredient,style)'
-                        f' VALUES (%s, %s, %s, %s)',
-                         (sid, dt, ingredient, style)
-                    )
-                conn.commit()
+            # write DB, queued for the next batch
+            write_db(sid, dt, ingredient, style)
+
+        # save
+        with open('fskip.txt', 'a+') as f:
+            f.write(img.name+'\n')
+        img_b64.report(time.time()-tic)
     
     except Exception as e:
         print(f'{img}, error: {str(e)}')
         return False
     
     finally:
-        print('Time:', time.time()-tic)
+        print(img.name, 'Time:', time.time()-tic)
     
     return True
 
 
+async def run_jobs(runner, todo, fskip):
+    # any number of workers can run this, each claims its own batches;
+    # one event loop for all of them, the llm client's connections belong to it
+    worker = jobs.worker_id()
+    with await asyncio.to_thread(pg.connect, conn_str) as conn:
+        # images found here are fed to the queue, fskip.txt ones as done
+        await asyncio.to_thread(
+            jobs.enqueue, conn, 'image', [img.relative_to(IMG_PATH).as_posix()
+                                          for img in IMG_PATH.rglob('*')
+                                          if img.is_file() and img.name in fskip],
+            status='done')
+        added = await asyncio.to_thread(
+            jobs.enqueue, conn, 'image', [img.relative_to(IMG_PATH).as_posix()
+                                          for img in todo])
+        print(worker, 'new jobs:', added)
+        while True:
+            batch = await asyncio.to_thread(jobs.claim, conn, 'image', worker,
+                                            n=CONCURRENCY*2)
+            if not batch:
+                break
+            with jobs.heartbeat(conn_str, worker, [job_id for job_id, _ in batch]):
+                results = await runner.arun([IMG_PATH / path for _, path in batch],
+                                            interpret_process)
+            # results are in the DB before their jobs are marked done
+            written = await asyncio.to_thread(writer.flush)
+            for (job_id, _), ok in zip(batch, results):
+                if ok and written:
+                    await asyncio.to_thread(jobs.done, conn, job_id, worker)
+                else:
+                    await asyncio.to_thread(
+                        jobs.fail, conn, job_id, worker,
+                        'interpret failed' if not ok else 'results not written')
+        await asyncio.to_thread(jobs.report, conn)
+
+
 if __name__ == "__main__":
     print(MODEL)
     llm = ChatOllama(model=MODEL,
                      base_url=LLM_HOST,
-                     temperature=0.1)
+                     temperature=TEMPERATURE)
     
     with open('fskip.txt') as f:
         fskip = f.readlines()
-    fskip = list(map(lambda x:x.strip(), fskip))
+    fskip = set(map(lambda x:x.strip(), fskip))
     
-    for img in IMG_PATH.rglob('*'):
-        if img.is_file():
-            if img.name in fskip:
-                continue
-            
-            print('*', img)
-            fskip.append(img.name)
-            
-            # give each image two chances
-            for _ in range(2):
-                if interpret_process(llm, img) is True:
-                    # save
-                    with open('fskip.txt', 'a+') as f:
-                        f.write(img.name+'\n')
-                    break
+    todo = [img for img in IMG_PATH.rglob('*')
+                if img.is_file() and img.name not in fskip]
+    print('images:', len(todo))
 
+    # N images in flight, each request with timeout and retry/backoff
+    writer = ResultWriter(conn_str, flush_interval=DB_FLUSH_INTERVAL)
+    runner = LLMRunner(llm, concurrency=CONCURRENCY)
+    try:
+        if USE_JOBS:
+            asyncio.run(run_jobs(runner, todo, fskip))
+        else:
+            runner.run(todo, interpret_process)
+    finally:
+        writer.close()
+    runner.summary()
+    if decisions:
+        print(f'time to decision: mean {sum(decisions)/len(decisions):.2f}s, '
+              f'p50 {percentile(decisions, 50):.2f}s, '
+              f'p95 {percentile(decisions, 95):.2f}s')
+    writer.summary()
+    prefilter_stats.summary()
+    payload.summary()
+    parse.summary()
+    cache.summary()
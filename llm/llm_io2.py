@@ -1,13 +1,21 @@
 import sys
-import base64
-import json
 import time
 from datetime import datetime
 from pathlib import Path
 from langchain_ollama import ChatOllama
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import HumanMessage, AIMessage
 import psycopg as pg
 from prompts import *
+from cache import LLMCache
+from runner import percentile
+from payload import Payload, NATIVE_SIZE
+import payload
+import keyframes
+import jobs
+import parse
+from parse import parse_answer, ParseError
+from dbwriter import ResultWriter
+import prefilter
 
 
 HOST = sys.argv[2].strip()
@@ -25,29 +33,115 @@ conn_str = f'postgresql://{OWNER}:{PASSWD}@{HOST}:{PORT}/{DBNAME}'
 
 IMG_PATH = Path('images')
 MODEL = 'gemma3:27b'
+TEMPERATURE = 0.1
 LLM_HOST = f'http://{sys.argv[1].strip()}:11444'
+SINGLE_CALL = True  # one structured call, chained prompts only as fallback
+PAYLOAD_SIZE = NATIVE_SIZE  # 0 sends the full size jpegs
+KEYFRAMES = keyframes.K     # most different frames per session, 0 for the last 10
+DB_FLUSH_INTERVAL = 10  # seconds between batched result writes
+USE_JOBS = False    # claim sessions from the llm_jobs table instead of dskip.txt
+STREAM = True       # stream answers, stop generating once they are decided
+PREFILTER = True    # skip cold/dark frames before any llm call, see prefilter.py
 
 
-j2d = lambda x: json.loads(x.split('```')[1][4:])
+# json schema for PROMPT_08, passed to ollama as structured output format
+EXTRACT_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'cooking': {'type': 'boolean'},
+        'ingredient': {'type': 'array', 'items': {'type': 'string'}},
+        'style': {'type': 'string'},
+        'desc': {'type': 'string'},
+    },
+    'required': ['cooking', 'ingredient', 'style', 'desc'],
+}
+
+# token usage of all llm calls
+usage = {'calls': 0, 'input': 0, 'output': 0, 'stopped': 0}
+
+# seconds per cooking-or-not request (PROMPT_04/08) until it was answered
+decisions = []
+
+
+# results are queued here and upserted in batches, see main
+writer = None
+
+# prefilter.SessionSensors by session id, read once per session
+sensors = {}
+prefilter_stats = prefilter.Stats()
+
+# answers keyed by (images, prompt, model, temperature)
+cache = LLMCache()
+
+
+def count_usage(response):
+    if response.usage_metadata:
+        usage['input'] += response.usage_metadata['input_tokens']
+        usage['output'] += response.usage_metadata['output_tokens']
+
+
+def stream_answer(llm, msg, sys_prompt):
+    # stream until the answer is decided, returns (text, answer or None)
+    text = ''
+    resp = None
+    stream = llm.stream(msg)
+    try:
+        for chunk in stream:
+            text += chunk.content
+            count_usage(chunk)
+            resp = parse.decide(text, sys_prompt)
+            if resp is not None:
+                usage['stopped'] += 1
+                break
+    finally:
+        # closing the stream drops the connection, ollama stops generating
+        stream.close()
+    return text, resp
 
 
 def interpret_img(llm, fn_b64, sys_prompt):
-    content = []
-    for img_b64 in fn_b64:
-        content.append({
-            'type': 'image_url',
-            'image_url': {
-                'url': f'data:image/jpeg;base64,{img_b64}'
-            }
-        })
+    # returns the parsed answer, from cache if nothing changed
+    if cache is not None:
+        key = cache.key(fn_b64.images, sys_prompt.content, MODEL, TEMPERATURE)
+        hit = cache.get(key)
+        resp = parse.cached(hit[1], sys_prompt) if hit is not None else None
+        if resp is not None:
+            return resp
 
     msg = [
         sys_prompt,
-        HumanMessage(content=content)
+        HumanMessage(content=fn_b64.content())
     ]
 
-    response = llm.invoke(msg)
-    return response.content
+    tic = time.time()
+    for attempt in range(parse.REASK+1):
+        usage['calls'] += 1
+        if STREAM:
+            text, resp = stream_answer(llm, msg, sys_prompt)
+            response = AIMessage(content=text)
+            if resp is not None:
+                parse.count(parse.prompt_name(sys_prompt), 'answers')
+                break
+        else:
+            response = llm.invoke(msg)
+            count_usage(response)
+        try:
+            resp = parse_answer(response.content, sys_prompt)
+            break
+        except ParseError as e:
+            if attempt == parse.REASK:
+                raise
+            # ask this prompt again, not the whole chain
+            print(f'parse error: {str(e)}, re-ask')
+            parse.count(parse.prompt_name(sys_prompt), 'reasks')
+            msg = msg[:2] + [AIMessage(content=response.content),
+                             HumanMessage(content=parse.REASK_MSG)]
+
+    if 'cooking' in parse.FIELDS.get(parse.prompt_name(sys_prompt), ()):
+        decisions.append(time.time()-tic)
+    if cache is not None:
+        cache.put(key, response.content, resp)
+    return resp
 
 
 def get_sid_datetime(name: str) -> tuple[int, datetime]:
@@ -56,49 +150,126 @@ def get_sid_datetime(name: str) -> tuple[int, datetime]:
     return sid, dt
 
 
-def interpret_process(llm, fn):
+def prefilter_frame(img):
+    # (pass, reason) of the local gate, frames pass if the DB is not reachable
+    sid, dt = get_sid_datetime(img.name[:-4])
     try:
+        if sid not in sensors:
+            with writer.pool.connection() as conn:
+                sensors[sid] = prefilter.SessionSensors.from_db(conn, sid)
+        ok, reason = prefilter.gate(sensors[sid], dt, img)
+    except Exception as e:
+        print(f'{img.name}, prefilter error: {str(e)}')
+        return True, 'error'
+    prefilter_stats.add(ok, reason)
+    return ok, reason
+
+
+def session_hints(sid):
+    # motion and temperature spikes from the DB, none if the DB is not reachable
+    try:
+        with pg.connect(conn_str) as conn:
+            return keyframes.hints(conn, sid)
+    except Exception as e:
+        print(f'hints error: {str(e)}')
+        return []
+
+
+def select_frames(fn):
+    if not KEYFRAMES:
+        return fn[-10:]
+    sid, _ = get_sid_datetime(fn[0].name[:-4])
+    tic = time.time()
+    frames = keyframes.select(fn, KEYFRAMES, session_hints(sid))
+    print('keyframes:', [f.name for f in frames], f'{time.time()-tic:.2f}s')
+    return frames
+
+
+def validate_extract(resp):
+    """check a PROMPT_08 answer against EXTRACT_SCHEMA, None if invalid"""
+    if not isinstance(resp, dict) or not isinstance(resp.get('cooking'), bool):
+        return None
+    if not resp['cooking']:
+        return {'cooking': False}
+
+    ingredient = resp.get('ingredient')
+    if not isinstance(ingredient, list) \
+            or not all(isinstance(i, str) and i.strip() for i in ingredient):
+        return None
+    ingredient = [i.strip() for i in ingredient]
+    if not ingredient:
+        return {'cooking': True, 'ingredient': None, 'style': None, 'desc': None}
+
+    style, desc = resp.get('style'), resp.get('desc')
+    if not isinstance(style, str) or not style.strip() or len(style.split()) != 1:
+        return None
+    if not isinstance(desc, str) or not desc.strip():
+        return None
+    return {'cooking': True,
+            'ingredient': ingredient,
+            'style': style.strip().lower(),
+            'desc': desc.strip()}
+
+
+def extract_single(llm_json, fn_b64):
+    try:
+        resp = interpret_img(llm_json, fn_b64, PROMPT_08)
+    except ParseError:
+        return None
+    return validate_extract(resp)
+
+
+def extract_chained(llm, fn_b64):
+    resp = interpret_img(llm, fn_b64, PROMPT_04)
+    print('cooking:', resp['cooking'])
+    if not resp['cooking']:
+        return {'cooking': False}
+
+    resp = interpret_img(llm, fn_b64, PROMPT_05)
+    print(resp['ingredient'])
+    ingredient = resp['ingredient']
+
+    if ingredient:
+        resp = interpret_img(llm, fn_b64, PROMPT_06)
+        print(resp['style'])
+        style = resp['style']
+
+        resp = interpret_img(llm, fn_b64, PROMPT_07)
+        print(resp['desc'])
+        desc = resp['desc']
+    else:
+        ingredient = style = desc = None
+
+    return {'cooking': True, 'ingredient': ingredient, 'style': style, 'desc': desc}
+
+
+def extract(llm, fn_b64, llm_json=None):
+    # single structured call first, the prompt chain only if it fails validation
+    if llm_json is not None:
+        result = extract_single(llm_json, fn_b64)
+        if result is not None:
+            print('single call:', result)
+            return result
+        print('single call invalid, fall back to chained prompts')
+    return extract_chained(llm, fn_b64)
+
+
+def interpret_process(llm, fn, llm_json=None):
+    try:
+        tic = time.time()
         sid, dt = get_sid_datetime(fn[0].name[:-4])
         
-        fn_b64 = []
-        for img in fn:
-            with open(img,"rb") as f:
-                fn_b64.append(base64.b64encode(f.read()).decode('utf-8'))
+        # downscale and base64 once per session, shared by all prompts
+        fn_b64 = Payload(fn, PAYLOAD_SIZE)
         
-        tic = time.time()
-        
-        resp = interpret_img(llm, fn_b64, PROMPT_04)
-        resp = j2d(resp)
-        print('cooking:', resp['cooking'])
+        resp = extract(llm, fn_b64, llm_json)
 
         if resp['cooking']:
-            resp = interpret_img(llm, fn_b64, PROMPT_05)
-            resp = j2d(resp)
-            print(resp['ingredient'])
-            ingredient = resp['ingredient']
-
-            if ingredient:
-                resp = interpret_img(llm, fn_b64, PROMPT_06)
-                resp = j2d(resp)
-                print(resp['style'])
-                style = resp['style']
-
-                resp = interpret_img(llm, fn_b64, PROMPT_07)
-                resp = j2d(resp)
-                print(resp['desc'])
-                desc = resp['desc']
-            else:
-                ingredient = style = desc = None
+            ingredient, style, desc = resp['ingredient'], resp['style'], resp['desc']
  
-            # write DB
-            with pg.connect(conn_str) as conn:
-                with conn.cursor() as cur:
-                    cur.execute(
-                    f'INSERT INTO image2 (session,datetime,ingredient,style,description)'
-                    f' VALUES (%s, %s, %s, %s, %s)',
-                        (sid, dt, ingredient, style, desc)
-                    )
-                conn.commit()
+            # write DB, queued for the next batch
+            writer.put('image2', (sid, dt, ingredient, style, desc))
+        fn_b64.report(time.time()-tic)
     
     except Exception as e:
         print(f'error: {str(e)}')
@@ -110,29 +281,89 @@ def interpret_process(llm, fn):
     return True
 
 
+def process_folder(llm, folder, llm_json=None):
+    print('* in folder:', folder.name, end=', ') 
+    fn = sorted([f for f in folder.rglob('*')])
+    print(len(fn))
+
+    if PREFILTER and fn:
+        fn = [f for f in fn if prefilter_frame(f)[0]]
+        if not fn:
+            print('prefilter: no frame may be cooking')
+            with open('dskip.txt', 'a+') as f:
+                f.write(folder.name+'\n')
+            return True
+
+    if len(fn) != 0:
+        frames = select_frames(fn)
+        for _ in range(2):
+            if interpret_process(llm, frames, llm_json) is True:
+                with open('dskip.txt', 'a+') as f:
+                    f.write(folder.name+'\n')
+                return True
+    return False
+
+
+def run_jobs(llm, llm_json, dskip):
+    # any number of workers can run this, one session per claim
+    worker = jobs.worker_id()
+    with pg.connect(conn_str) as conn:
+        folders = [f.name for f in IMG_PATH.iterdir() if f.is_dir()]
+        # folders found here are fed to the queue, dskip.txt ones as done
+        jobs.enqueue(conn, 'session', [f for f in folders if f in dskip],
+                     status='done')
+        added = jobs.enqueue(conn, 'session', [f for f in folders if f not in dskip])
+        print(worker, 'new jobs:', added)
+        while True:
+            batch = jobs.claim(conn, 'session', worker)
+            if not batch:
+                break
+            job_id, path = batch[0]
+            with jobs.heartbeat(conn_str, worker, [job_id]):
+                ok = process_folder(llm, IMG_PATH / path, llm_json)
+            # results are in the DB before the job is marked done
+            if ok and writer.flush():
+                jobs.done(conn, job_id, worker)
+            else:
+                jobs.fail(conn, job_id, worker,
+                          'interpret failed' if not ok else 'results not written')
+        jobs.report(conn)
+
+
 if __name__ == "__main__":
     print(MODEL)
     llm = ChatOllama(model=MODEL,
                      base_url=LLM_HOST,
-                     temperature=0.1)
+                     temperature=TEMPERATURE)
+    llm_json = ChatOllama(model=MODEL,
+                          base_url=LLM_HOST,
+                          temperature=TEMPERATURE,
+                          format=EXTRACT_SCHEMA) if SINGLE_CALL else None
     
     with open('dskip.txt') as f:
         dskip = f.readlines()
-    dskip = list(map(lambda x:x.strip(), dskip))
+    dskip = set(map(lambda x:x.strip(), dskip))
     
-    for folder in IMG_PATH.iterdir():
-        if folder.is_dir():
-            if folder.name in dskip:
-                continue
-
-            print('* in folder:', folder.name, end=', ') 
-            fn = sorted([f for f in folder.rglob('*')])
-            print(len(fn))
-
-            if len(fn) != 0:
-                for _ in range(2):
-                    if interpret_process(llm, fn[-10:]) is True:
-                        with open('dskip.txt', 'a+') as f:
-                            f.write(folder.name+'\n')
-                        break
+    writer = ResultWriter(conn_str, flush_interval=DB_FLUSH_INTERVAL)
+    try:
+        if USE_JOBS:
+            run_jobs(llm, llm_json, dskip)
+        else:
+            for folder in IMG_PATH.iterdir():
+                if folder.is_dir():
+                    if folder.name in dskip:
+                        continue
+                    process_folder(llm, folder, llm_json)
+    finally:
+        writer.close()
 
+    writer.summary()
+    print(f'llm calls: {usage["calls"]}, stopped early: {usage["stopped"]}')
+    if decisions:
+        print(f'time to decision: mean {sum(decisions)/len(decisions):.2f}s, '
+              f'p50 {percentile(decisions, 50):.2f}s, '
+              f'p95 {percentile(decisions, 95):.2f}s')
+    prefilter_stats.summary()
+    payload.summary()
+    parse.summary()
+    cache.summary()
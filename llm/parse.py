@@ -0,0 +1,225 @@
+import json
+from prompts import *
+
+
+# Tolerant parser for model answers: markdown fences or not, prose around
+# the object, truncated output, misspelled keys. Failures and re-asks are
+# counted per prompt, see summary().
+REASK = 1   # extra requests with the same prompt when the answer can't be parsed
+
+REASK_MSG = ('Your answer could not be parsed. Reply again with only the '
+             'JSON object in the required format, no other text.')
+
+# keys the model writes instead of ours, PROMPT_02/05 even show "ingredint"
+ALIASES = {
+    'ingredint': 'ingredient',
+    'ingredients': 'ingredient',
+    'ingrediant': 'ingredient',
+    'cooking_style': 'style',
+    'description': 'desc',
+}
+
+# fields each prompt has to answer
+FIELDS = {
+    'PROMPT_01': ('cooking',),
+    'PROMPT_02': ('ingredient',),
+    'PROMPT_03': ('style',),
+    'PROMPT_04': ('cooking',),
+    'PROMPT_05': ('ingredient',),
+    'PROMPT_06': ('style',),
+    'PROMPT_07': ('desc',),
+    'PROMPT_08': ('cooking', 'ingredient', 'style', 'desc'),
+}
+
+NAMES = {v.content: k for k, v in globals().items() if k.startswith('PROMPT_')}
+
+# per prompt name: answers, parse failures, re-asks
+stats = {}
+
+
+class ParseError(ValueError):
+    pass
+
+
+def prompt_name(sys_prompt):
+    return NAMES.get(sys_prompt.content, 'other')
+
+
+def count(name, key):
+    s = stats.setdefault(name, {'answers': 0, 'failures': 0, 'reasks': 0})
+    s[key] += 1
+
+
+def repair(text):
+    """close strings and brackets of a truncated json object"""
+    stack = []
+    in_str = esc = False
+    quote = 0
+    for i, ch in enumerate(text):
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == '\\':
+                esc = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+            quote = i
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]' and stack:
+            stack.pop()
+    if in_str and stack[-1:] == [']']:
+        # half a list item, e.g. "mea" of "meat", is dropped
+        text = text[:quote]
+    elif in_str:
+        text = (text[:-1] if esc else text) + '"'
+    text = text.rstrip().rstrip(',')
+    if text.endswith(':'):
+        text += ' null'
+    return text + ''.join(reversed(stack))
+
+
+def find_object(text):
+    # first '{' that decodes, else the repaired tail of the first '{'
+    decoder = json.JSONDecoder()
+    start = text.find('{')
+    first = start
+    while start != -1:
+        try:
+            obj, _ = decoder.raw_decode(text, start)
+            if isinstance(obj, dict):
+                return obj
+        except json.JSONDecodeError:
+            pass
+        start = text.find('{', start+1)
+    if first == -1:
+        raise ParseError('no json object')
+    try:
+        obj = json.loads(repair(text[first:]))
+    except json.JSONDecodeError as e:
+        raise ParseError(f'unrepairable json: {e}')
+    if not isinstance(obj, dict):
+        raise ParseError('not a json object')
+    return obj
+
+
+def normalize(obj):
+    return {ALIASES.get(k.strip().lower(), k.strip().lower()): v
+            for k, v in obj.items()}
+
+
+def check(obj, fields):
+    # type check and light coercion of the fields the prompt asked for
+    for field in fields:
+        if field not in obj:
+            raise ParseError(f'missing "{field}"')
+        value = obj[field]
+        if field == 'cooking':
+            if isinstance(value, str) and value.strip().lower() in ('true', 'false'):
+                value = value.strip().lower() == 'true'
+            if not isinstance(value, bool):
+                raise ParseError(f'"cooking" is not a bool: {value!r}')
+        elif field == 'ingredient':
+            if value is None:
+                value = []
+            elif isinstance(value, str):
+                value = [i for i in value.replace(';', ',').split(',')]
+            if not isinstance(value, list):
+                raise ParseError(f'"ingredient" is not a list: {value!r}')
+            value = [str(i).strip() for i in value if str(i).strip()]
+        else:
+            if not isinstance(value, str):
+                raise ParseError(f'"{field}" is not a string: {value!r}')
+        obj[field] = value
+    return obj
+
+
+def loads(text, fields=()):
+    """model answer -> dict with the given fields, ParseError if impossible"""
+    return check(normalize(find_object(text)), fields)
+
+
+def parse_answer(text, sys_prompt):
+    name = prompt_name(sys_prompt)
+    count(name, 'answers')
+    try:
+        return loads(text, FIELDS.get(name, ()))
+    except ParseError:
+        count(name, 'failures')
+        raise
+
+
+def members(text):
+    """top level members of a streamed object that are already complete"""
+    start = text.find('{')
+    if start == -1:
+        return {}
+    depth = 0
+    cut = None
+    in_str = esc = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == '\\':
+                esc = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch in '{[':
+            depth += 1
+        elif ch in '}]':
+            depth -= 1
+            if depth == 0:
+                cut = i  # whole object
+                break
+        elif ch == ',' and depth == 1:
+            cut = i  # everything before a top level comma is final
+    if cut is None:
+        return {}
+    try:
+        obj = json.loads(text[start:cut] + '}')
+    except json.JSONDecodeError:
+        return {}
+    return normalize(obj) if isinstance(obj, dict) else {}
+
+
+def decide(text, sys_prompt):
+    """answer from a partial stream once it can't change anymore, else None"""
+    fields = FIELDS.get(prompt_name(sys_prompt), ())
+    done = members(text)
+    if 'cooking' in fields and 'cooking' in done:
+        try:
+            if not check({'cooking': done['cooking']}, ('cooking',))['cooking']:
+                # not cooking, the other fields don't matter
+                return {'cooking': False, 'ingredient': [], 'style': '', 'desc': ''}
+        except ParseError:
+            return None
+    if not fields or not all(f in done for f in fields):
+        return None
+    try:
+        return check(done, fields)
+    except ParseError:
+        return None
+
+
+def cached(obj, sys_prompt):
+    # answers cached by the old parser may still have misspelled keys
+    if not isinstance(obj, dict):
+        return None
+    try:
+        return check(normalize(obj), FIELDS.get(prompt_name(sys_prompt), ()))
+    except ParseError:
+        return None
+
+
+def summary():
+    for name, s in sorted(stats.items()):
+        n = s['answers'] or 1
+        print(f'{name}: {s["answers"]} answers, '
+              f'parse failures {s["failures"]} ({s["failures"]/n:.1%}), '
+              f're-asks {s["reasks"]} ({s["reasks"]/n:.1%})')
@@ -0,0 +1,184 @@
+import sys
+import csv
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from pathlib import Path
+from PIL import Image, ImageStat
+
+
+# CPU-only gate in front of PROMPT_01/04: frames from a cold stove with
+# nobody around, or dark/blank frames, never reach the llm.
+# Usage: python prefilter.py [images folder]
+#        precision/recall against ../db_snapshot/image.csv
+TEMP_MIN = 40.0     # max thermal reading (C) near the frame, a hot pan is way above
+TEMP_WINDOW = 120   # seconds around the frame for temperature and motion
+MOTION_MIN = 0      # motion rising edges near the frame, 0 to ignore motion;
+                    # on the snapshot 1 only lost recall, see the table
+DARK = 20           # mean gray level below this is a dark frame
+FLAT = 8            # gray level std below this is a blank frame (lens covered)
+
+SNAPSHOT = Path('../db_snapshot')
+GRID = 60           # seconds between candidate frames when there are no images
+
+
+class SessionSensors:
+    """temperature and motion of one session, for lookups by frame time"""
+
+    def __init__(self, temps=(), edges=()):
+        temps = sorted(temps)
+        self.temp_times = [t for t, _ in temps]
+        self.temp_values = [v for _, v in temps]
+        self.temp_max = max(self.temp_values, default=None)
+        self.edges = sorted(edges)
+
+    @classmethod
+    def from_db(cls, conn, sid):
+        edges = []
+        with conn.cursor() as cur:
+            cur.execute('SELECT datetime, value FROM temperature WHERE session = %s',
+                        (sid,))
+            temps = [(dt, float(v)) for dt, v in cur.fetchall()]
+            # both sensors, raw edges or intervals written by the device
+            cur.execute('SELECT datetime FROM motion_edge'
+                        ' WHERE session = %s AND sensor IN (\'motion1\', \'motion2\')'
+                        ' AND value', (sid,))
+            edges += [dt for dt, in cur.fetchall()]
+        return cls(temps, edges)
+
+    def temperature(self, dt, window=TEMP_WINDOW):
+        # max near the frame, the session max if nothing was read near it
+        w = timedelta(seconds=window)
+        lo = bisect_left(self.temp_times, dt-w)
+        hi = bisect_right(self.temp_times, dt+w)
+        return max(self.temp_values[lo:hi], default=self.temp_max)
+
+    def motion(self, dt, window=TEMP_WINDOW):
+        w = timedelta(seconds=window)
+        return bisect_right(self.edges, dt+w) - bisect_left(self.edges, dt-w)
+
+
+def image_stats(path):
+    """(mean, std) of the gray levels, decoded at 1/8 scale"""
+    with Image.open(path) as img:
+        img.draft('L', (160, 120))
+        stat = ImageStat.Stat(img.convert('L'))
+    return stat.mean[0], stat.stddev[0]
+
+
+def gate(sensors, dt, path=None,
+         temp_min=TEMP_MIN, motion_min=MOTION_MIN, dark=DARK, flat=FLAT):
+    """(pass, reason), pass means the frame may be cooking"""
+    temp = sensors.temperature(dt)
+    if temp is None:
+        # thermal camera down or not installed, nothing to judge the frame by
+        return True, 'no thermal evidence'
+    if temp < temp_min:
+        return False, f'cold ({temp:.0f})'
+    if motion_min and sensors.motion(dt) < motion_min:
+        return False, 'no motion'
+    if path is not None:
+        mean, std = image_stats(path)
+        if mean < dark:
+            return False, f'dark ({mean:.0f})'
+        if std < flat:
+            return False, f'blank ({std:.0f})'
+    return True, 'ok'
+
+
+class Stats:
+
+    def __init__(self):
+        self.passed = 0
+        self.skipped = {}
+
+    def add(self, ok, reason):
+        if ok:
+            self.passed += 1
+        else:
+            key = reason.split(' ')[0]
+            self.skipped[key] = self.skipped.get(key, 0) + 1
+
+    def summary(self):
+        n = self.passed + sum(self.skipped.values())
+        if n:
+            print(f'prefilter: {self.passed}/{n} frames to the llm, skipped {self.skipped}')
+
+
+def read_snapshot(folder=SNAPSHOT):
+    rows = lambda name: list(csv.DictReader(open(folder / f'{name}.csv')))
+    ts = lambda r: datetime.fromisoformat(r['datetime'])
+    temps, edges, switch = {}, {}, {}
+    for r in rows('temperature'):
+        temps.setdefault(int(r['session']), []).append((ts(r), float(r['value'])))
+    for name in ('motion1', 'motion2'):
+        for r in rows(name):
+            if r['value'] == 't':
+                edges.setdefault(int(r['session']), []).append(ts(r))
+    for r in rows('switch'):
+        switch.setdefault(int(r['session']), []).append(ts(r))
+    cooking = {(int(r['session']), ts(r)) for r in rows('image')}
+    sensors = {sid: SessionSensors(temps.get(sid, ()), edges.get(sid, ()))
+               for sid in set(switch) | set(temps)}
+    return sensors, switch, cooking
+
+
+def candidates(switch, cooking, img_path=None):
+    """(sid, datetime, path or None, label) of every frame to evaluate
+
+    With an images folder its frames are used, labeled by image.csv. Without,
+    image.csv rows are the positives and sessions with no image.csv row give
+    negatives on a GRID second grid between switch on and off.
+    """
+    if img_path is not None:
+        for f in sorted(Path(img_path).rglob('*.jpg')):
+            name = f.name[:-4].split('_')
+            sid = int(name[1])
+            dt = datetime.strptime(' '.join(name[2:]), '%Y%m%d %H%M%S')
+            yield sid, dt, f, (sid, dt) in cooking
+        return
+    for sid, dt in sorted(cooking):
+        yield sid, dt, None, True
+    with_images = {sid for sid, _ in cooking}
+    for sid, times in sorted(switch.items()):
+        if sid in with_images:
+            continue
+        dt, end = min(times), max(times)
+        while dt <= end:
+            yield sid, dt, None, False
+            dt += timedelta(seconds=GRID)
+
+
+def evaluate(frames, sensors, **thresholds):
+    tp = fp = fn = tn = 0
+    for sid, dt, path, label in frames:
+        ok, _ = gate(sensors.get(sid, SessionSensors()), dt, path, **thresholds)
+        tp += ok and label
+        fp += ok and not label
+        fn += not ok and label
+        tn += not ok and not label
+    precision = tp / (tp+fp) if tp+fp else 0.0
+    recall = tp / (tp+fn) if tp+fn else 0.0
+    return tp, fp, fn, tn, precision, recall
+
+
+if __name__ == "__main__":
+    img_path = sys.argv[1] if len(sys.argv) > 1 else None
+    sensors, switch, cooking = read_snapshot()
+    frames = list(candidates(switch, cooking, img_path))
+    print(f'frames: {len(frames)}, cooking: {sum(f[3] for f in frames)}')
+
+    print(f'{"temp_min":>8} {"motion":>6} {"tp":>4} {"fp":>4} {"fn":>4} {"tn":>4} '
+          f'{"precision":>9} {"recall":>6} {"to llm":>6}')
+    for temp_min in (30.0, TEMP_MIN, 60.0, 80.0):
+        for motion_min in (0, 1):
+            tp, fp, fn, tn, p, r = evaluate(frames, sensors,
+                                            temp_min=temp_min, motion_min=motion_min)
+            mark = '*' if (temp_min, motion_min) == (TEMP_MIN, MOTION_MIN) else ' '
+            print(f'{temp_min:8.0f} {motion_min:6} {tp:4} {fp:4} {fn:4} {tn:4} '
+                  f'{p:9.2%} {r:6.1%} {(tp+fp)/len(frames):6.1%} {mark}')
+
+    # thermal camera down: every frame has to reach the llm
+    blind = {sid: SessionSensors((), s.edges) for sid, s in sensors.items()}
+    tp, fp, fn, tn, p, r = evaluate(frames, blind)
+    print(f'{"none":>8} {MOTION_MIN:6} {tp:4} {fp:4} {fn:4} {tn:4} '
+          f'{p:9.2%} {r:6.1%} {(tp+fp)/len(frames):6.1%}   no thermal evidence')
@@ -187,3 +187,28 @@ Your response must follow this JSON format with markdown syntax:
 ```
 ''')
 
+
+PROMPT_08 = SystemMessage(content='''
+This series of images may record a cooking activity.
+A series of cooking images should be consecutive, with similar
+background and different ingredients or cooking stage.
+It's possible that there is only one image.
+
+Answer all of the following in one JSON object:
+- "cooking": whether the images belong to a cooking activity.
+- "ingredient": the food ingredients used in the whole cooking process,
+  only food, nothing else. Empty list if not cooking.
+- "style": the cooking technique in one word, such as 'grilling',
+  'frying', 'baking', 'boiling' and etc. Empty string if not cooking.
+- "desc": a short description of the whole cooking process from start
+  to end, only include what you could see in images. Empty string if
+  not cooking.
+
+Your response must be only this JSON object:
+{
+    "cooking": <true or false>,
+    "ingredient": [<ingredient list>],
+    "style": <cooking style>,
+    "desc": <short description>
+}
+''')
@@ -0,0 +1,141 @@
+import asyncio
+import random
+import time
+
+
+CONCURRENCY = 4     # images in flight
+TIMEOUT = 300       # seconds per llm request
+RETRIES = 3         # extra attempts per request and per image
+BACKOFF = 2         # seconds, doubled on every retry
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values)-1, int(p/100*len(values)))]
+
+
+class LLMRunner:
+    """Keep N items in flight against the llm server, with timeout and retry."""
+
+    def __init__(self, llm,
+                 concurrency=CONCURRENCY,
+                 timeout=TIMEOUT,
+                 retries=RETRIES,
+                 backoff=BACKOFF):
+        self.llm = llm
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        # stats
+        self.req_latency = []
+        self.item_latency = []
+        self.req_retries = 0
+        self.item_retries = 0
+        self.ok = 0
+        self.failed = 0
+        self.aborted = 0
+        self.wall = 0.0
+
+    async def sleep_backoff(self, attempt):
+        # exponential backoff with jitter, so retries don't arrive together
+        await asyncio.sleep(self.backoff * 2**attempt * random.uniform(0.5, 1.5))
+
+    async def invoke(self, msg):
+        """ainvoke with per request timeout and retries"""
+        for attempt in range(self.retries+1):
+            tic = time.time()
+            try:
+                resp = await asyncio.wait_for(self.llm.ainvoke(msg), self.timeout)
+                self.req_latency.append(time.time()-tic)
+                return resp
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                print(f'request error: {type(e).__name__} {e}, retry {attempt+1}')
+                self.req_retries += 1
+                await self.sleep_backoff(attempt)
+
+    async def stream_once(self, msg, decide):
+        text = ''
+        resp = None
+        stream = self.llm.astream(msg)
+        try:
+            async for chunk in stream:
+                text += chunk.content
+                resp = decide(text)
+                if resp is not None:
+                    break
+        finally:
+            # closing the stream drops the connection, ollama stops generating
+            await stream.aclose()
+        return text, resp
+
+    async def stream(self, msg, decide):
+        """astream until decide(text) gives an answer, returns (text, answer or None)
+
+        Same timeout and retries as invoke().
+        """
+        for attempt in range(self.retries+1):
+            tic = time.time()
+            try:
+                result = await asyncio.wait_for(self.stream_once(msg, decide),
+                                                self.timeout)
+                self.req_latency.append(time.time()-tic)
+                if result[1] is not None:
+                    self.aborted += 1
+                return result
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                print(f'request error: {type(e).__name__} {e}, retry {attempt+1}')
+                self.req_retries += 1
+                await self.sleep_backoff(attempt)
+
+    async def run_item(self, sem, process, item):
+        async with sem:
+            tic = time.time()
+            for attempt in range(self.retries+1):
+                if await process(self, item) is True:
+                    self.ok += 1
+                    self.item_latency.append(time.time()-tic)
+                    return True
+                if attempt != self.retries:
+                    self.item_retries += 1
+                    await self.sleep_backoff(attempt)
+            self.failed += 1
+            return False
+
+    async def arun(self, items, process):
+        """await process(runner, item) for all items, returns list of bool"""
+        sem = asyncio.Semaphore(self.concurrency)
+        tic = time.time()
+        results = await asyncio.gather(
+            *[self.run_item(sem, process, item) for item in items])
+        # summed over calls, jobs mode awaits one batch per call in one loop
+        self.wall += time.time() - tic
+        return results
+
+    def run(self, items, process):
+        return asyncio.run(self.arun(items, process))
+
+    def summary(self):
+        n = self.ok + self.failed
+        print('='*40)
+        print(f'items: {n}, ok: {self.ok}, failed: {self.failed}, '
+              f'concurrency: {self.concurrency}')
+        if n == 0:
+            return
+        print(f'wall: {self.wall:.1f}s, throughput: {n/self.wall*60:.2f} items/min')
+        print(f'requests: {len(self.req_latency)}, '
+              f'retries: {self.req_retries} request / {self.item_retries} item, '
+              f'stopped early: {self.aborted}')
+        for name, lat in (('request', self.req_latency),
+                          ('item', self.item_latency)):
+            if lat:
+                print(f'{name} latency: mean {sum(lat)/len(lat):.2f}s, '
+                      f'p50 {percentile(lat, 50):.2f}s, '
+                      f'p95 {percentile(lat, 95):.2f}s, '
+                      f'max {max(lat):.2f}s')
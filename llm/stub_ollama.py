@@ -0,0 +1,101 @@
+import sys
+import json
+import time
+import random
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+# Local stand-in for the Ollama server, speaks /api/chat (stream or not).
+# Usage: python stub_ollama.py [port] [delay seconds] [error rate]
+#        python llm_io.py 127.0.0.1 <db ip> <db passwd>
+PORT = 11444
+DELAY = 1.0
+ERROR_RATE = 0.0
+
+
+ANSWERS = {
+    '"cooking"': {'cooking': True},
+    '"ingredient"': {'ingredient': ['egg', 'tomato']},
+    '"style"': {'style': 'frying'},
+    '"desc"': {'desc': 'Eggs and tomatoes are fried in a pan.'},
+}
+
+
+def answer(messages):
+    # pick the reply from the json key the system prompt asks for
+    system = ' '.join(m.get('content', '') for m in messages
+                          if m.get('role') == 'system')
+    reply = {}
+    for key, value in ANSWERS.items():
+        if key in system:
+            reply.update(value)
+    return '```json\n' + json.dumps(reply, indent=4) + '\n```'
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def send_json(self, obj, status=200):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self.send_json({'models': [{'name': 'gemma3:27b'}]})
+        else:
+            self.send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        req = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if self.path != '/api/chat':
+            self.send_json({'error': 'not found'}, 404)
+            return
+
+        time.sleep(DELAY)
+        if random.random() < ERROR_RATE:
+            self.send_json({'error': 'stub overloaded'}, 503)
+            return
+
+        content = answer(req.get('messages', []))
+        now = datetime.now(timezone.utc).isoformat()
+        images = sum(len(m.get('images') or []) for m in req.get('messages', []))
+        done = {'model': req.get('model'), 'created_at': now,
+                'message': {'role': 'assistant', 'content': ''},
+                'done': True, 'done_reason': 'stop',
+                'total_duration': int(DELAY*1e9),
+                'prompt_eval_count': 300 + 256*images,
+                'eval_count': len(content)//4}
+
+        if not req.get('stream', True):
+            done['message']['content'] = content
+            self.send_json(done)
+            return
+
+        # ndjson, a few characters per chunk like real tokens
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        for i in range(0, len(content), 4):
+            chunk = {'model': req.get('model'), 'created_at': now,
+                     'message': {'role': 'assistant', 'content': content[i:i+4]},
+                     'done': False}
+            self.wfile.write((json.dumps(chunk)+'\n').encode())
+        self.wfile.write((json.dumps(done)+'\n').encode())
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        PORT = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        DELAY = float(sys.argv[2])
+    if len(sys.argv) > 3:
+        ERROR_RATE = float(sys.argv[3])
+    print(f'stub ollama on :{PORT}, delay {DELAY}s, error rate {ERROR_RATE}')
+    ThreadingHTTPServer(('', PORT), Handler).serve_forever()
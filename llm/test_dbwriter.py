@@ -0,0 +1,70 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+import psycopg as pg
+from psycopg.rows import dict_row
+import pytest
+
+from dbwriter import ResultWriter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import session_summary
+
+
+# ResultWriter against a real database, with session_summary.py folding
+# what it wrote. Needs a scratch database with init_iotdb.sql and
+# migrations/ applied; the test adds its own session and leaves it there.
+# Usage: IOTDB_TEST_URL=postgresql://... python -m pytest -q test_dbwriter.py
+URL = os.getenv('IOTDB_TEST_URL')
+T0 = datetime(2025, 9, 20, 18, 30, 0)
+
+pytestmark = pytest.mark.skipif(not URL, reason='IOTDB_TEST_URL not set')
+
+
+@pytest.fixture
+def conn():
+    with pg.connect(URL, row_factory=dict_row) as conn:
+        yield conn
+
+
+@pytest.fixture
+def writer():
+    writer = ResultWriter(URL, flush_interval=3600)
+    yield writer
+    writer.close()
+
+
+def summarize(conn, session):
+    while session_summary.step(conn):
+        pass
+    with conn.cursor() as cur:
+        cur.execute('SELECT * FROM session_summary WHERE session = %s', (session,))
+        row = cur.fetchone()
+    conn.commit()
+    return row
+
+
+def test_relabel_reaches_summary(conn, writer):
+    with conn.cursor() as cur:
+        cur.execute('INSERT INTO sessions (device, start_time) VALUES (%s, %s) RETURNING id',
+                    ('test', T0))
+        session = cur.fetchone()['id']
+        cur.execute('INSERT INTO switch (session, datetime, status) VALUES (%s, %s, true)',
+                    (session, T0))
+    conn.commit()
+
+    frame = T0 + timedelta(seconds=30)
+    writer.put('image', (session, frame, 'egg', 'fry'))
+    writer.put('image2', (session, frame, 'egg', 'fry', 'eggs in a pan'))
+    assert writer.flush()
+    s = summarize(conn, session)
+    assert (s['ingredient'], s['style'], s['image_count']) == ('egg', 'fry', 1)
+
+    # a re-run of the interpreter corrects the labels of the same frame
+    writer.put('image', (session, frame, 'tomato', 'boil'))
+    writer.put('image2', (session, frame, 'tomato', 'boil', 'tomato soup'))
+    assert writer.flush()
+    s = summarize(conn, session)
+    assert (s['ingredient'], s['style'], s['description']) == ('tomato', 'boil', 'tomato soup')
+    assert s['image_count'] == 1
@@ -0,0 +1,53 @@
+import os
+import time
+import psycopg as pg
+import pytest
+
+import jobs
+
+
+# llm_jobs claims against a real database (migrations/009 applied).
+# Usage: IOTDB_TEST_URL=postgresql://... python -m pytest -q test_jobs.py
+URL = os.getenv('IOTDB_TEST_URL')
+
+pytestmark = pytest.mark.skipif(not URL, reason='IOTDB_TEST_URL not set')
+
+
+@pytest.fixture
+def conn():
+    with pg.connect(URL) as conn:
+        yield conn
+
+
+def status(conn, path):
+    with conn.cursor() as cur:
+        cur.execute('SELECT status, attempts FROM llm_jobs WHERE kind = %s AND path = %s',
+                    ('test', path))
+        row = cur.fetchone()
+    conn.commit()
+    return row
+
+
+def test_expired_lease_is_claimed_again(conn):
+    path = f'requeue-{time.time_ns()}.jpg'
+    jobs.enqueue(conn, 'test', [path])
+
+    [(job_id, _)] = jobs.claim(conn, 'test', 'w1', lease=0)
+    time.sleep(0.01)
+    assert jobs.claim(conn, 'test', 'w2') == [(job_id, path)]
+    assert jobs.done(conn, job_id, 'w2')
+    assert status(conn, path) == ('done', 2)
+
+
+def test_crashing_job_fails_after_max_attempts(conn):
+    path = f'crash-{time.time_ns()}.jpg'
+    jobs.enqueue(conn, 'test', [path])
+
+    # every worker dies without calling done() or fail()
+    for attempt in range(jobs.MAX_ATTEMPTS):
+        assert [p for _, p in jobs.claim(conn, 'test', f'w{attempt}', n=100, lease=0)
+                if p == path] == [path]
+        time.sleep(0.01)
+
+    assert path not in [p for _, p in jobs.claim(conn, 'test', 'w', n=100)]
+    assert status(conn, path) == ('failed', jobs.MAX_ATTEMPTS)
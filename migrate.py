@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+import psycopg as pg
+
+
+HOST = sys.argv[1].strip()
+PORT = '5432'
+DBNAME = 'iotdb'
+OWNER = 'iotproj'
+PASSWD = sys.argv[2].strip()
+conn_owner = {'dbname': DBNAME,
+              'host': HOST,
+              'port': PORT,
+              'user': OWNER,
+              'password': PASSWD}
+conn_str = f'postgresql://{OWNER}:{PASSWD}@{HOST}:{PORT}/{DBNAME}'
+
+
+# Apply migrations/*.sql in name order, each once and in its own transaction.
+# Usage: python migrate.py <ip> <passwd>
+MIGRATIONS = Path(__file__).parent / 'migrations'
+LOCK_ID = 20250912  # advisory lock, two runners never apply the same file
+
+
+def applied(cur):
+    cur.execute('SELECT name FROM schema_migrations')
+    return {name for name, in cur.fetchall()}
+
+
+with pg.connect(conn_str, autocommit=True) as conn:
+    with conn.cursor() as cur:
+        cur.execute('CREATE TABLE IF NOT EXISTS schema_migrations ('
+                    ' name VARCHAR(256) PRIMARY KEY,'
+                    ' applied TIMESTAMP NOT NULL DEFAULT now())')
+
+        for sql in sorted(MIGRATIONS.glob('*.sql')):
+            with conn.transaction():
+                cur.execute('SELECT pg_advisory_xact_lock(%s)', (LOCK_ID,))
+                if sql.name in applied(cur):
+                    print('skip:', sql.name)
+                    continue
+                print('apply:', sql.name)
+                cur.execute(sql.read_text())
+                cur.execute('INSERT INTO schema_migrations (name) VALUES (%s)',
+                            (sql.name,))
+        print('Done!')
@@ -0,0 +1,79 @@
+-- Sensor tables as monthly range partitions on datetime, with a
+-- (session, datetime) unique index and a BRIN index on datetime.
+-- Applied by migrate.py, after init_iotdb.sql.
+
+
+-- Create the monthly partitions of a table, skipping existing ones
+CREATE OR REPLACE FUNCTION create_month_partitions(tbl TEXT, first_month DATE, months INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    m DATE;
+    part TEXT;
+BEGIN
+    FOR i IN 0..months-1 LOOP
+        m := (date_trunc('month', first_month) + i * interval '1 month')::date;
+        part := format('%s_%s', tbl, to_char(m, 'YYYYMM'));
+        IF to_regclass(part) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           part, tbl, m, (m + interval '1 month')::date);
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Rebuild every sensor table as a partitioned one, keeping rows and id sequence
+DO $$
+DECLARE
+    tbl TEXT;
+    seq TEXT;
+    first_month DATE;
+    months INTEGER;
+    dropped INTEGER;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['switch', 'temperature', 'motion1', 'motion2'] LOOP
+        IF to_regclass(tbl) IS NULL THEN
+            RAISE EXCEPTION 'table % does not exist, run init_iotdb.sql first', tbl;
+        END IF;
+        IF EXISTS (SELECT 1 FROM pg_partitioned_table
+                   WHERE partrelid = to_regclass(tbl)) THEN
+            CONTINUE;
+        END IF;
+
+        seq := pg_get_serial_sequence(tbl, 'id');
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', tbl, tbl || '_old');
+        EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)'
+                       ' PARTITION BY RANGE (datetime)', tbl, tbl || '_old');
+
+        -- from the oldest row up to a year ahead, the rest goes to the default
+        EXECUTE format('SELECT date_trunc(''month'', min(datetime))::date FROM %I',
+                       tbl || '_old') INTO first_month;
+        first_month := coalesce(first_month, date_trunc('month', now())::date);
+        months := (extract(year FROM age(now(), first_month)) * 12
+                   + extract(month FROM age(now(), first_month)))::int + 13;
+        PERFORM create_month_partitions(tbl, first_month, months);
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', tbl || '_default', tbl);
+
+        -- the primary key needs datetime, rows without one can't be placed
+        EXECUTE format('INSERT INTO %I SELECT * FROM %I WHERE datetime IS NOT NULL',
+                       tbl, tbl || '_old');
+        EXECUTE format('SELECT count(*) FROM %I WHERE datetime IS NULL',
+                       tbl || '_old') INTO dropped;
+        IF dropped > 0 THEN
+            RAISE NOTICE '%: % rows without datetime dropped', tbl, dropped;
+        END IF;
+        IF seq IS NOT NULL THEN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY %I.id', seq, tbl);
+        END IF;
+        EXECUTE format('DROP TABLE %I', tbl || '_old');
+
+        -- unique indexes of a partitioned table have to contain datetime
+        EXECUTE format('ALTER TABLE %I ADD PRIMARY KEY (id, datetime)', tbl);
+        EXECUTE format('CREATE UNIQUE INDEX IF NOT EXISTS %I ON %I (session, datetime)',
+                       tbl || '_session_datetime_key', tbl);
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I USING brin (datetime)',
+                       tbl || '_datetime_brin', tbl);
+        EXECUTE format('ANALYZE %I', tbl);
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,56 @@
+-- First-class sessions, numbered by a sequence instead of MAX(session) + 1.
+-- Backfilled from switch (and any other table holding a session id), then
+-- every sensor table references it.
+
+
+CREATE SEQUENCE IF NOT EXISTS sessions_id_seq;
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY DEFAULT nextval('sessions_id_seq'),
+    device VARCHAR(64) NOT NULL DEFAULT 'unknown',
+    start_time TIMESTAMP NOT NULL,
+    end_time TIMESTAMP,
+    status VARCHAR(16) NOT NULL DEFAULT 'active' -- active, closed
+);
+
+ALTER SEQUENCE sessions_id_seq OWNED BY sessions.id;
+
+
+-- switch ON/OFF rows give start and end, sessions without OFF stay active
+INSERT INTO sessions (id, device, start_time, end_time, status)
+SELECT session, 'legacy',
+       coalesce(min(datetime) FILTER (WHERE status), min(datetime)),
+       max(datetime) FILTER (WHERE NOT status),
+       CASE WHEN bool_or(NOT status) THEN 'closed' ELSE 'active' END
+FROM switch
+WHERE session IS NOT NULL AND datetime IS NOT NULL
+GROUP BY session
+ON CONFLICT (id) DO NOTHING;
+
+-- session ids that only appear in other tables
+INSERT INTO sessions (id, device, start_time, end_time, status)
+SELECT session, 'legacy', min(datetime), max(datetime), 'closed'
+FROM (SELECT session, datetime FROM temperature
+      UNION ALL SELECT session, datetime FROM motion1
+      UNION ALL SELECT session, datetime FROM motion2
+      UNION ALL SELECT session, datetime FROM image
+      UNION ALL SELECT session, datetime FROM image2) t
+WHERE session IS NOT NULL AND datetime IS NOT NULL
+GROUP BY session
+ON CONFLICT (id) DO NOTHING;
+
+-- new sessions continue after the backfilled ones
+SELECT setval('sessions_id_seq', coalesce(max(id), 1), max(id) IS NOT NULL) FROM sessions;
+
+CREATE INDEX IF NOT EXISTS sessions_start_time_idx ON sessions (start_time);
+
+
+-- sensor rows must belong to a session
+ALTER TABLE switch ADD CONSTRAINT switch_session_fkey
+    FOREIGN KEY (session) REFERENCES sessions (id);
+ALTER TABLE temperature ADD CONSTRAINT temperature_session_fkey
+    FOREIGN KEY (session) REFERENCES sessions (id);
+ALTER TABLE motion1 ADD CONSTRAINT motion1_session_fkey
+    FOREIGN KEY (session) REFERENCES sessions (id);
+ALTER TABLE motion2 ADD CONSTRAINT motion2_session_fkey
+    FOREIGN KEY (session) REFERENCES sessions (id);
@@ -0,0 +1,36 @@
+-- Per-session metrics kept up to date by session_summary.py, so the
+-- dashboard reads one row instead of aggregating the sensor tables.
+
+
+CREATE TABLE IF NOT EXISTS session_summary (
+    session INTEGER PRIMARY KEY,
+    start_time TIMESTAMP,
+    end_time TIMESTAMP,
+    duration DOUBLE PRECISION, -- seconds, set when final
+    motion1_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    motion2_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    presence_seconds DOUBLE PRECISION NOT NULL DEFAULT 0, -- motion1 or motion2
+    temp_max DECIMAL(6,2),
+    temp_mean DOUBLE PRECISION,
+    temp_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    temp_count INTEGER NOT NULL DEFAULT 0,
+    image_count INTEGER NOT NULL DEFAULT 0, -- frames labeled in image
+    ingredient VARCHAR(1024), -- labels from image2
+    style VARCHAR(32),
+    description VARCHAR(4096),
+    -- open motion intervals carried between runs
+    motion1_since TIMESTAMP,
+    motion2_since TIMESTAMP,
+    presence_since TIMESTAMP,
+    last_edge TIMESTAMP,
+    final BOOLEAN NOT NULL DEFAULT false, -- switch OFF seen, recomputed from raw rows
+    updated TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS session_summary_start_time_idx ON session_summary (start_time);
+
+-- last id of every source table already folded into session_summary
+CREATE TABLE IF NOT EXISTS summary_watermark (
+    tbl VARCHAR(32) PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0
+);
@@ -0,0 +1,38 @@
+-- 1-minute and 1-hour rollups of temperature and motion occupancy,
+-- maintained by rollup.py. avg = t_sum / t_count and occupancy =
+-- active / observed, so buckets of several sessions can be merged.
+
+
+CREATE TABLE IF NOT EXISTS temperature_1m (
+    bucket TIMESTAMP NOT NULL,
+    session INTEGER NOT NULL,
+    t_min DECIMAL(6,2) NOT NULL,
+    t_max DECIMAL(6,2) NOT NULL,
+    t_sum DOUBLE PRECISION NOT NULL,
+    t_count INTEGER NOT NULL,
+    PRIMARY KEY (bucket, session)
+);
+
+CREATE TABLE IF NOT EXISTS temperature_1h (LIKE temperature_1m INCLUDING ALL);
+
+CREATE TABLE IF NOT EXISTS occupancy_1m (
+    bucket TIMESTAMP NOT NULL,
+    session INTEGER NOT NULL,
+    sensor VARCHAR(16) NOT NULL, -- motion1, motion2
+    active DOUBLE PRECISION NOT NULL, -- seconds with motion in the bucket
+    observed DOUBLE PRECISION NOT NULL, -- seconds of the bucket inside the session
+    PRIMARY KEY (bucket, session, sensor)
+);
+
+CREATE TABLE IF NOT EXISTS occupancy_1h (LIKE occupancy_1m INCLUDING ALL);
+
+CREATE INDEX IF NOT EXISTS temperature_1m_session_idx ON temperature_1m (session);
+CREATE INDEX IF NOT EXISTS temperature_1h_session_idx ON temperature_1h (session);
+CREATE INDEX IF NOT EXISTS occupancy_1m_session_idx ON occupancy_1m (session);
+CREATE INDEX IF NOT EXISTS occupancy_1h_session_idx ON occupancy_1h (session);
+
+-- last id of every source table already rolled up
+CREATE TABLE IF NOT EXISTS rollup_watermark (
+    tbl VARCHAR(32) PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0
+);
@@ -0,0 +1,25 @@
+-- Presence intervals coalesced on the device (RPi/presence.py): one row per
+-- burst of motion instead of one per edge. motion_edge shows raw edge rows
+-- and interval rows alike as (session, sensor, datetime, value) edges, so
+-- readers do not care which of the two the device wrote.
+
+
+CREATE TABLE IF NOT EXISTS presence_interval (
+    id SERIAL PRIMARY KEY,
+    session INTEGER NOT NULL REFERENCES sessions (id),
+    sensor VARCHAR(16) NOT NULL, -- motion1, motion2
+    start_time TIMESTAMP NOT NULL,
+    end_time TIMESTAMP NOT NULL,
+    UNIQUE (session, sensor, start_time) -- replays from the spool are idempotent
+);
+
+CREATE INDEX IF NOT EXISTS presence_interval_start_time_idx ON presence_interval (start_time);
+
+CREATE OR REPLACE VIEW motion_edge AS
+    SELECT session, 'motion1'::VARCHAR(16) AS sensor, datetime, value FROM motion1
+    UNION ALL
+    SELECT session, 'motion2'::VARCHAR(16), datetime, value FROM motion2
+    UNION ALL
+    SELECT session, sensor, start_time, true FROM presence_interval
+    UNION ALL
+    SELECT session, sensor, end_time, false FROM presence_interval;
@@ -0,0 +1,19 @@
+-- Keys for the interpreter results written by llm/dbwriter.py, so re-runs
+-- update rows instead of adding duplicates. image holds one row per frame,
+-- image2 one summary per session: its datetime is the first selected frame,
+-- which moves when keyframes or the prefilter pick other frames.
+
+
+-- keep the latest row of each duplicate group
+DELETE FROM image a USING image b
+WHERE a.session = b.session AND a.datetime = b.datetime AND a.id < b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS image_session_datetime_key ON image (session, datetime);
+
+DELETE FROM image2 a USING image2 b
+WHERE a.session = b.session AND a.id < b.id;
+
+-- created by dbwriter.py before this migration existed
+DROP INDEX IF EXISTS image2_session_datetime_key;
+
+CREATE UNIQUE INDEX IF NOT EXISTS image2_session_key ON image2 (session);
@@ -0,0 +1,25 @@
+-- Commit-ordered watermarks for session_summary.py and rollup.py. ids are
+-- taken from the sequence at insert time, so a transaction that commits
+-- after a later one leaves rows below an id watermark that are never read.
+-- xact is the id of the inserting transaction: readers take rows in
+-- (xact, id) order and only below the oldest transaction still running,
+-- where no new row can show up any more. Rows from before this migration
+-- read as xact 0 and keep their id order.
+
+
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['switch', 'temperature', 'motion1', 'motion2',
+                               'image', 'image2', 'presence_interval'] LOOP
+        -- a constant default is not written to the existing rows
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS xact BIGINT NOT NULL DEFAULT 0', tbl);
+        EXECUTE format('ALTER TABLE %I ALTER COLUMN xact SET DEFAULT pg_current_xact_id()::text::bigint', tbl);
+        EXECUTE format('CREATE INDEX IF NOT EXISTS %I ON %I (xact, id)', tbl || '_xact_id_idx', tbl);
+    END LOOP;
+END;
+$$;
+
+ALTER TABLE summary_watermark ADD COLUMN IF NOT EXISTS last_xact BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE rollup_watermark ADD COLUMN IF NOT EXISTS last_xact BIGINT NOT NULL DEFAULT 0;
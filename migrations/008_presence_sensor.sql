@@ -0,0 +1,8 @@
+-- The fused presence stream of RPi/presence.py is stored next to the motion
+-- sensors, as sensor 'presence'. Nothing changes in the tables themselves;
+-- 004 and 005 are already applied, so the accepted values are noted here.
+
+
+COMMENT ON COLUMN presence_interval.sensor IS 'motion1, motion2, presence (fused on the device)';
+COMMENT ON COLUMN occupancy_1m.sensor IS 'motion1, motion2, presence (fused on the device)';
+COMMENT ON COLUMN occupancy_1h.sensor IS 'motion1, motion2, presence (fused on the device)';
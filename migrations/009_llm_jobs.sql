@@ -0,0 +1,20 @@
+-- Work queue of llm/llm_io.py (kind 'image') and llm_io2.py (kind 'session'),
+-- workers claim jobs with FOR UPDATE SKIP LOCKED, see llm/jobs.py. Was in
+-- init_iotdb.sql, where databases upgraded with migrate.py never got it.
+
+
+CREATE TABLE IF NOT EXISTS llm_jobs (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(16) NOT NULL,
+    path VARCHAR(1024) NOT NULL, -- relative to the images folder
+    status VARCHAR(16) NOT NULL DEFAULT 'pending', -- pending, leased, done, failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker VARCHAR(128),
+    leased_until TIMESTAMP,
+    created TIMESTAMP NOT NULL DEFAULT now(),
+    finished TIMESTAMP,
+    error VARCHAR(1024),
+    UNIQUE (kind, path)
+);
+
+CREATE INDEX IF NOT EXISTS llm_jobs_claim_idx ON llm_jobs (kind, status, id);
@@ -0,0 +1,198 @@
+import sys
+import time
+from datetime import timedelta
+import psycopg as pg
+
+
+# Keep the 1-minute and 1-hour rollups (migrations/004) up to date. Every
+# session with rows committed past the watermark (migrations/007) is
+# rolled up again from its raw rows via the (session, datetime) indexes, so
+# late rows land in the right buckets. Charts read through temperature_series()/occupancy_series(),
+# which pick the coarsest resolution that still gives enough points.
+# Usage: python rollup.py <ip> <passwd> [interval seconds]
+BATCH = 5000        # rows per table per step
+LOCK_ID = 20250922  # advisory lock, one aggregator at a time
+POINTS = 200        # fewest points a chart wants
+
+TABLES = ('switch', 'temperature', 'motion1', 'motion2', 'presence_interval')
+SENSORS = ('motion1', 'motion2', 'presence')  # presence: fused on the device
+
+# name, seconds per point; raw temperature is sampled every 5 to 60 seconds
+RESOLUTIONS = (('raw', 15), ('1m', 60), ('1h', 3600))
+
+
+def minute(dt):
+    return dt.replace(second=0, microsecond=0)
+
+
+def occupancy(edges, start, end):
+    """{minute: (active, observed) seconds} of one sensor between start and end"""
+    buckets = {}
+
+    def add(lo, hi, active):
+        while lo < hi:
+            b = minute(lo)
+            step = min(hi, b + timedelta(minutes=1))
+            a, o = buckets.get(b, (0.0, 0.0))
+            seconds = (step - lo).total_seconds()
+            buckets[b] = (a + seconds*active, o + seconds)
+            lo = step
+
+    state, since = False, start
+    for dt, value in edges:
+        dt = min(max(dt, start), end)
+        if bool(value) != state:
+            add(since, dt, state)
+            state, since = bool(value), dt
+    add(since, end, state)
+    return buckets
+
+
+def rollup_session(cur, session):
+    cur.execute('DELETE FROM temperature_1m WHERE session = %s', (session,))
+    cur.execute('INSERT INTO temperature_1m (bucket, session, t_min, t_max, t_sum, t_count)'
+                ' SELECT date_trunc(\'minute\', datetime), session,'
+                ' min(value), max(value), sum(value), count(*)'
+                ' FROM temperature WHERE session = %s GROUP BY 1, 2', (session,))
+
+    # the session runs from switch ON (or its first row) to OFF (or its last row)
+    cur.execute('SELECT min(datetime) FILTER (WHERE status),'
+                ' max(datetime) FILTER (WHERE NOT status)'
+                ' FROM switch WHERE session = %s', (session,))
+    start, end = cur.fetchone()
+    edges = {}
+    for sensor in SENSORS:
+        # raw edges and coalesced intervals (migrations/005) alike
+        cur.execute('SELECT datetime, value FROM motion_edge'
+                    ' WHERE sensor = %s AND session = %s ORDER BY datetime',
+                    (sensor, session))
+        edges[sensor] = cur.fetchall()
+    # sessions from before the fused stream have no presence rows, not zero presence
+    if not edges['presence']:
+        del edges['presence']
+    times = [dt for rows in edges.values() for dt, _ in rows]
+    start = start or min(times, default=None)
+    end = end or max(times, default=None)
+
+    cur.execute('DELETE FROM occupancy_1m WHERE session = %s', (session,))
+    if start is not None and end is not None and end > start:
+        rows = []
+        for sensor in edges:
+            for bucket, (active, observed) in occupancy(edges[sensor], start, end).items():
+                rows.append((bucket, session, sensor, active, observed))
+        cur.executemany('INSERT INTO occupancy_1m (bucket, session, sensor, active, observed)'
+                        ' VALUES (%s, %s, %s, %s, %s)', rows)
+
+    # hours from the minutes of this session
+    cur.execute('DELETE FROM temperature_1h WHERE session = %s', (session,))
+    cur.execute('INSERT INTO temperature_1h (bucket, session, t_min, t_max, t_sum, t_count)'
+                ' SELECT date_trunc(\'hour\', bucket), session,'
+                ' min(t_min), max(t_max), sum(t_sum), sum(t_count)'
+                ' FROM temperature_1m WHERE session = %s GROUP BY 1, 2', (session,))
+    cur.execute('DELETE FROM occupancy_1h WHERE session = %s', (session,))
+    cur.execute('INSERT INTO occupancy_1h (bucket, session, sensor, active, observed)'
+                ' SELECT date_trunc(\'hour\', bucket), session, sensor,'
+                ' sum(active), sum(observed)'
+                ' FROM occupancy_1m WHERE session = %s GROUP BY 1, 2, 3', (session,))
+
+
+def step(conn):
+    """roll up the sessions of up to BATCH new rows per table, returns rows read"""
+    with conn.cursor() as cur:
+        cur.execute('SELECT tbl, last_xact, last_id FROM rollup_watermark')
+        marks = {tbl: (last_xact, last_id) for tbl, last_xact, last_id in cur.fetchall()}
+        # below the oldest running transaction no row can be committed any more
+        cur.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+        horizon, = cur.fetchone()
+
+        sessions = set()
+        read = 0
+        for table in TABLES:
+            cur.execute(f'SELECT xact, id, session FROM {table}'
+                        f' WHERE (xact, id) > (%s, %s) AND xact < %s'
+                        f' ORDER BY xact, id LIMIT %s',
+                        (*marks.get(table, (0, 0)), horizon, BATCH))
+            rows = cur.fetchall()
+            sessions.update(s for _, _, s in rows if s is not None)
+            if rows:
+                read += len(rows)
+                marks[table] = rows[-1][:2]
+
+        for session in sorted(sessions):
+            rollup_session(cur, session)
+
+        for table, (last_xact, last_id) in marks.items():
+            cur.execute('INSERT INTO rollup_watermark (tbl, last_xact, last_id)'
+                        ' VALUES (%s, %s, %s) ON CONFLICT (tbl) DO UPDATE'
+                        ' SET last_xact = EXCLUDED.last_xact, last_id = EXCLUDED.last_id',
+                        (table, last_xact, last_id))
+    conn.commit()
+    return read
+
+
+def pick_resolution(start, end, points=POINTS, resolutions=RESOLUTIONS):
+    """coarsest resolution that still has at least points buckets in [start, end)"""
+    span = (end - start).total_seconds()
+    best = resolutions[0][0]
+    for name, seconds in resolutions:
+        if span / seconds >= points:
+            best = name
+    return best
+
+
+def temperature_series(conn, start, end, points=POINTS):
+    """[(time, min, max, avg)] over all sessions"""
+    res = pick_resolution(start, end, points)
+    with conn.cursor() as cur:
+        if res == 'raw':
+            cur.execute('SELECT datetime, value, value, value FROM temperature'
+                        ' WHERE datetime >= %s AND datetime < %s ORDER BY datetime',
+                        (start, end))
+        else:
+            cur.execute(f'SELECT bucket, min(t_min), max(t_max), sum(t_sum) / sum(t_count)'
+                        f' FROM temperature_{res}'
+                        f' WHERE bucket >= date_trunc(%s, %s::timestamp) AND bucket < %s'
+                        f' GROUP BY bucket ORDER BY bucket',
+                        ('minute' if res == '1m' else 'hour', start, end))
+        return res, cur.fetchall()
+
+
+def occupancy_series(conn, start, end, sensor, points=POINTS):
+    """[(time, fraction of observed time with motion)] of one sensor"""
+    res = pick_resolution(start, end, points, RESOLUTIONS[1:])
+    with conn.cursor() as cur:
+        cur.execute(f'SELECT bucket, sum(active) / nullif(sum(observed), 0)'
+                    f' FROM occupancy_{res}'
+                    f' WHERE sensor = %s AND bucket >= date_trunc(%s, %s::timestamp)'
+                    f' AND bucket < %s GROUP BY bucket ORDER BY bucket',
+                    (sensor, 'minute' if res == '1m' else 'hour', start, end))
+        return res, cur.fetchall()
+
+
+if __name__ == "__main__":
+    HOST = sys.argv[1].strip()
+    PASSWD = sys.argv[2].strip()
+    INTERVAL = int(sys.argv[3]) if len(sys.argv) > 3 else 0  # 0: run once
+    conn_str = f'postgresql://iotproj:{PASSWD}@{HOST}:5432/iotdb'
+
+    with pg.connect(conn_str) as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT pg_try_advisory_lock(%s)', (LOCK_ID,))
+            if not cur.fetchone()[0]:
+                print('another rollup job is running')
+                sys.exit(1)
+        conn.commit()
+
+        while True:
+            tic = time.time()
+            total = 0
+            while True:
+                n = step(conn)
+                total += n
+                if n == 0:
+                    break
+            print(f'{time.strftime("%H:%M:%S")} rolled up {total} rows '
+                  f'in {time.time()-tic:.2f}s')
+            if not INTERVAL:
+                break
+            time.sleep(INTERVAL)
@@ -0,0 +1,235 @@
+import sys
+import time
+import psycopg as pg
+from psycopg.rows import dict_row
+
+
+# Keep session_summary (migrations/003) up to date from rows committed past
+# the per-table watermark, in commit order (migrations/007). Running sessions
+# are updated incrementally; when the switch OFF row arrives the session is
+# recomputed from its raw rows and marked final.
+# Usage: python session_summary.py <ip> <passwd> [interval seconds]
+BATCH = 5000        # rows per table per step
+LOCK_ID = 20250917  # advisory lock, one job at a time
+
+# source table: value columns
+TABLES = {
+    'switch': 'status',
+    'temperature': 'value',
+    'motion1': 'value',
+    'motion2': 'value',
+    'image': 'ingredient',
+    'image2': 'ingredient, style, description',
+}
+
+# motion1/motion2 as edges, raw rows and coalesced intervals alike (migrations/005)
+EDGE_SQL = 'SELECT datetime, value FROM motion_edge WHERE sensor = %s AND session = %s'
+
+SUMMARY = ('start_time', 'end_time', 'duration',
+           'motion1_seconds', 'motion2_seconds', 'presence_seconds',
+           'temp_max', 'temp_mean', 'temp_sum', 'temp_count', 'image_count',
+           'ingredient', 'style', 'description',
+           'motion1_since', 'motion2_since', 'presence_since', 'last_edge', 'final')
+
+
+def blank(session):
+    s = dict.fromkeys(SUMMARY)
+    s.update(session=session, motion1_seconds=0.0, motion2_seconds=0.0,
+             presence_seconds=0.0, temp_sum=0.0, temp_count=0, image_count=0,
+             final=False)
+    return s
+
+
+def apply(s, table, row):
+    """fold one source row into the summary s, rows of a session in time order"""
+    dt = row['datetime']
+    if s['start_time'] is None:
+        s['start_time'] = dt
+
+    if table == 'switch':
+        # the session runs from switch ON to OFF, motion may be logged before ON
+        if row['status']:
+            s['start_time'] = dt
+        else:
+            s['end_time'] = dt
+    elif table == 'temperature':
+        value = float(row['value'])
+        s['temp_max'] = value if s['temp_max'] is None else max(float(s['temp_max']), value)
+        s['temp_sum'] += value
+        s['temp_count'] += 1
+        s['temp_mean'] = s['temp_sum'] / s['temp_count']
+    elif table == 'image':
+        s['image_count'] += 1
+    elif table == 'image2':
+        s['ingredient'] = row['ingredient']
+        s['style'] = row['style']
+        s['description'] = row['description']
+    else:
+        since = f'{table}_since'
+        if row['value'] and s[since] is None:
+            s[since] = dt
+        elif not row['value'] and s[since] is not None:
+            s[f'{table}_seconds'] += (dt - s[since]).total_seconds()
+            s[since] = None
+        active = s['motion1_since'] is not None or s['motion2_since'] is not None
+        if active and s['presence_since'] is None:
+            # an interval may start before edges folded in an earlier step
+            s['presence_since'] = max(dt, s['last_edge'] or dt)
+        elif not active and s['presence_since'] is not None:
+            s['presence_seconds'] += max((dt - s['presence_since']).total_seconds(), 0)
+            s['presence_since'] = None
+        s['last_edge'] = max(dt, s['last_edge'] or dt)
+
+
+def finalize(s):
+    # close intervals still open at switch OFF
+    end = s['end_time']
+    for key in ('motion1', 'motion2', 'presence'):
+        since = s[f'{key}_since']
+        if since is not None:
+            s[f'{key}_seconds'] += max((end - since).total_seconds(), 0)
+            s[f'{key}_since'] = None
+    s['duration'] = (end - s['start_time']).total_seconds()
+    s['final'] = True
+
+
+def recompute(cur, session):
+    """summary of one session from all its raw rows, by the (session, datetime) indexes"""
+    rows = []
+    for table, columns in TABLES.items():
+        if table in ('motion1', 'motion2'):
+            cur.execute(EDGE_SQL, (table, session))
+        else:
+            cur.execute(f'SELECT datetime, {columns} FROM {table} WHERE session = %s',
+                        (session,))
+        rows += [(r['datetime'], table, r) for r in cur.fetchall()]
+    s = blank(session)
+    for _, table, row in sorted(rows, key=lambda r: r[0]):
+        apply(s, table, row)
+    if s['end_time'] is not None:
+        finalize(s)
+    return s
+
+
+def load(cur, session):
+    cur.execute('SELECT * FROM session_summary WHERE session = %s', (session,))
+    row = cur.fetchone()
+    if row is None:
+        return blank(session)
+    row.pop('updated')
+    return row
+
+
+def save(cur, s):
+    columns = ('session',) + SUMMARY
+    cur.execute(
+        f'INSERT INTO session_summary ({", ".join(columns)}, updated)'
+        f' VALUES ({", ".join(["%s"]*len(columns))}, now())'
+        f' ON CONFLICT (session) DO UPDATE SET '
+        + ', '.join(f'{c} = EXCLUDED.{c}' for c in SUMMARY + ('updated',)),
+        [s[c] for c in columns])
+
+
+def committed(cur, table, columns, mark, horizon):
+    """up to BATCH rows of table committed past mark, in (xact, id) order"""
+    # below horizon every transaction has ended, no row can appear there later
+    cur.execute(f'SELECT xact, id, {columns} FROM {table}'
+                f' WHERE (xact, id) > (%s, %s) AND xact < %s'
+                f' ORDER BY xact, id LIMIT %s', (*mark, horizon, BATCH))
+    return cur.fetchall()
+
+
+def step(conn):
+    """fold up to BATCH new rows per table, returns number of rows read"""
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute('SELECT tbl, last_xact, last_id FROM summary_watermark')
+        marks = {r['tbl']: (r['last_xact'], r['last_id']) for r in cur.fetchall()}
+        cur.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint AS horizon')
+        horizon = cur.fetchone()['horizon']
+
+        new = {}  # session: [(datetime, table, row)]
+        read = 0
+        for table, columns in TABLES.items():
+            rows = committed(cur, table, f'session, datetime, {columns}',
+                             marks.get(table, (0, 0)), horizon)
+            for r in rows:
+                if r['session'] is not None and r['datetime'] is not None:
+                    new.setdefault(r['session'], []).append((r['datetime'], table, r))
+            if rows:
+                read += len(rows)
+                marks[table] = (rows[-1]['xact'], rows[-1]['id'])
+
+        # an interval written by the device is an ON and an OFF edge; fused
+        # presence rows are skipped, presence_seconds comes from motion1/motion2
+        rows = committed(cur, 'presence_interval', 'session, sensor, start_time, end_time',
+                         marks.get('presence_interval', (0, 0)), horizon)
+        for r in rows:
+            if r['sensor'] not in TABLES:
+                continue
+            new.setdefault(r['session'], []).extend([
+                (r['start_time'], r['sensor'],
+                 {'datetime': r['start_time'], 'value': True, 'end_time': r['end_time']}),
+                (r['end_time'], r['sensor'],
+                 {'datetime': r['end_time'], 'value': False, 'end_time': r['end_time']})])
+        if rows:
+            read += len(rows)
+            marks['presence_interval'] = (rows[-1]['xact'], rows[-1]['id'])
+
+        for session, rows in new.items():
+            rows.sort(key=lambda r: r[0])
+            s = load(cur, session)
+            # intervals are written when they close, so they arrive in end
+            # time order and may start before edges already folded; only one
+            # that ended before those, or an older raw edge, is late
+            late = s['last_edge'] is not None and any(
+                t in ('motion1', 'motion2') and r.get('end_time', dt) < s['last_edge']
+                for dt, t, r in rows)
+            ended = any(t == 'switch' and not r['status'] for _, t, r in rows)
+            if s['final'] or late or ended:
+                s = recompute(cur, session)
+            else:
+                for _, table, row in rows:
+                    apply(s, table, row)
+                if any(t == 'image' for _, t, _ in rows):
+                    # relabeled frames come back as rows past the watermark too
+                    cur.execute('SELECT count(*) AS n FROM image WHERE session = %s',
+                                (session,))
+                    s['image_count'] = cur.fetchone()['n']
+            save(cur, s)
+
+        for table, (last_xact, last_id) in marks.items():
+            cur.execute('INSERT INTO summary_watermark (tbl, last_xact, last_id)'
+                        ' VALUES (%s, %s, %s) ON CONFLICT (tbl) DO UPDATE'
+                        ' SET last_xact = EXCLUDED.last_xact, last_id = EXCLUDED.last_id',
+                        (table, last_xact, last_id))
+    conn.commit()
+    return read
+
+
+if __name__ == "__main__":
+    HOST = sys.argv[1].strip()
+    PASSWD = sys.argv[2].strip()
+    INTERVAL = int(sys.argv[3]) if len(sys.argv) > 3 else 0  # 0: run once
+    conn_str = f'postgresql://iotproj:{PASSWD}@{HOST}:5432/iotdb'
+
+    with pg.connect(conn_str) as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT pg_try_advisory_lock(%s)', (LOCK_ID,))
+            if not cur.fetchone()[0]:
+                print('another session_summary job is running')
+                sys.exit(1)
+        conn.commit()
+
+        while True:
+            tic = time.time()
+            total = 0
+            while True:
+                n = step(conn)
+                total += n
+                if n == 0:
+                    break
+            print(f'{time.strftime("%H:%M:%S")} folded {total} rows '
+                  f'in {time.time()-tic:.2f}s')
+            if not INTERVAL:
+                break
+            time.sleep(INTERVAL)